@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import math
+import time
+
+from custom_logger import LoggerConfig
+from configuration_default import DefaultConfig
+from candles import CandleBatch
+
+
+def percentile(sorted_values, fraction):
+    """
+    Перцентиль отсортированного списка методом ближайшего ранга.
+    """
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class TokenBucket:
+    """
+    Общий для всех корутин лимит запросов: rate токенов в секунду, не больше capacity подряд.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncPriceFetcher:
+    """
+    Параллельная загрузка последних свечей для набора пар (symbol, timeframe).
+
+    Запросы выполняются асинхронным клиентом ccxt с ограничением количества одновременных
+    запросов (concurrency) и общим лимитом частоты (TokenBucket). Свечи каждой пары
+    записываются в базу данных сразу по готовности, не дожидаясь остальных пар.
+
+    Parameters:
+        pairs (list): Список пар (symbol, timeframe).
+        db_manager (DatabaseManager): Получатель свечей (None - только загрузка).
+        concurrency (int): Максимальное количество одновременных запросов.
+        requests_per_second (float): Лимит частоты запросов (по умолчанию: из exchange.rateLimit).
+        period (int): Количество свечей на пару (по умолчанию: DefaultConfig().period).
+        exchange: Асинхронный клиент биржи (по умолчанию: ccxt.async_support.binance()).
+
+    Attributes:
+        latencies (list): Длительность каждого запроса fetch_ohlcv, секунды.
+        candles (int): Количество полученных свечей.
+        errors (dict): Ошибки по парам.
+    """
+
+    page_limit = 1000
+
+    def __init__(self, pairs, db_manager=None, concurrency=8, requests_per_second=None, period=None,
+                 exchange=None):
+        self.pairs = list(pairs)
+        self.db_manager = db_manager
+        self.concurrency = concurrency
+        self.period = int(period or DefaultConfig().period)
+        self._owns_exchange = exchange is None
+        # Частоту ограничивает TokenBucket, встроенный ограничитель ccxt не нужен
+        if exchange is None:
+            import ccxt.async_support as ccxt_async
+            exchange = ccxt_async.binance({'enableRateLimit': False})
+        self.exchange = exchange
+        if requests_per_second is None:
+            requests_per_second = 1000.0 / max(1, getattr(self.exchange, 'rateLimit', 50))
+        self.bucket = TokenBucket(requests_per_second)
+
+        self.latencies = []
+        self.candles = 0
+        self.errors = {}
+        self.elapsed = 0.0
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    async def _fetch_ohlcv(self, semaphore, symbol, timeframe, since, limit):
+        async with semaphore:
+            await self.bucket.acquire()
+            started = time.perf_counter()
+            try:
+                return await self.exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
+            finally:
+                self.latencies.append(time.perf_counter() - started)
+
+    async def fetch_pair(self, semaphore, symbol, timeframe):
+        """
+        Загружает последние period закрытых свечей пары и записывает их в базу данных.
+        Текущая, ещё не закрытая свеча не загружается: она была бы сохранена с неполными значениями.
+
+        Returns:
+            CandleBatch: Свечи пары.
+        """
+        timeframe_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        now = self.exchange.milliseconds()
+        # Конец диапазона - время открытия текущей свечи (не включительно)
+        end = now - now % timeframe_ms
+        since = end - self.period * timeframe_ms
+
+        pages = []
+        while since < end:
+            page = await self._fetch_ohlcv(semaphore, symbol, timeframe, since, self.page_limit)
+            page = [candle for candle in page or [] if since <= candle[0] < end]
+            if not page:
+                break
+            pages.append(CandleBatch.from_rows(page))
+            since = page[-1][0] + timeframe_ms
+
+        candles = CandleBatch.concat(pages)
+
+        self.candles += len(candles)
+        if self.db_manager is not None and candles:
+            # insert_data синхронный: выполняется в пуле потоков, не блокируя остальные загрузки
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, lambda: self.db_manager.insert_data(
+                candles, symbol=symbol, timeframe=timeframe))
+        self.logger.debug("Получено %s свечей %s %s.", len(candles), symbol, timeframe)
+        return candles
+
+    async def _run_pair(self, semaphore, symbol, timeframe):
+        try:
+            return await self.fetch_pair(semaphore, symbol, timeframe)
+        except Exception as e:
+            self.errors[(symbol, timeframe)] = e
+            self.logger.error("Ошибка загрузки %s %s: %s", symbol, timeframe, str(e))
+            return CandleBatch.empty()
+
+    async def run(self):
+        """
+        Загружает все пары.
+
+        Returns:
+            dict: Свечи по парам (symbol, timeframe); у пар с ошибкой загрузки - пустой CandleBatch,
+                сама ошибка - в errors и report()['failed_pairs'].
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+        try:
+            results = await asyncio.gather(
+                *(self._run_pair(semaphore, symbol, timeframe) for symbol, timeframe in self.pairs))
+        finally:
+            self.elapsed = time.perf_counter() - started
+            if self._owns_exchange:
+                await self.exchange.close()
+
+        report = self.report()
+        self.logger.info("Загружено %s свечей по %s парам за %.2f с (%.0f свечей/с), "
+                         "задержка p50=%.3f p90=%.3f p99=%.3f с.",
+                         report['candles'], len(self.pairs), report['elapsed'], report['candles_per_second'],
+                         report['latency_p50'] or 0, report['latency_p90'] or 0, report['latency_p99'] or 0)
+        if self.errors:
+            self.logger.warning("Не загружены пары: %s.", ', '.join(report['failed_pairs']))
+        return dict(zip(self.pairs, results))
+
+    def report(self):
+        """
+        Возвращает пропускную способность и перцентили задержки запросов.
+        """
+        latencies = sorted(self.latencies)
+        return {
+            'candles': self.candles,
+            'requests': len(latencies),
+            'errors': len(self.errors),
+            'failed_pairs': [f'{symbol} {timeframe}' for symbol, timeframe in self.errors],
+            'elapsed': self.elapsed,
+            'candles_per_second': self.candles / self.elapsed if self.elapsed else 0.0,
+            'latency_p50': percentile(latencies, 0.50),
+            'latency_p90': percentile(latencies, 0.90),
+            'latency_p99': percentile(latencies, 0.99),
+            'latency_max': latencies[-1] if latencies else None,
+        }
+
+
+def fetch_watchlist(pairs, db_manager=None, **kwargs):
+    """
+    Синхронная обёртка: загружает пары и возвращает (свечи по парам, отчёт).
+    """
+    fetcher = AsyncPriceFetcher(pairs, db_manager=db_manager, **kwargs)
+    results = asyncio.run(fetcher.run())
+    return results, fetcher.report()
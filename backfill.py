@@ -0,0 +1,118 @@
+import argparse
+import logging
+import time
+
+import candle_cache
+from custom_logger import LoggerConfig
+from gap_repair import GapScanner
+from historical_prices import HistoricalPriceFetcher
+from database import DatabaseManager
+from timeutils import format_timestamp, to_epoch_ms
+
+
+class BackfillEngine:
+    """
+    Загрузка истории свечей за произвольный диапазон с продолжением после прерывания.
+
+    Диапазон обходится страницами размера HistoricalPriceFetcher.page_limit с соблюдением
+    лимита запросов биржи; каждая страница сразу записывается в базу данных.
+    При продолжении загружаются только пропуски диапазона (см. GapScanner): загрузка
+    возобновляется с первой отсутствующей свечи, даже если в диапазоне уже есть более
+    новые свечи (например, записанные живым потоком). Месяцы локального кэша свечей,
+    в которые попали записанные свечи, удаляются (candle_cache.invalidate).
+
+    Parameters:
+        fetcher (HistoricalPriceFetcher): Источник свечей (символ, интервал и клиент биржи).
+        db_manager (DatabaseManager): Получатель свечей.
+        scanner (GapScanner): Поиск пропусков (по умолчанию: GapScanner(db_manager)).
+        cache_root (str): Каталог кэша свечей (по умолчанию: candle_cache.DEFAULT_CACHE_DIR).
+    """
+
+    def __init__(self, fetcher, db_manager, scanner=None, cache_root=None):
+        self.fetcher = fetcher
+        self.db_manager = db_manager
+        self.scanner = scanner or GapScanner(db_manager)
+        self.cache_root = cache_root
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    @property
+    def symbol(self):
+        return self.fetcher.configuration_default.symbol
+
+    @property
+    def timeframe(self):
+        return self.fetcher.configuration_default.timeframe
+
+    def missing_ranges(self, start_ms, end_ms):
+        """
+        Пропуски диапазона [start_ms, end_ms) в базе данных, включая начало и конец диапазона.
+
+        Returns:
+            list: Пары (начало, конец) в мс по возрастанию.
+        """
+        return [tuple(gap) for gap in self.scanner.find_gaps(self.symbol, self.timeframe,
+                                                             start_ms, end_ms).tolist()]
+
+    def checkpoint(self, start_ms, end_ms):
+        """
+        Возвращает метку времени (мс) первой отсутствующей свечи диапазона или None, если
+        диапазон заполнен.
+        """
+        missing = self.missing_ranges(start_ms, end_ms)
+        return missing[0][0] if missing else None
+
+    def run(self, start_time, end_time=None, resume=True):
+        """
+        Загружает свечи диапазона [start_time, end_time) в базу данных.
+
+        Parameters:
+            start_time: Начало диапазона (миллисекунды, datetime или строка ISO; без пояса - UTC).
+            end_time: Конец диапазона (по умолчанию: начало текущей, ещё не закрытой свечи).
+            resume (bool): Загрузить только отсутствующие свечи диапазона; False - весь диапазон.
+
+        Returns:
+            int: Количество записанных свечей.
+        """
+        timeframe_ms = self.fetcher.timeframe_ms
+        start_ms = to_epoch_ms(start_time)
+        end_ms = to_epoch_ms(end_time)
+        if end_ms is None:
+            # Только закрытые свечи: незакрытая была бы сохранена с неполными значениями
+            now = int(time.time() * 1000)
+            end_ms = now - now % timeframe_ms
+
+        ranges = [(start_ms, end_ms)]
+        if resume:
+            ranges = self.missing_ranges(start_ms, end_ms)
+            if ranges and ranges[0][0] > start_ms:
+                self.logger.info("Продолжение загрузки %s %s с %s (пропусков: %s).", self.symbol, self.timeframe,
+                                 format_timestamp(ranges[0][0]), len(ranges))
+
+        total = 0
+        for since, until in ranges:
+            for page in self.fetcher.iter_ohlcv_pages(since, until):
+                self.db_manager.insert_data(page, symbol=self.symbol, timeframe=self.timeframe,
+                                            raise_errors=True)
+                candle_cache.invalidate(self.symbol, self.timeframe, page[0][0], root=self.cache_root)
+                total += len(page)
+                self.logger.debug("Загружено %s свечей %s %s, последняя: %s.", total, self.symbol,
+                                  self.timeframe, format_timestamp(page[-1][0]))
+
+        self.logger.info("Загрузка истории %s %s завершена: %s свечей.", self.symbol, self.timeframe, total)
+        return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Загрузка истории свечей в базу данных.')
+    parser.add_argument('start', help="Начало диапазона (UTC), 'YYYY-MM-DD[ HH:MM:SS]'")
+    parser.add_argument('end', nargs='?', help='Конец диапазона (по умолчанию: текущая свеча)')
+    parser.add_argument('--symbol')
+    parser.add_argument('--timeframe')
+    parser.add_argument('--restart', action='store_true', help='Не продолжать с контрольной точки')
+    args = parser.parse_args()
+
+    fetcher = HistoricalPriceFetcher(symbol=args.symbol, timeframe=args.timeframe)
+    BackfillEngine(fetcher, DatabaseManager()).run(args.start, args.end, resume=not args.restart)
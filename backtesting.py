@@ -0,0 +1,256 @@
+import argparse
+import math
+
+import numpy as np
+
+from candles import CandleBatch
+
+# Миллисекунд в году: для приведения коэффициента Шарпа к годовому
+YEAR_MS = 365 * 24 * 60 * 60 * 1000
+
+
+class BacktestResult:
+    """
+    Результат прогона стратегии.
+
+    Attributes:
+        timestamp (np.ndarray): Метки времени свечей, мс.
+        positions (np.ndarray): Позиция (доля капитала), удерживаемая на каждой свече.
+        equity (np.ndarray): Капитал на закрытии каждой свечи (по цене закрытия).
+        trades (pd.DataFrame): Закрытые сделки: entry_index, exit_index, position, entry_price,
+            exit_price, pnl, return.
+        fees (float): Уплаченные комиссии.
+    """
+
+    def __init__(self, timestamp, positions, equity, trades, fees, initial_capital):
+        self.timestamp = timestamp
+        self.positions = positions
+        self.equity = equity
+        self.trades = trades
+        self.fees = fees
+        self.initial_capital = initial_capital
+
+    @property
+    def stats(self):
+        """
+        Сводка: доходность, просадка, коэффициент Шарпа, статистика сделок.
+        """
+        equity = self.equity
+        if len(equity) == 0:
+            return {}
+        running_max = np.maximum.accumulate(equity)
+        returns = np.diff(equity) / equity[:-1] if len(equity) > 1 else np.empty(0)
+        sharpe = math.nan
+        if len(returns) > 1 and returns.std() > 0:
+            bar_ms = np.median(np.diff(self.timestamp))
+            sharpe = returns.mean() / returns.std() * math.sqrt(YEAR_MS / bar_ms)
+        trade_returns = self.trades['return'].to_numpy()
+        wins = trade_returns[trade_returns > 0]
+        losses = trade_returns[trade_returns <= 0]
+        return {
+            'total_return': equity[-1] / self.initial_capital - 1,
+            'final_equity': equity[-1],
+            'max_drawdown': float((1 - equity / running_max).max()),
+            'sharpe': sharpe,
+            'exposure': float(np.mean(self.positions != 0)),
+            'trades': len(trade_returns),
+            'win_rate': len(wins) / len(trade_returns) if len(trade_returns) else math.nan,
+            'avg_trade_return': float(trade_returns.mean()) if len(trade_returns) else math.nan,
+            'profit_factor': (wins.sum() / -losses.sum()) if losses.sum() < 0 else math.nan,
+            'fees': self.fees,
+        }
+
+
+class Backtester:
+    """
+    Векторизованный бэктест стратегии по массивам свечей.
+
+    Модель исполнения:
+        - целевая позиция свечи t (Strategy.signals) исполняется на открытии свечи t + 1;
+        - позиция - доля капитала: при входе покупается (продаётся) position * капитал / цена
+          единиц, их количество не меняется до следующего изменения позиции;
+        - цена исполнения хуже цены открытия на slippage (доля) в сторону сделки;
+        - комиссия fee (доля) берётся с оборота каждой сделки; смена лонга на шорт - две сделки.
+
+    Между сменами позиции капитал меняется пропорционально цене, поэтому весь прогон сводится
+    к произведениям по отрезкам постоянной позиции: ни одного цикла Python по свечам.
+    Эталон для проверки - run_event_loop с той же моделью, но со счётом денег и единиц по шагам.
+
+    Parameters:
+        fee (float): Комиссия с оборота (0.001 = 0.1%).
+        slippage (float): Проскальзывание относительно цены открытия (доля).
+        initial_capital (float): Начальный капитал.
+    """
+
+    def __init__(self, fee=0.001, slippage=0.0, initial_capital=10000.0):
+        self.fee = fee
+        self.slippage = slippage
+        self.initial_capital = initial_capital
+
+    @staticmethod
+    def positions(targets):
+        """
+        Позиция на каждой свече: целевая позиция предыдущей свечи (NaN - ноль), на первой - ноль.
+        """
+        targets = np.nan_to_num(np.asarray(targets, dtype=np.float64), nan=0.0)
+        positions = np.empty_like(targets)
+        positions[:1] = 0.0
+        positions[1:] = targets[:-1]
+        return positions
+
+    def run(self, candles, strategy):
+        """
+        Прогоняет стратегию по свечам.
+
+        Parameters:
+            candles (CandleBatch): Свечи по возрастанию времени.
+            strategy (Strategy | array-like): Стратегия или готовые целевые позиции.
+
+        Returns:
+            BacktestResult: Кривая капитала, сделки и статистика.
+        """
+        targets = strategy.signals(candles) if hasattr(strategy, 'signals') else strategy
+        positions = self.positions(targets)
+        open_price = candles.open_price
+        close_price = candles.close_price
+
+        # Отрезки постоянной позиции: начало каждого - свеча, на открытии которой позиция изменилась
+        changed = np.diff(positions, prepend=0.0) != 0
+        starts = np.flatnonzero(changed)
+        segment = np.cumsum(changed)
+        size = positions[starts]
+        direction = np.sign(size)
+        entry_price = open_price[starts] * (1 + self.slippage * direction)
+
+        # Выход из отрезка - на открытии начала следующего; последний отрезок остаётся открытым
+        closed = len(starts) - 1 if len(starts) else 0
+        exit_price = open_price[starts[1:]] * (1 - self.slippage * direction[:closed])
+        ratio = exit_price / entry_price[:closed]
+        entry_factor = 1 - self.fee * np.abs(size)
+        exit_factor = 1 + size[:closed] * (ratio - 1) - self.fee * np.abs(size[:closed]) * ratio
+
+        # Капитал перед входом в каждый отрезок: произведение множителей всех предыдущих
+        growth = np.empty(len(starts))
+        growth[:1] = 1.0
+        growth[1:] = np.cumprod(entry_factor[:closed] * exit_factor)
+        capital_before = self.initial_capital * growth
+        capital_entered = capital_before * entry_factor
+
+        # Отрезок 0 - свечи до первой сделки (вне рынка)
+        capital = np.concatenate(([self.initial_capital], capital_entered))[segment]
+        held = np.concatenate(([0.0], size))[segment]
+        price_in = np.concatenate(([1.0], entry_price))[segment]
+        equity = capital * (1 + held * (close_price / price_in - 1))
+
+        traded = np.flatnonzero(size[:closed] != 0)
+        pnl = capital_before[1:] - capital_before[:-1]
+        import pandas as pd
+        trades = pd.DataFrame({
+            'entry_index': starts[traded],
+            'exit_index': starts[traded + 1],
+            'position': size[traded],
+            'entry_price': entry_price[traded],
+            'exit_price': exit_price[traded],
+            'pnl': pnl[traded],
+            'return': (entry_factor[:closed] * exit_factor)[traded] - 1,
+        })
+        fees = (self.fee * np.abs(size) * capital_before).sum() + \
+            (self.fee * np.abs(size[:closed]) * ratio * capital_entered[:closed]).sum()
+        return BacktestResult(candles.timestamp, positions, equity, trades, float(fees), self.initial_capital)
+
+    def run_event_loop(self, candles, strategy):
+        """
+        Эталонная реализация той же модели циклом по свечам (деньги и единицы актива).
+        Медленная; служит для проверки run().
+        """
+        targets = strategy.signals(candles) if hasattr(strategy, 'signals') else strategy
+        positions = self.positions(targets)
+        open_price = candles.open_price.tolist()
+        close_price = candles.close_price.tolist()
+
+        cash = self.initial_capital
+        units = 0.0
+        current = 0.0
+        fees = 0.0
+        equity = []
+        trades = []
+        entry = None
+        for t, position in enumerate(positions.tolist()):
+            if position != current:
+                if units != 0.0:
+                    price = open_price[t] * (1 - self.slippage * math.copysign(1.0, units))
+                    fee = self.fee * abs(units) * price
+                    cash += units * price - fee
+                    fees += fee
+                    entry_index, entry_price, capital_before = entry
+                    trades.append((entry_index, t, current, entry_price, price, cash - capital_before,
+                                   cash / capital_before - 1))
+                    units = 0.0
+                if position != 0.0:
+                    capital_before = cash
+                    fee = self.fee * abs(position) * cash
+                    cash -= fee
+                    fees += fee
+                    price = open_price[t] * (1 + self.slippage * math.copysign(1.0, position))
+                    units = position * cash / price
+                    cash -= units * price
+                    entry = (t, price, capital_before)
+                current = position
+            equity.append(cash + units * close_price[t])
+
+        import pandas as pd
+        trades = pd.DataFrame(trades, columns=['entry_index', 'exit_index', 'position', 'entry_price',
+                                               'exit_price', 'pnl', 'return'])
+        return BacktestResult(candles.timestamp, positions, np.array(equity), trades, fees, self.initial_capital)
+
+
+def compare_with_event_loop(backtester, candles, strategy, rtol=1e-9):
+    """
+    Сверяет векторизованный прогон с эталонным циклом.
+
+    Raises:
+        AssertionError: Если кривые капитала или сделки расходятся больше чем на rtol.
+    """
+    vectorized = backtester.run(candles, strategy)
+    reference = backtester.run_event_loop(candles, strategy)
+    if not np.allclose(vectorized.equity, reference.equity, rtol=rtol, atol=0.0):
+        mismatch = int(np.flatnonzero(~np.isclose(vectorized.equity, reference.equity, rtol=rtol, atol=0.0))[0])
+        raise AssertionError(f"Капитал расходится на свече {mismatch}: "
+                             f"{vectorized.equity[mismatch]!r} != {reference.equity[mismatch]!r}")
+    import pandas as pd
+    pd.testing.assert_frame_equal(vectorized.trades, reference.trades, check_dtype=False, rtol=rtol)
+    return True
+
+
+def load_candles(db_manager, symbol=None, timeframe=None, start=None, end=None):
+    """
+    Свечи из базы данных в виде CandleBatch (без промежуточного фрейма).
+    """
+    return CandleBatch.from_arrays(db_manager.query_candles(symbol, timeframe, start=start, end=end,
+                                                            as_arrays=True))
+
+
+if __name__ == '__main__':
+    from database import DatabaseManager
+    from strategy import STRATEGIES
+
+    parser = argparse.ArgumentParser(description='Бэктест стратегии по свечам из базы данных.')
+    parser.add_argument('strategy', choices=sorted(STRATEGIES))
+    parser.add_argument('--symbol')
+    parser.add_argument('--timeframe')
+    parser.add_argument('--start', help="Начало диапазона (UTC), 'YYYY-MM-DD[ HH:MM:SS]'")
+    parser.add_argument('--end')
+    parser.add_argument('--fee', type=float, default=0.001)
+    parser.add_argument('--slippage', type=float, default=0.0005)
+    parser.add_argument('--short', action='store_true', help='Разрешить шорт')
+    parser.add_argument('--check', action='store_true', help='Сверить с эталонным циклом')
+    args = parser.parse_args()
+
+    candles = load_candles(DatabaseManager(), args.symbol, args.timeframe, args.start, args.end)
+    strategy = STRATEGIES[args.strategy](allow_short=args.short)
+    backtester = Backtester(fee=args.fee, slippage=args.slippage)
+    if args.check:
+        compare_with_event_loop(backtester, candles, strategy)
+    result = backtester.run(candles, strategy)
+    for key, value in result.stats.items():
+        print(f"{key:<18} {value}")
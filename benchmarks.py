@@ -0,0 +1,1144 @@
+"""
+Замеры производительности компонентов бота.
+
+Запуск:
+    python benchmarks.py {insert|pivots|replay|cache|pipeline|candles|account|capture|backtest|sweep|chart|live|resample|gaps|logging|metrics|suite|imports} [размеры...]
+    python benchmarks.py compare базовый.json новый.json
+
+Замеры базы данных выполняются на отдельной таблице (BENCH_TABLE) той базы,
+параметры которой заданы в переменных окружения DB_* (см. DatabaseManager).
+
+suite - воспроизводимый набор замеров основного пути (биржа, запись, чтение, индикаторы,
+график) на детерминированных свечах generate_candles и бирже FakeExchange без сети.
+Результаты записываются в SUITE_RESULTS_DIR/<коммит>.json и сравниваются командой compare;
+в отчёт входит и время импорта модулей (imports).
+"""
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from database import CANDLE_COLUMNS, DatabaseManager
+from candle_cache import CandleCache
+from candles import CandleBatch
+from fakes import AccountStubServer, FakeExchange, generate_candles
+from timeutils import to_display_time
+from pivots import pivot_frame
+from streaming_indicators import IndicatorEngine, replay_and_compare
+from backtesting import Backtester, compare_with_event_loop
+from strategy import BeerPointStrategy, MovingAverageCrossover
+from parameter_sweep import ParameterSweep, build_strategy, expand_grid
+from grapf_objects import build_candlestick_figure
+from resampling import IncrementalResampler, resample_candles, timeframe_to_ms
+from chart_server import ChartServer
+from historical_prices import HistoricalPriceFetcher
+from indicators import calculate_beer_points, calculate_moving_averages
+from custom_logger import LOG_FORMAT, ColoredConsoleHandler, build_queue_logging
+import metrics
+
+BENCH_TABLE = 'bench_candles'
+BENCH_SYMBOL = 'BENCH/USDT'
+BENCH_TIMEFRAME = '1m'
+# Модули, время импорта которых отслеживается, и зависимости, которые не должны загружаться при импорте
+IMPORT_MODULES = ('candles', 'database', 'candle_cache', 'historical_prices', 'indicators', 'grapf_objects',
+                  'strategy', 'backtesting', 'parameter_sweep', 'chart_server', 'scheduler', 'async_fetcher', 'main')
+HEAVY_MODULES = ('pandas', 'ccxt', 'plotly', 'pyarrow')
+SUITE_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_results')
+
+
+def legacy_insert_data(db_manager, data):
+    """
+    Прежняя реализация insert_data: полный просмотр меток времени и executemany.
+    """
+    table_name = db_manager.table_name
+    with db_manager.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(f"SELECT timestamp FROM {table_name}")
+        existing_timestamps = {str(row[0]) for row in cursor.fetchall()}
+        new_data = [[BENCH_SYMBOL, BENCH_TIMEFRAME] + list(row)
+                    for row in data if str(row[0]) not in existing_timestamps]
+        if new_data:
+            cursor.executemany(
+                f"INSERT INTO {table_name} (symbol, timeframe, timestamp, open_price, high_price, low_price, "
+                "close_price, volume) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                new_data
+            )
+        connection.commit()
+
+
+def execute(db_manager, query, params=None):
+    """
+    Выполняет служебный запрос замера в отдельной транзакции.
+    """
+    with db_manager.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(query, params)
+        connection.commit()
+
+
+def bench_insert(sizes=(10_000, 1_000_000, 10_000_000), new_rows=1000, overlap=500):
+    """
+    Сравнивает прежний и новый путь вставки при разном количестве уже сохранённых строк.
+
+    Каждая вставка содержит new_rows свечей, из которых overlap уже есть в таблице,
+    что соответствует типичному повторному вызову fetch_historical_data.
+    """
+    db_manager = DatabaseManager(table_name=BENCH_TABLE)
+    results = []
+    for size in sizes:
+        execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        db_manager._schema_ready.discard(BENCH_TABLE)
+
+        db_manager.insert_data(generate_candles(size), symbol=BENCH_SYMBOL,
+                               timeframe=BENCH_TIMEFRAME, batch_size=200_000)
+        tail = [list(candle) for candle in generate_candles(size + new_rows - overlap)[size - overlap:]]
+
+        started = time.perf_counter()
+        legacy_insert_data(db_manager, tail)
+        legacy_seconds = time.perf_counter() - started
+
+        # Удаляем только что вставленные строки, чтобы новый путь работал с тем же состоянием
+        execute(db_manager, f"DELETE FROM {BENCH_TABLE} WHERE timestamp > %s", (tail[overlap - 1][0],))
+
+        started = time.perf_counter()
+        db_manager.insert_data(tail, symbol=BENCH_SYMBOL, timeframe=BENCH_TIMEFRAME)
+        upsert_seconds = time.perf_counter() - started
+
+        results.append((size, legacy_seconds, upsert_seconds))
+        print(f"existing={size:>10}  legacy={legacy_seconds:8.3f}s  upsert={upsert_seconds:8.3f}s  "
+              f"x{legacy_seconds / upsert_seconds:.1f}")
+
+    execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    return results
+
+
+def synthetic_frame(count, seed=0):
+    """
+    Свечи generate_candles в формате fetch_data_for_chart: фрейм с индексом дат.
+    """
+    import pandas as pd
+
+    frame = generate_candles(count, seed).to_frame(index='timestamp')
+    frame.index = pd.DatetimeIndex(pd.to_datetime(frame.index, unit='ms'), name='timestamp')
+    return frame
+
+
+def legacy_calculate_beer_points(price_data, length=10):
+    """
+    Прежняя реализация calculate_beer_points (построчный обход через .iloc).
+    """
+    import pandas as pd
+
+    n = len(price_data)
+    pivot_points = []
+
+    for i in range(1, n - 1):
+        high = price_data['high_price'].iloc[i]
+        low = price_data['low_price'].iloc[i]
+
+        if high > price_data['high_price'].iloc[i - 1] and high > price_data['high_price'].iloc[i + 1]:
+            potential_pivot = {'Pivot Type': 'Potential High', 'Pivot Value': high, 'Date': price_data.index[i]}
+        elif low < price_data['low_price'].iloc[i - 1] and low < price_data['low_price'].iloc[i + 1]:
+            potential_pivot = {'Pivot Type': 'Potential Low', 'Pivot Value': low, 'Date': price_data.index[i]}
+        else:
+            potential_pivot = None
+
+        if potential_pivot:
+            pivot_points.append(potential_pivot)
+
+    return pd.DataFrame(pivot_points)
+
+
+def bench_pivots(sizes=(10_000, 100_000, 1_000_000)):
+    """
+    Сравнивает построчный и векторизованный поиск точек разворота (length=1)
+    и проверяет совпадение результатов.
+    """
+    import pandas as pd
+
+    results = []
+    for size in sizes:
+        frame = synthetic_frame(size)
+
+        started = time.perf_counter()
+        expected = legacy_calculate_beer_points(frame)
+        legacy_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        actual = pivot_frame(frame, length=1)
+        vector_seconds = time.perf_counter() - started
+
+        pd.testing.assert_frame_equal(actual, expected)
+        results.append((size, legacy_seconds, vector_seconds))
+        print(f"rows={size:>9}  loop={legacy_seconds:8.3f}s  vectorized={vector_seconds:8.4f}s  "
+              f"x{legacy_seconds / vector_seconds:.0f}")
+    return results
+
+
+def bench_replay(sizes=(10_000, 100_000)):
+    """
+    Прогоняет историю через IndicatorEngine свеча за свечой, проверяет побитовое совпадение
+    с пакетным расчётом и сравнивает стоимость одного обновления с пересчётом всей истории.
+    """
+    import pandas as pd
+
+    results = []
+    for size in sizes:
+        frame = synthetic_frame(size)
+        replay_and_compare(frame)
+
+        engine = IndicatorEngine()
+        engine.warm_up(frame)
+        # Новые свечи после истории: повторное время движок пропускает
+        timestamps = pd.date_range(frame.index[-1], periods=1001, freq='min')[1:]
+        started = time.perf_counter()
+        for timestamp in timestamps:
+            engine.update(timestamp, 1.0, 1.0, 1.0)
+        update_seconds = (time.perf_counter() - started) / 1000
+
+        started = time.perf_counter()
+        for window in (3, 5, 25):
+            frame['close_price'].rolling(window=window).mean().shift(window)
+        pivot_frame(frame)
+        batch_seconds = time.perf_counter() - started
+
+        results.append((size, update_seconds, batch_seconds))
+        print(f"rows={size:>9}  identical=yes  update={update_seconds * 1e6:8.1f}us  "
+              f"full recompute={batch_seconds * 1e3:8.2f}ms")
+    return results
+
+
+def bench_cache(sizes=(100_000, 1_000_000)):
+    """
+    Сравнивает загрузку свечей напрямую из базы, первое наполнение кэша и чтение из тёплого кэша.
+
+    Память - пик выделений Python (tracemalloc) при загрузке; отображённые в память файлы
+    кэша в него не входят, так как принадлежат страничному кэшу ОС.
+    """
+    db_manager = DatabaseManager(table_name=BENCH_TABLE)
+    root = tempfile.mkdtemp(prefix='candle_cache_')
+    results = []
+    try:
+        for size in sizes:
+            execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            db_manager._schema_ready.discard(BENCH_TABLE)
+            db_manager.insert_data(generate_candles(size), symbol=BENCH_SYMBOL, timeframe=BENCH_TIMEFRAME,
+                                   batch_size=200_000)
+            shutil.rmtree(root, ignore_errors=True)
+            cache = CandleCache(db_manager, root=root)
+
+            def measure(load):
+                tracemalloc.start()
+                started = time.perf_counter()
+                frame = load()
+                seconds = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                return frame, seconds, peak
+
+            _, db_seconds, db_peak = measure(
+                lambda: db_manager.fetch_candles_since(BENCH_SYMBOL, BENCH_TIMEFRAME))
+            _, fill_seconds, fill_peak = measure(lambda: cache.load(BENCH_SYMBOL, BENCH_TIMEFRAME))
+            frame, warm_seconds, warm_peak = measure(lambda: cache.load(BENCH_SYMBOL, BENCH_TIMEFRAME))
+            assert len(frame) == size
+
+            results.append((size, db_seconds, fill_seconds, warm_seconds, db_peak, warm_peak))
+            print(f"rows={size:>9}  db={db_seconds:7.3f}s/{db_peak / 2 ** 20:7.1f}MiB  "
+                  f"cache fill={fill_seconds:7.3f}s/{fill_peak / 2 ** 20:7.1f}MiB  "
+                  f"warm={warm_seconds:7.4f}s/{warm_peak / 2 ** 20:7.1f}MiB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    return results
+
+
+def bench_pipeline(sizes=(10_000, 100_000, 1_000_000)):
+    """
+    Путь от ответа биржи до индикаторов: прежнее представление (строки strftime, столбец TIMESTAMP,
+    разбор pd.to_datetime) против миллисекунд на всём пути с переводом в даты только для вывода.
+
+    Оба пути пишут в таблицы без индексов одной командой COPY, поэтому разница
+    определяется только представлением меток времени.
+    """
+    import pandas as pd
+
+    db_manager = DatabaseManager(table_name=BENCH_TABLE)
+    columns = ', '.join(f'{column} DOUBLE PRECISION' for column in CANDLE_COLUMNS[1:])
+    results = []
+
+    def run(column_type, prepare, parse, display=None):
+        execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        execute(db_manager, f"CREATE TABLE {BENCH_TABLE} (timestamp {column_type}, {columns})")
+        started = time.perf_counter()
+        rows = prepare(candles)
+        with db_manager.pool.connection() as connection, connection.cursor() as cursor:
+            buffer = io.StringIO(''.join('\t'.join(map(str, row)) + '\n' for row in rows))
+            cursor.copy_expert(f"COPY {BENCH_TABLE} FROM STDIN", buffer)
+            connection.commit()
+            cursor.execute(f"SELECT * FROM {BENCH_TABLE} ORDER BY timestamp")
+            frame = pd.DataFrame(cursor.fetchall(), columns=list(CANDLE_COLUMNS))
+        frame.set_index(parse(frame['timestamp']), inplace=True)
+        for window, shift in ((3, 3), (5, 5), (25, 25)):
+            frame[f'{window}_day_ma_shifted'] = frame['close_price'].rolling(window=window).mean().shift(shift)
+        pivots = pivot_frame(frame)
+        if display is not None:
+            display(pivots['Date'])
+        return time.perf_counter() - started
+
+    def strftime_rows(candles):
+        return [[datetime.fromtimestamp(candle[0] / 1000.0).strftime('%Y-%m-%d %H:%M:%S')] + candle[1:]
+                for candle in candles]
+
+    try:
+        for size in sizes:
+            candles = [list(candle) for candle in generate_candles(size)]
+            legacy_seconds = run('TIMESTAMP', strftime_rows, pd.to_datetime)
+            epoch_seconds = run('BIGINT', list, lambda timestamps: timestamps, to_display_time)
+            results.append((size, legacy_seconds, epoch_seconds))
+            print(f"rows={size:>9}  strings={legacy_seconds:8.3f}s  epoch-ms={epoch_seconds:8.3f}s  "
+                  f"x{legacy_seconds / epoch_seconds:.1f}")
+    finally:
+        execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    return results
+
+
+def bench_candles(sizes=(1_000_000,)):
+    """
+    Память и время свечей в виде списков биржи (прежний формат fetch_historical_data)
+    и в виде CandleBatch: построение, срез, перевод во фрейм, буфер COPY для insert_data
+    (текстовый для списков, двоичный для CandleBatch).
+    """
+    import pandas as pd
+
+    results = []
+    for size in sizes:
+        tracemalloc.start()
+        rows = [list(candle) for candle in generate_candles(size)]
+        lists_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        batch = CandleBatch.from_rows(rows)
+        build_seconds = time.perf_counter() - started
+        batch_bytes, build_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        pd.DataFrame(rows, columns=list(CANDLE_COLUMNS))
+        lists_frame_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        frame = batch.to_frame()
+        batch_frame_seconds = time.perf_counter() - started
+        assert np.shares_memory(frame['close_price'].to_numpy(), batch.close_price)
+
+        half = batch[size // 2:]
+        assert np.shares_memory(half.timestamp, batch.timestamp)
+
+        started = time.perf_counter()
+        DatabaseManager._copy_buffer(rows, BENCH_SYMBOL, BENCH_TIMEFRAME)
+        lists_copy_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        DatabaseManager._copy_binary_buffer(batch, BENCH_SYMBOL, BENCH_TIMEFRAME)
+        batch_copy_seconds = time.perf_counter() - started
+
+        results.append((size, lists_bytes, batch_bytes))
+        print(f"candles={size:>9}  lists={lists_bytes / 2 ** 20:7.1f}MiB ({lists_bytes / size:.0f} B/candle)  "
+              f"batch={batch_bytes / 2 ** 20:7.1f}MiB ({batch_bytes / size:.0f} B/candle)")
+        print(f"{'':19}from_rows: {build_seconds:.3f}s, peak {build_peak / 2 ** 20:.1f}MiB")
+        print(f"{'':19}to_frame: lists={lists_frame_seconds:.3f}s batch={batch_frame_seconds:.5f}s  "
+              f"COPY buffer: lists={lists_copy_seconds:.3f}s batch={batch_copy_seconds:.3f}s")
+        del rows, batch, frame, half
+    return results
+
+
+def bench_account(cycles=(20,), reads_per_cycle=3, delay=0.02):
+    """
+    Чтение баланса и позиций в торговом цикле через локальную заглушку API:
+    новый RequestClient на каждый вызов (прежний ConnectedAPI), общий клиент с сессией
+    keep-alive без кэша и общий клиент с кэшем состояния аккаунта.
+
+    В каждом цикле баланс и позиции читаются reads_per_cycle раз; кэш сбрасывается
+    в начале цикла, как после события по ордеру.
+    """
+    from binance_f import RequestClient
+    from connected_api import ConnectedAPI
+
+    server = AccountStubServer(delay=delay).start()
+    url = server.url
+    results = []
+
+    def legacy_read():
+        with contextlib.redirect_stdout(io.StringIO()):
+            RequestClient(api_key='bench', secret_key='bench', url=url).get_balance_v2()
+            RequestClient(api_key='bench', secret_key='bench', url=url).get_position_v2()
+
+    try:
+        for count in cycles:
+            variants = [('per-call client', None, legacy_read)]
+            for name, ttl in (('shared session', 0), ('shared + cache', 60.0)):
+                api = ConnectedAPI('bench', 'bench', url=url, cache_ttl=ttl)
+                variants.append((name, api, lambda api=api: (api.get_account_balance(), api.get_open_positions())))
+
+            for name, api, read in variants:
+                server.connections = 0
+                started = time.perf_counter()
+                for _ in range(count):
+                    if api is not None:
+                        api.invalidate_account_state()
+                    for _ in range(reads_per_cycle):
+                        read()
+                seconds = time.perf_counter() - started
+                stats = api.get_stats() if api is not None else {}
+                results.append((count, name, seconds, server.connections, stats.get('hit_rate')))
+                print(f"cycles={count:>4}  {name:<16} {seconds / count * 1000:8.1f} ms/cycle  "
+                      f"connections={server.connections:>4}  "
+                      f"hit_rate={stats.get('hit_rate', 0.0):.2f}  latency_avg={stats.get('latency_avg', 0.0) * 1000:.1f} ms")
+                if api is not None:
+                    api.close()
+    finally:
+        server.close()
+    return results
+
+
+def bench_capture(calls=(200, 1000), workers=32, delay=0.005):
+    """
+    Нагрузочная проверка перехвата вывода при перекрывающихся вызовах API из пула потоков.
+
+    Прежний способ (подмена sys.stdout на время вызова) сравнивается с output_capture.
+    Пока идут вызовы, отдельный поток печатает строки приложения. Вызов считается корректным,
+    если его перехваченный вывод содержит ровно один свой запрос и ничего чужого; строки
+    приложения должны попасть в стандартный вывод процесса, а не в буферы вызовов.
+    """
+    from binance_f import RequestClient
+    from connected_api import ConnectedAPI
+
+    server = AccountStubServer(delay=delay).start()
+    url = server.url
+    endpoints = {'balance': '/fapi/v2/balance', 'positions': '/fapi/v2/positionRisk'}
+    results = []
+
+    def is_own_output(kind, output):
+        other = 'positions' if kind == 'balance' else 'balance'
+        return (output.count(endpoints[kind]) == 1 and endpoints[other] not in output
+                and 'heartbeat' not in output)
+
+    def run(call, kinds):
+        process_stdout = io.StringIO()
+        sys.stdout = process_stdout
+        done = threading.Event()
+        printed = 0
+
+        def heartbeat():
+            nonlocal printed
+            while not done.is_set():
+                print('heartbeat')
+                printed += 1
+                time.sleep(0.0005)
+
+        printer = threading.Thread(target=heartbeat)
+        printer.start()
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outputs = list(executor.map(call, kinds))
+        finally:
+            done.set()
+            printer.join()
+        seconds = time.perf_counter() - started
+        correct = sum(is_own_output(kind, output) for kind, output in outputs)
+        delivered = process_stdout.getvalue().count('heartbeat')
+        return correct, delivered, printed, seconds
+
+    saved_stdout = sys.stdout
+    try:
+        for count in calls:
+            kinds = ['balance' if i % 2 else 'positions' for i in range(count)]
+
+            # Прежний ConnectedAPI: sys.stdout подменяется на время каждого вызова
+            def legacy_call(kind):
+                restore = sys.stdout
+                output = io.StringIO()
+                sys.stdout = output
+                try:
+                    client = RequestClient(api_key='bench', secret_key='bench', url=url)
+                    client.get_balance_v2() if kind == 'balance' else client.get_position_v2()
+                finally:
+                    sys.stdout = restore
+                return kind, output.getvalue()
+
+            api = ConnectedAPI('bench', 'bench', url=url, cache_ttl=0, max_workers=workers)
+
+            def context_call(kind):
+                _, output = api.get_account_balance() if kind == 'balance' else api.get_open_positions()
+                return kind, output
+
+            line = f"calls={count:>5}"
+            for name, call in (('swap stdout', legacy_call), ('contextvars', context_call)):
+                correct, delivered, printed, seconds = run(call, kinds)
+                sys.stdout = saved_stdout
+                results.append((count, name, correct, delivered, printed, seconds))
+                line += (f"  |  {name}: correct={correct:>5}/{count}  "
+                         f"app lines={delivered:>5}/{printed}  {seconds:5.2f}s")
+            api.close()
+            print(line)
+    finally:
+        sys.stdout = saved_stdout
+        server.close()
+    return results
+
+
+def bench_backtest(sizes=(100_000, 1_000_000)):
+    """
+    Векторизованный Backtester.run против эталонного цикла по свечам run_event_loop
+    на обеих стратегиях; результаты сверяются (compare_with_event_loop).
+    """
+    backtester = Backtester(fee=0.001, slippage=0.0005)
+    results = []
+    for size in sizes:
+        candles = generate_candles(size)
+        for strategy in (MovingAverageCrossover(allow_short=True), BeerPointStrategy(length=10, allow_short=True)):
+            targets = strategy.signals(candles)
+            # Первый прогон на новых массивах платит за выделение страниц памяти
+            backtester.run(candles, targets)
+            started = time.perf_counter()
+            result = backtester.run(candles, targets)
+            vectorized_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            backtester.run_event_loop(candles, targets)
+            loop_seconds = time.perf_counter() - started
+            compare_with_event_loop(backtester, candles, targets)
+            stats = result.stats
+            results.append((size, strategy.name, vectorized_seconds, loop_seconds))
+            print(f"candles={size:>9}  {strategy.name:<13} trades={stats['trades']:>7}  "
+                  f"vectorized={vectorized_seconds:.3f}s  event loop={loop_seconds:.3f}s  "
+                  f"(x{loop_seconds / vectorized_seconds:.0f})  return={stats['total_return']:+.4f}")
+    return results
+
+
+def _pickled_sweep_task(task):
+    # Прежний способ: свечи передаются в каждое задание, индикаторы считаются заново
+    arrays, strategy_name, params = task
+    return Backtester(fee=0.001).run(CandleBatch.from_arrays(arrays), build_strategy(strategy_name, params)).stats
+
+
+def bench_sweep(sizes=(200_000,), workers=None):
+    """
+    Перебор параметров: ParameterSweep (общая память, кэш индикаторов, пачки заданий)
+    против пула, получающего свечи в каждом задании без кэша.
+    """
+    import multiprocessing
+    import os
+
+    grid = {'fast_window': [3, 5, 8], 'fast_shift': [0, 3, 5], 'slow_window': [25, 50],
+            'slow_shift': [0, 25], 'allow_short': [False, True]}
+    results = []
+    directory = tempfile.mkdtemp(prefix='bench_sweep_')
+    try:
+        for size in sizes:
+            candles = generate_candles(size)
+            combinations = list(expand_grid('ma_crossover', grid))
+
+            started = time.perf_counter()
+            with multiprocessing.Pool(workers or os.cpu_count()) as pool:
+                pool.map(_pickled_sweep_task, [(candles.as_arrays(), 'ma_crossover', params)
+                                               for params in combinations])
+            pickled_seconds = time.perf_counter() - started
+
+            sweep = ParameterSweep(candles, 'ma_crossover', grid, workers=workers, fee=0.001)
+            summary = sweep.run(f'{directory}/sweep_{size}.jsonl', resume=False)
+            resumed = sweep.run(f'{directory}/sweep_{size}.jsonl')
+            assert resumed['done'] == 0 and resumed['skipped'] == len(combinations)
+
+            results.append((size, len(combinations), pickled_seconds, summary['seconds']))
+            print(f"candles={size:>9}  combinations={len(combinations)}  "
+                  f"pickled={len(combinations) / pickled_seconds:7.1f}/s  "
+                  f"shared+cache={summary['combinations_per_second']:7.1f}/s  "
+                  f"cache hits={summary['cache_hit_rate']:.0%}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def legacy_display_figure(data_with_ma, beer_points_df):
+    """
+    Прежнее построение графика indicators.display_chart: все свечи, трейс на каждую точку
+    разворота и на каждый соединяющий отрезок.
+    """
+    import plotly.graph_objects as go
+
+    dates = data_with_ma.index
+    fig = go.Figure(data=[go.Candlestick(x=dates, open=data_with_ma['open_price'], high=data_with_ma['high_price'],
+                                         low=data_with_ma['low_price'], close=data_with_ma['close_price'])])
+    for name, color in (('3_day_ma_shifted', 'green'), ('5_day_ma_shifted', 'blue'), ('25_day_ma_shifted', 'red')):
+        fig.add_trace(go.Scatter(x=dates, y=data_with_ma[name], mode='lines', name=name, line=dict(color=color)))
+    for i, row in beer_points_df.iterrows():
+        marker_color = 'red' if 'High' in row['Pivot Type'] else 'green'
+        marker_symbol = 'triangle-down' if 'High' in row['Pivot Type'] else 'triangle-up'
+        fig.add_trace(go.Scatter(x=[row['Date']], y=[row['Pivot Value']], mode='markers', name=row['Pivot Type'],
+                                 marker=dict(color=marker_color, size=10, symbol=marker_symbol)))
+        if i > 0:
+            prev_row = beer_points_df.iloc[i - 1]
+            fig.add_trace(go.Scatter(x=[prev_row['Date'], row['Date']], y=[prev_row['Pivot Value'], row['Pivot Value']],
+                                     mode='lines', line=dict(color=marker_color, width=2)))
+    return fig
+
+
+def bench_chart(sizes=(10_000, 525_600), legacy_limit=20_000):
+    """
+    Построение графика indicators.display_chart: количество трейсов, время построения
+    и сериализации фигуры (то, что уходит в браузер) и её размер. Прежнее построение
+    выполняется только до legacy_limit свечей, дальше указывается ожидаемое число трейсов.
+    Проверяется, что агрегация сохраняет OHLC всего диапазона.
+    """
+    results = []
+    for size in sizes:
+        frame = generate_candles(size).to_frame(index='timestamp')
+        for window in (3, 5, 25):
+            frame[f'{window}_day_ma_shifted'] = frame['close_price'].rolling(window=window).mean().shift(window)
+        candles = CandleBatch.from_frame(frame)
+
+        started = time.perf_counter()
+        fig = build_candlestick_figure(candles, moving_averages={
+            f'{window}-day MA': (frame[f'{window}_day_ma_shifted'], color)
+            for window, color in ((3, 'green'), (5, 'blue'), (25, 'red'))}, pivot_length=1)
+        build_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        payload = fig.to_json()
+        json_seconds = time.perf_counter() - started
+
+        interval = fig.layout.meta['interval_ms']
+        if interval is not None:
+            shown = resample_candles(candles, interval)
+            assert shown.open_price[0] == candles.open_price[0] and shown.close_price[-1] == candles.close_price[-1]
+            assert shown.high_price.max() == candles.high_price.max()
+            assert shown.low_price.min() == candles.low_price.min()
+            assert np.isclose(shown.volume.sum(), candles.volume.sum())
+
+        line = (f"candles={size:>9}  lod: traces={len(fig.data)} points={len(fig.data[0].x)} "
+                f"interval={interval}  build={build_seconds:.3f}s json={json_seconds:.3f}s "
+                f"({len(payload) / 2 ** 20:.1f}MiB)")
+        pivots = pivot_frame(frame, length=1)
+        if size <= legacy_limit:
+            started = time.perf_counter()
+            legacy = legacy_display_figure(frame.set_axis(to_display_time(frame.index)),
+                                           pivots.assign(Date=to_display_time(pivots['Date'])))
+            legacy_build = time.perf_counter() - started
+            started = time.perf_counter()
+            legacy_payload = legacy.to_json()
+            legacy_json = time.perf_counter() - started
+            line += (f"  |  legacy: traces={len(legacy.data)} build={legacy_build:.3f}s json={legacy_json:.3f}s "
+                     f"({len(legacy_payload) / 2 ** 20:.1f}MiB)")
+        else:
+            line += f"  |  legacy: traces={4 + 2 * len(pivots) - 1} (not built)"
+        results.append((size, len(fig.data), build_seconds, json_seconds, len(payload)))
+        print(line)
+    return results
+
+
+def bench_live(clients=(1, 10, 100), candles=20, interval=0.1):
+    """
+    Сервер живых графиков: clients подключений к одной паре, в базу по одной пишутся
+    candles новых свечей. Замеряются запросы к базе (не должны зависеть от числа клиентов)
+    и задержка от записи свечи до её получения последним клиентом.
+    """
+    import urllib.parse
+    import urllib.request
+
+    db_manager = DatabaseManager(table_name=BENCH_TABLE)
+    results = []
+    for count in clients:
+        execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        db_manager._schema_ready.discard(BENCH_TABLE)
+        history = [list(candle) for candle in generate_candles(1000 + candles)]
+        db_manager.insert_data(history[:1000], symbol=BENCH_SYMBOL, timeframe=BENCH_TIMEFRAME)
+
+        server = ChartServer([(BENCH_SYMBOL, BENCH_TIMEFRAME)], db_manager, port=0, poll_interval=interval)
+        server.start()
+        feed = server.feeds[f'{BENCH_SYMBOL}:{BENCH_TIMEFRAME}']
+        received = {}
+        ready = threading.Barrier(count + 1)
+
+        def client():
+            response = urllib.request.urlopen(
+                server.url + 'events?pair=' + urllib.parse.quote(feed.name))
+            ready.wait()
+            for line in response:
+                if line.startswith(b'data:') and b'"candle"' in line:
+                    timestamp = json.loads(line[5:])['candle'][0]
+                    received[timestamp] = time.perf_counter()
+
+        for _ in range(count):
+            threading.Thread(target=client, daemon=True).start()
+        ready.wait()
+        polls = feed.polls
+        latencies = []
+        for candle in history[1000:]:
+            written = time.perf_counter()
+            db_manager.insert_data([candle], symbol=BENCH_SYMBOL, timeframe=BENCH_TIMEFRAME)
+            time.sleep(interval * 2)
+            latencies.append(received.get(candle[0], math.inf) - written)
+        polls = feed.polls - polls
+        server.stop()
+
+        results.append((count, polls, max(latencies)))
+        print(f"clients={count:>4}  candles={candles}  db polls={polls}  "
+              f"latency median={np.median(latencies) * 1000:6.1f}ms max={max(latencies) * 1000:6.1f}ms")
+    execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    return results
+
+
+def bench_resample(sizes=(525_600,), timeframes=('5m', '15m', '1h', '4h', '1d')):
+    """
+    Построение старших интервалов из минутных свечей: векторно (resample_candles) и
+    по одной свече (IncrementalResampler, как в живом цикле); результаты сверяются.
+    Пропуски в минутном ряду (каждая 97-я свеча) проверяют бары с неполным набором свечей.
+    """
+    from resampling import timeframe_to_ms
+
+    results = []
+    for size in sizes:
+        rows = [row for i, row in enumerate(generate_candles(size)) if i % 97 != 96]
+        candles = CandleBatch.from_rows(rows)
+
+        started = time.perf_counter()
+        vectorized = {timeframe: resample_candles(candles, timeframe_to_ms(timeframe)) for timeframe in timeframes}
+        vectorized_seconds = time.perf_counter() - started
+
+        resampler = IncrementalResampler(timeframes)
+        latest = {}
+        started = time.perf_counter()
+        for row in rows:
+            for timeframe, bar in resampler.update(row):
+                latest.setdefault(timeframe, {})[bar[0]] = bar
+        incremental_seconds = time.perf_counter() - started
+
+        for timeframe, expected in vectorized.items():
+            actual = CandleBatch.from_rows([latest[timeframe][key] for key in sorted(latest[timeframe])])
+            for column in CANDLE_COLUMNS:
+                np.testing.assert_allclose(getattr(actual, column), getattr(expected, column), rtol=1e-12)
+
+        results.append((size, vectorized_seconds, incremental_seconds))
+        print(f"base candles={len(rows):>9}  timeframes={','.join(timeframes)}  "
+              f"vectorized={vectorized_seconds:.3f}s  incremental={incremental_seconds / len(rows) * 1e6:.1f}us/candle  "
+              f"bars: " + ' '.join(f"{timeframe}={len(batch)}" for timeframe, batch in vectorized.items()))
+    return results
+
+
+def bench_gaps(sizes=(1_000_000, 10_000_000), holes=1000):
+    """
+    Поиск пропусков GapScanner (LAG в SQL, клиенту передаются только границы) против
+    выгрузки меток времени и np.diff на стороне Python; результаты сверяются.
+    """
+    from gap_repair import GapScanner, plan_requests
+
+    db_manager = DatabaseManager(table_name=BENCH_TABLE)
+    scanner = GapScanner(db_manager)
+    rng = np.random.default_rng(0)
+    results = []
+    try:
+        for size in sizes:
+            execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            db_manager._schema_ready.discard(BENCH_TABLE)
+            db_manager.insert_data(generate_candles(size), symbol=BENCH_SYMBOL, timeframe=BENCH_TIMEFRAME,
+                                   batch_size=200_000)
+            for start in np.sort(rng.choice(size - 10, holes, replace=False)):
+                execute(db_manager, f"DELETE FROM {BENCH_TABLE} WHERE timestamp >= %s AND timestamp < %s",
+                        (1420070400000 + int(start) * 60000, 1420070400000 + int(start + rng.integers(1, 5)) * 60000))
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            gaps = scanner.find_gaps(BENCH_SYMBOL, BENCH_TIMEFRAME)
+            sql_seconds = time.perf_counter() - started
+            sql_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            timestamp = db_manager.query_candles(BENCH_SYMBOL, BENCH_TIMEFRAME, columns=['timestamp'],
+                                                 as_arrays=True)['timestamp']
+            jumps = np.flatnonzero(np.diff(timestamp) > 60000)
+            expected = np.column_stack([timestamp[jumps] + 60000, timestamp[jumps + 1]])
+            python_seconds = time.perf_counter() - started
+            python_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            np.testing.assert_array_equal(gaps, expected)
+            results.append((size, len(gaps), sql_seconds, python_seconds))
+            print(f"rows={size:>10}  gaps={len(gaps):>5} requests={len(plan_requests(gaps, 60000, 1000)):>5}  "
+                  f"sql LAG={sql_seconds:6.2f}s (peak {sql_peak / 2 ** 20:5.1f}MiB)  "
+                  f"load+diff={python_seconds:6.2f}s (peak {python_peak / 2 ** 20:6.1f}MiB)")
+    finally:
+        execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    return results
+
+
+class LegacyColoredConsoleHandler(logging.StreamHandler):
+    """
+    Прежний ColoredConsoleHandler: цвет записывается прямо в record.msg при каждом emit.
+    """
+
+    COLOR_CODES = ColoredConsoleHandler.COLOR_CODES
+
+    def emit(self, record):
+        level_color = self.COLOR_CODES.get(record.levelname, '\033[0m')
+        record.msg = f"{level_color}{record.msg}\033[0m"
+        super().emit(record)
+
+
+def legacy_configure_logger(logger, stream):
+    """
+    Прежний LoggerConfig.configure_logger: новый синхронный обработчик на каждый вызов.
+    """
+    logger.setLevel(logging.DEBUG)
+    handler = LegacyColoredConsoleHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(handler)
+
+
+def bench_logging(calls=(100_000,), threads=4, duplicates=(1, 10), queue_size=10000):
+    """
+    Время вызова логгера в вызывающем потоке под нагрузкой из нескольких потоков.
+
+    Прежняя схема (синхронный вывод, по обработчику на каждый экземпляр компонента - duplicates)
+    сравнивается с очередью и фоновым слушателем. Вывод идёт во временный файл; для очереди
+    дополнительно измеряется время до вывода всех записей и число отброшенных.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        def run(logger, count):
+            per_thread = count // threads
+            latencies = np.empty(per_thread * threads, dtype=np.int64)
+
+            def worker(offset):
+                clock = time.perf_counter_ns
+                for i in range(per_thread):
+                    started = clock()
+                    logger.debug("Свеча %s: close=%s", i, 100.0 + i)
+                    latencies[offset + i] = clock() - started
+
+            workers = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(threads)]
+            started = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            return latencies, time.perf_counter() - started
+
+        for count in calls:
+            line = f"calls={count:>8} threads={threads}"
+            for copies in duplicates:
+                with open(f'{directory}/legacy.log', 'w') as stream:
+                    logger = logging.getLogger(f'bench.legacy.{copies}')
+                    logger.propagate = False
+                    for _ in range(copies):
+                        legacy_configure_logger(logger, stream)
+                    latencies, seconds = run(logger, count)
+                    logger.handlers.clear()
+                results.append((count, f'legacy x{copies}', np.mean(latencies), np.percentile(latencies, 99),
+                                seconds, 0))
+                line += (f"  |  sync x{copies}: {np.mean(latencies) / 1000:6.2f}us "
+                         f"p99={np.percentile(latencies, 99) / 1000:7.2f}us")
+
+            with open(f'{directory}/queue.log', 'w') as stream:
+                console = ColoredConsoleHandler(stream)
+                console.setFormatter(logging.Formatter(LOG_FORMAT))
+                handler, listener = build_queue_logging([console], queue_size)
+                logger = logging.getLogger('bench.queue')
+                logger.propagate = False
+                logger.setLevel(logging.DEBUG)
+                logger.addHandler(handler)
+                listener.start()
+                latencies, seconds = run(logger, count)
+                listener.stop()
+                logger.handlers.clear()
+            results.append((count, 'queue', np.mean(latencies), np.percentile(latencies, 99), seconds,
+                            handler.dropped))
+            print(f"{line}  |  queue: {np.mean(latencies) / 1000:6.2f}us "
+                  f"p99={np.percentile(latencies, 99) / 1000:7.2f}us dropped={handler.dropped}")
+    return results
+
+
+def bench_metrics(calls=(1_000_000,), candles=100_000):
+    """
+    Накладные расходы измерений на вызов: функция без декоратора, timed() и timer()
+    при выключенном и включённом реестре; затем IndicatorEngine.update по candles свечам
+    без декоратора и с ним.
+    """
+    results = []
+    registry = metrics.MetricsRegistry()
+
+    def stage(value):
+        return value
+
+    timed_stage = registry.timed('bench')(stage)
+
+    def with_timer(value):
+        with registry.timer('bench') as timer:
+            timer.rows = 1
+        return value
+
+    for count in calls:
+        line = f"calls={count:>9}"
+        for enabled in (False, True):
+            registry.enabled = enabled
+            for name, func in (('bare', stage), ('timed', timed_stage), ('timer', with_timer)):
+                if name == 'bare' and enabled:
+                    continue
+                started = time.perf_counter()
+                for i in range(count):
+                    func(i)
+                per_call = (time.perf_counter() - started) / count * 1e9
+                label = name if name == 'bare' else f"{name} {'on' if enabled else 'off'}"
+                results.append((count, label, per_call))
+                line += f"  |  {label}: {per_call:6.1f}ns"
+        print(line)
+
+    data = generate_candles(candles)
+    engine_results = []
+    for name, update in (('_update', IndicatorEngine._update), ('update', IndicatorEngine.update)):
+        engine = IndicatorEngine()
+        started = time.perf_counter()
+        for timestamp, high, low, close in zip(data.timestamp.tolist(), data.high_price.tolist(),
+                                               data.low_price.tolist(), data.close_price.tolist()):
+            update(engine, timestamp, high, low, close)
+        engine_results.append(f"{name}: {(time.perf_counter() - started) / candles * 1e6:6.2f}us")
+    print(f"IndicatorEngine candles={candles:>7} (METRICS={int(metrics.registry.enabled)}):  "
+          + '  |  '.join(engine_results))
+    return results
+
+
+def _measure(func, repeat):
+    """
+    Выполняет func repeat раз; возвращает (времена в секундах, результат последнего запуска).
+    """
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - started)
+    return seconds, result
+
+
+def measure_import(module, repeat=5):
+    """
+    Импортирует module в новом интерпретаторе с -X importtime repeat раз.
+
+    Returns:
+        tuple: (накопительное время импорта по каждому запуску в секундах,
+            загруженные при импорте модули из HEAVY_MODULES).
+    """
+    code = f"import sys, {module}; print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    seconds = []
+    heavy = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True,
+                                   text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        # Строки вида 'import time:   self [us] | cumulative | имя модуля'
+        for line in completed.stderr.splitlines():
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == module:
+                seconds.append(int(parts[1]) / 1e6)
+        heavy = [name for name in completed.stdout.strip().split(',') if name]
+    return seconds, heavy
+
+
+def bench_imports(runs=(5,), modules=IMPORT_MODULES):
+    """
+    Время импорта модулей (-X importtime, медиана runs запусков) и тяжёлые зависимости,
+    загруженные при импорте: импорт не должен обращаться к сети и базе данных
+    и подгружать pandas, ccxt, plotly и pyarrow раньше первого использования.
+    """
+    results = []
+    for repeat in runs:
+        for module in modules:
+            seconds, heavy = measure_import(module, repeat)
+            results.append((module, float(np.median(seconds)), heavy))
+            print(f"{module:<20} import={np.median(seconds) * 1000:7.1f}ms  "
+                  f"heavy={','.join(heavy) or '-'}")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def bench_suite(sizes=(10_000, 100_000, 1_000_000), repeat=3, output=None):
+    """
+    Набор замеров основного пути на детерминированных данных: fetch_historical_data (FakeExchange),
+    insert_data, fetch_data_for_chart, calculate_moving_averages, calculate_beer_points и
+    build_candlestick_figure. Для каждого замера сохраняются все времена repeat запусков,
+    минимум и медиана; результаты записываются в JSON вместе с коммитом и версиями библиотек.
+
+    Без доступной базы данных (DB_*) замеры базы пропускаются, остальные выполняются.
+
+    Returns:
+        dict: Записанный отчёт.
+    """
+    import pandas as pd
+
+    db_manager = DatabaseManager(table_name=BENCH_TABLE)
+    try:
+        db_manager.ensure_schema()
+    except Exception as e:
+        print(f"База данных недоступна, замеры insert_data/fetch_data_for_chart пропущены: {e}")
+        db_manager = None
+
+    report = {
+        'commit': _git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'repeat': repeat,
+        'results': [],
+    }
+
+    def record(name, size, seconds, **extra):
+        entry = {'benchmark': name, 'size': size, 'seconds': seconds, 'min': min(seconds),
+                 'median': float(np.median(seconds)), **extra}
+        report['results'].append(entry)
+        print(f"rows={size:>9}  {name:<26} min={entry['min']:9.4f}s  median={entry['median']:9.4f}s  "
+              + (f"{size / entry['min']:>12,.0f} rows/s" if size else ', '.join(extra.get('heavy', ()))))
+
+    # Время импорта - размер 0; heavy - тяжёлые зависимости, загруженные при импорте
+    for module in IMPORT_MODULES:
+        seconds, heavy = measure_import(module, repeat)
+        record(f'import {module}', 0, seconds, heavy=heavy)
+
+    try:
+        for size in sizes:
+            candles = generate_candles(size)
+
+            exchange = FakeExchange(candles)
+            fetcher = HistoricalPriceFetcher(BENCH_SYMBOL, BENCH_TIMEFRAME, size, exchange=exchange)
+            seconds, fetched = _measure(fetcher.fetch_historical_data, repeat)
+            assert len(fetched) == size
+            record('fetch_historical_data', size, seconds)
+
+            if db_manager is not None:
+                def insert():
+                    execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+                    db_manager._schema_ready.discard(BENCH_TABLE)
+                    db_manager.ensure_schema()
+                    started = time.perf_counter()
+                    inserted = db_manager.insert_data(candles, symbol=BENCH_SYMBOL, timeframe=BENCH_TIMEFRAME,
+                                                      raise_errors=True)
+                    assert inserted == size
+                    return time.perf_counter() - started
+
+                # Пересоздание таблицы в замер не входит
+                record('insert_data', size, [insert() for _ in range(repeat)])
+                seconds, frame = _measure(lambda: db_manager.fetch_data_for_chart(BENCH_SYMBOL, BENCH_TIMEFRAME),
+                                          repeat)
+                assert len(frame) == size
+                record('fetch_data_for_chart', size, seconds)
+
+            frame = candles.to_frame(index='timestamp')
+            seconds, frame_with_ma = _measure(lambda: calculate_moving_averages(frame.copy()), repeat)
+            record('calculate_moving_averages', size, seconds)
+            seconds, _ = _measure(lambda: calculate_beer_points(frame), repeat)
+            record('calculate_beer_points', size, seconds)
+            seconds, _ = _measure(lambda: build_candlestick_figure(candles, moving_averages={
+                '3-day MA': (frame_with_ma['3_day_ma_shifted'], 'green'),
+                '5-day MA': (frame_with_ma['5_day_ma_shifted'], 'blue'),
+                '25-day MA': (frame_with_ma['25_day_ma_shifted'], 'red'),
+            }, pivot_length=1), repeat)
+            record('build_candlestick_figure', size, seconds)
+    finally:
+        if db_manager is not None:
+            execute(db_manager, f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+
+    if output is None:
+        os.makedirs(SUITE_RESULTS_DIR, exist_ok=True)
+        output = os.path.join(SUITE_RESULTS_DIR, f"{report['commit']}.json")
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Результаты записаны в {output}")
+    return report
+
+
+def compare_results(baseline_path, current_path, threshold=0.10):
+    """
+    Сравнивает два отчёта suite по минимальному времени каждого замера.
+
+    Parameters:
+        threshold (float): Относительное замедление, начиная с которого замер считается регрессией.
+
+    Returns:
+        list: Регрессии (замер, размер, время базы, текущее время).
+    """
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = json.load(file)
+    with open(current_path, encoding='utf-8') as file:
+        current = json.load(file)
+    previous = {(entry['benchmark'], entry['size']): entry['min'] for entry in baseline['results']}
+
+    regressions = []
+    print(f"{baseline['commit']} -> {current['commit']}")
+    for entry in current['results']:
+        key = (entry['benchmark'], entry['size'])
+        if key not in previous:
+            continue
+        ratio = entry['min'] / previous[key]
+        marker = ''
+        if ratio > 1 + threshold:
+            marker = '  РЕГРЕССИЯ'
+            regressions.append((*key, previous[key], entry['min']))
+        print(f"rows={key[1]:>9}  {key[0]:<26} {previous[key]:9.4f}s -> {entry['min']:9.4f}s  "
+              f"x{ratio:5.2f}{marker}")
+    return regressions
+
+
+BENCHMARKS = {
+    'insert': bench_insert,
+    'pivots': bench_pivots,
+    'replay': bench_replay,
+    'cache': bench_cache,
+    'pipeline': bench_pipeline,
+    'candles': bench_candles,
+    'account': bench_account,
+    'capture': bench_capture,
+    'backtest': bench_backtest,
+    'sweep': bench_sweep,
+    'chart': bench_chart,
+    'live': bench_live,
+    'resample': bench_resample,
+    'gaps': bench_gaps,
+    'logging': bench_logging,
+    'metrics': bench_metrics,
+    'suite': bench_suite,
+    'imports': bench_imports,
+}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == 'compare':
+        sys.exit(1 if compare_results(sys.argv[2], sys.argv[3]) else 0)
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Использование: python benchmarks.py {{{'|'.join(BENCHMARKS)}}} [размеры...]\n"
+              f"               python benchmarks.py compare базовый.json новый.json")
+        sys.exit(1)
+    arguments = [int(size) for size in sys.argv[2:]]
+    if arguments:
+        BENCHMARKS[sys.argv[1]](arguments)
+    else:
+        BENCHMARKS[sys.argv[1]]()
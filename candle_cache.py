@@ -0,0 +1,214 @@
+import logging
+import os
+import shutil
+
+import numpy as np
+from custom_logger import LoggerConfig
+from configuration_default import DefaultConfig
+
+DEFAULT_CACHE_DIR = os.getenv('CANDLE_CACHE_DIR',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'candles'))
+
+
+def candle_schema():
+    """
+    Схема файлов кэша (pyarrow импортируется только при работе с кэшем).
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        ('timestamp', pa.int64()),
+        ('open_price', pa.float64()),
+        ('high_price', pa.float64()),
+        ('low_price', pa.float64()),
+        ('close_price', pa.float64()),
+        ('volume', pa.float64()),
+    ])
+
+
+def _directory(root, symbol, timeframe):
+    return os.path.join(root, symbol.replace('/', '_'), timeframe)
+
+
+def _month_name(month):
+    # month - номер месяца от 1970-01
+    return f'{1970 + month // 12:04d}-{month % 12 + 1:02d}.arrow'
+
+
+def invalidate(symbol, timeframe, since, root=None):
+    """
+    Удаляет из кэша файлы месяцев, начиная с месяца свечи since.
+
+    Вызывается компонентами, которые записывают в базу свечи старше последней закэшированной
+    (загрузка истории, восстановление пропусков, пересчёт старших интервалов): обычное
+    обновление кэша догружает только новые свечи и таких изменений не увидит. После удаления
+    CandleCache.refresh догружает удалённые месяцы из базы заново.
+
+    Parameters:
+        symbol (str): Символ инструмента.
+        timeframe (str): Временной интервал.
+        since (int): Время самой ранней изменённой свечи, мс.
+        root (str): Каталог кэша (по умолчанию: DEFAULT_CACHE_DIR).
+
+    Returns:
+        int: Количество удалённых файлов.
+    """
+    directory = _directory(root or DEFAULT_CACHE_DIR, symbol, timeframe)
+    if not os.path.isdir(directory):
+        return 0
+    first = _month_name(int(np.datetime64(int(since), 'ms').astype('datetime64[M]').astype(np.int64)))
+    removed = 0
+    for name in os.listdir(directory):
+        if name.endswith('.arrow') and name >= first:
+            os.remove(os.path.join(directory, name))
+            removed += 1
+    return removed
+
+
+class CandleCache:
+    """
+    Локальный столбцовый кэш свечей перед базой данных.
+
+    Свечи хранятся в несжатых файлах Arrow IPC, разбитых по инструменту, интервалу и месяцу:
+    <root>/<symbol>/<timeframe>/<YYYY-MM>.arrow. Файлы читаются через отображение в память,
+    поэтому загрузка не копирует данные, а повторные чтения берутся из страничного кэша ОС.
+    Обновление инкрементальное: из базы запрашиваются только свечи, начиная с последней
+    закэшированной, и перезаписываются только затронутые месяцы. Компоненты, изменяющие
+    более старые свечи, удаляют затронутые месяцы функцией invalidate.
+
+    Parameters:
+        db_manager (DatabaseManager): Источник свечей.
+        root (str): Каталог кэша (по умолчанию: DEFAULT_CACHE_DIR или переменная CANDLE_CACHE_DIR).
+    """
+
+    def __init__(self, db_manager, root=DEFAULT_CACHE_DIR):
+        self.db_manager = db_manager
+        self.root = root
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    def _directory(self, symbol, timeframe):
+        return _directory(self.root, symbol, timeframe)
+
+    def _partitions(self, symbol, timeframe):
+        directory = self._directory(symbol, timeframe)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.arrow'))
+
+    def invalidate(self, symbol, timeframe, since):
+        """
+        Удаляет месяцы кэша, начиная с месяца свечи since (см. функцию invalidate).
+        """
+        return invalidate(symbol, timeframe, since, root=self.root)
+
+    @staticmethod
+    def _read(path):
+        import pyarrow as pa
+
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+    @staticmethod
+    def _write(path, table):
+        import pyarrow as pa
+
+        temporary = path + '.tmp'
+        with pa.OSFile(temporary, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temporary, path)
+
+    def last_timestamp(self, symbol, timeframe):
+        """
+        Метка времени последней закэшированной свечи или None.
+        """
+        partitions = self._partitions(symbol, timeframe)
+        if not partitions:
+            return None
+        table = self._read(partitions[-1])
+        if not table.schema.equals(candle_schema()):
+            # Кэш прежнего формата (например, с датами вместо миллисекунд) строится заново
+            self.logger.info("Формат кэша %s %s устарел, кэш будет построен заново.", symbol, timeframe)
+            shutil.rmtree(self._directory(symbol, timeframe))
+            return None
+        if table.num_rows == 0:
+            return None
+        return table.column('timestamp')[-1].as_py()
+
+    def refresh(self, symbol=None, timeframe=None):
+        """
+        Догружает в кэш свечи из базы данных, начиная с последней закэшированной.
+
+        Последняя закэшированная свеча запрашивается повторно: в базе она могла быть
+        перезаписана закрытой версией.
+
+        Returns:
+            int: Количество полученных из базы свечей.
+        """
+        import pandas as pd
+        import pyarrow as pa
+
+        config = DefaultConfig()
+        symbol = symbol or config.symbol
+        timeframe = timeframe or config.timeframe
+
+        frame = self.db_manager.fetch_candles_since(symbol, timeframe, since=self.last_timestamp(symbol, timeframe))
+        if frame.empty:
+            return 0
+
+        directory = self._directory(symbol, timeframe)
+        os.makedirs(directory, exist_ok=True)
+        # Номер месяца от 1970-01 для каждой свечи, без разбора дат по строкам
+        months = frame['timestamp'].to_numpy().astype('datetime64[ms]').astype('datetime64[M]').astype(np.int64)
+        schema = candle_schema()
+        for month, rows in frame.groupby(months, sort=True):
+            path = os.path.join(directory, _month_name(month))
+            table = pa.Table.from_pandas(rows, schema=schema, preserve_index=False)
+            if os.path.exists(path):
+                cached = self._read(path).to_pandas()
+                merged = pd.concat([cached, rows], ignore_index=True)
+                merged = merged.drop_duplicates('timestamp', keep='last').sort_values('timestamp')
+                table = pa.Table.from_pandas(merged, schema=schema, preserve_index=False)
+            self._write(path, table)
+
+        self.logger.debug("Кэш свечей %s %s обновлён: %s строк.", symbol, timeframe, len(frame))
+        return len(frame)
+
+    def load_table(self, symbol=None, timeframe=None, refresh=True):
+        """
+        Возвращает свечи в виде pyarrow.Table, отображённой в память (без копирования).
+        """
+        import pyarrow as pa
+
+        config = DefaultConfig()
+        symbol = symbol or config.symbol
+        timeframe = timeframe or config.timeframe
+        if refresh:
+            self.refresh(symbol, timeframe)
+
+        tables = [self._read(path) for path in self._partitions(symbol, timeframe)]
+        if not tables:
+            return candle_schema().empty_table()
+        return pa.concat_tables(tables)
+
+    def load(self, symbol=None, timeframe=None, refresh=True, arrow_backed=False):
+        """
+        Возвращает свечи в формате fetch_data_for_chart.
+
+        Parameters:
+            arrow_backed (bool): Столбцы pd.ArrowDtype поверх отображённых в память буферов,
+                без копирования. Иначе столбцы - массивы NumPy: без копирования, если данные
+                лежат в одном месяце, и с одним объединением буферов, если в нескольких.
+
+        Returns:
+            pd.DataFrame: Фрейм со столбцами CANDLE_COLUMNS.
+        """
+        table = self.load_table(symbol, timeframe, refresh=refresh)
+        if arrow_backed:
+            import pandas as pd
+
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        return table.to_pandas(split_blocks=True)
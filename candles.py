@@ -0,0 +1,150 @@
+import numpy as np
+
+# Столбцы свечи в порядке, в котором их возвращает биржа (и ожидает insert_data)
+CANDLE_COLUMNS = ('timestamp', 'open_price', 'high_price', 'low_price', 'close_price', 'volume')
+
+# Типы массивов столбцов; timestamp - миллисекунды Unix (UTC)
+CANDLE_DTYPES = {
+    'timestamp': 'int64',
+    'open_price': 'float64',
+    'high_price': 'float64',
+    'low_price': 'float64',
+    'close_price': 'float64',
+    'volume': 'float64',
+}
+
+
+class CandleBatch:
+    """
+    Компактный набор свечей: по одному массиву NumPy фиксированного типа на столбец.
+
+    Свеча занимает 48 байт вместо нескольких сотен у списка из шести объектов Python.
+    Срез возвращает набор представлений тех же массивов, без копирования; фрейм pandas
+    (to_frame) также строится поверх этих массивов.
+
+    Parameters:
+        timestamp (array-like): Метки времени, миллисекунды Unix (UTC).
+        open_price, high_price, low_price, close_price, volume (array-like): Значения столбцов.
+
+    Attributes:
+        timestamp, open_price, high_price, low_price, close_price, volume (np.ndarray):
+            Одномерные массивы одинаковой длины с типами CANDLE_DTYPES.
+    """
+
+    __slots__ = CANDLE_COLUMNS
+
+    def __init__(self, timestamp, open_price, high_price, low_price, close_price, volume):
+        values = (timestamp, open_price, high_price, low_price, close_price, volume)
+        for column, column_values in zip(CANDLE_COLUMNS, values):
+            array = np.asarray(column_values, dtype=CANDLE_DTYPES[column])
+            if array.ndim != 1:
+                raise ValueError(f"Столбец {column} должен быть одномерным")
+            object.__setattr__(self, column, array)
+        if len({len(getattr(self, column)) for column in CANDLE_COLUMNS}) > 1:
+            raise ValueError("Столбцы свечей имеют разную длину")
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Создаёт набор из свечей в формате биржи [timestamp, open, high, low, close, volume, ...].
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return cls.empty()
+        # Одно преобразование всей таблицы; миллисекунды (< 2**53) представимы в float64 точно
+        values = np.array(rows, dtype=np.float64)[:, :len(CANDLE_COLUMNS)]
+        return cls(*(np.ascontiguousarray(values[:, i]) for i in range(len(CANDLE_COLUMNS))))
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Создаёт набор из словаря массивов (например, query_candles(as_arrays=True)) без копирования.
+        """
+        return cls(*(arrays[column] for column in CANDLE_COLUMNS))
+
+    @classmethod
+    def from_frame(cls, frame):
+        """
+        Создаёт набор из фрейма со столбцами CANDLE_COLUMNS (timestamp может быть индексом).
+        """
+        columns = [frame.index.to_numpy() if column == 'timestamp' and column not in frame
+                   else frame[column].to_numpy() for column in CANDLE_COLUMNS]
+        return cls(*columns)
+
+    @classmethod
+    def empty(cls):
+        return cls(*([] for _ in CANDLE_COLUMNS))
+
+    @classmethod
+    def concat(cls, batches):
+        """
+        Объединяет наборы в один (с копированием столбцов).
+        """
+        batches = list(batches)
+        if not batches:
+            return cls.empty()
+        return cls(*(np.concatenate([getattr(batch, column) for batch in batches]) for column in CANDLE_COLUMNS))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CandleBatch неизменяем")
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __getitem__(self, key):
+        """
+        Целый индекс - свеча в виде кортежа; срез - набор представлений без копирования;
+        маска или массив индексов - новый набор (NumPy копирует выбранные строки).
+        """
+        if isinstance(key, (int, np.integer)):
+            return tuple(getattr(self, column)[key].item() for column in CANDLE_COLUMNS)
+        return CandleBatch(*(getattr(self, column)[key] for column in CANDLE_COLUMNS))
+
+    def __iter__(self):
+        """
+        Свечи в виде кортежей (timestamp, open, high, low, close, volume) из значений Python.
+        """
+        return zip(*(getattr(self, column).tolist() for column in CANDLE_COLUMNS))
+
+    def __repr__(self):
+        if not len(self):
+            return 'CandleBatch(0 свечей)'
+        return f'CandleBatch({len(self)} свечей, {self.timestamp[0]}..{self.timestamp[-1]})'
+
+    @property
+    def nbytes(self):
+        """
+        Объём данных столбцов в байтах.
+        """
+        return sum(getattr(self, column).nbytes for column in CANDLE_COLUMNS)
+
+    def split(self, size):
+        """
+        Делит набор на последовательные части не длиннее size свечей (представления, без копирования).
+        """
+        for start in range(0, len(self), size):
+            yield self[start:start + size]
+
+    def as_arrays(self):
+        """
+        Словарь массивов столбцов в формате query_candles(as_arrays=True).
+        """
+        return {column: getattr(self, column) for column in CANDLE_COLUMNS}
+
+    def to_frame(self, index=None):
+        """
+        Фрейм pandas поверх массивов набора, без копирования.
+
+        Parameters:
+            index (str): Столбец, который станет индексом (например, 'timestamp').
+
+        Returns:
+            pd.DataFrame: Фрейм со столбцами CANDLE_COLUMNS.
+        """
+        import pandas as pd
+
+        arrays = self.as_arrays()
+        if index is None:
+            return pd.DataFrame(arrays, columns=list(CANDLE_COLUMNS), copy=False)
+        index_values = pd.Index(arrays.pop(index), name=index, copy=False)
+        return pd.DataFrame(arrays, index=index_values, copy=False)
@@ -0,0 +1,429 @@
+import argparse
+import json
+import logging
+import math
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from candles import CandleBatch
+from custom_logger import LoggerConfig
+from timeutils import candle_open_time
+from streaming_indicators import IndicatorEngine
+
+# Интервал комментария keep-alive в потоке событий: по нему же обнаруживаются отключившиеся клиенты
+HEARTBEAT_INTERVAL = 15.0
+
+
+def _json_number(value):
+    # JSON.parse в браузере не принимает NaN
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else value
+
+
+def _encode_event(event, data):
+    """
+    Событие Server-Sent Events, сериализованное один раз для всех подписчиков.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class Subscriber:
+    """
+    Очередь событий одного клиента. Если клиент не успевает читать и очередь переполняется,
+    он отключается (dropped) и при переподключении получает свежий снимок.
+    """
+
+    __slots__ = ('events', 'dropped')
+
+    def __init__(self, size):
+        self.events = queue.Queue(maxsize=size)
+        self.dropped = False
+
+
+class SymbolFeed:
+    """
+    Источник живых свечей одной пары symbol/timeframe для всех клиентов.
+
+    Опрос базы данных выполняет один поток на пару и только пока есть подписчики;
+    каждый опрос запрашивает закрытые свечи после последней известной. Текущая, ещё не
+    закрытая свеча не показывается: её значения меняются, а индикаторы по ней пришлось бы
+    пересчитывать. Новые свечи проходят через IndicatorEngine, и клиентам рассылается
+    только новая свеча со значениями скользящих средних и точкой разворота ('candle').
+    Количество запросов к базе не зависит от количества клиентов.
+
+    Parameters:
+        db_manager (DatabaseManager): Источник свечей.
+        symbol (str): Символ инструмента.
+        timeframe (str): Временной интервал.
+        cache (CandleCache): Локальный кэш для начального снимка; None - запрос диапазона к базе.
+        history (int): Сколько последних свечей держать для снимка.
+        poll_interval (float): Период опроса базы, секунды.
+        pivot_length (int): Окно точек разворота.
+        queue_size (int): Размер очереди событий клиента.
+    """
+
+    def __init__(self, db_manager, symbol, timeframe, cache=None, history=1000, poll_interval=2.0,
+                 pivot_length=1, queue_size=1000):
+        self.db_manager = db_manager
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.cache = cache
+        self.history = history
+        self.poll_interval = poll_interval
+        self.pivot_length = pivot_length
+        self.queue_size = queue_size
+        self.polls = 0
+        # Часы для определения текущей незакрытой свечи, секунды (подменяются в тестах)
+        self.clock = time.time
+
+        self._engine = IndicatorEngine(pivot_length=pivot_length)
+        self._candles = deque(maxlen=history)
+        self._moving_averages = {column: deque(maxlen=history) for column in self._engine.moving_averages}
+        self._pivots = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    @property
+    def name(self):
+        return f'{self.symbol}:{self.timeframe}'
+
+    def open_time(self):
+        """
+        Время открытия текущей незакрытой свечи, мс: свечи с этим временем и позже не показываются.
+        """
+        now = int(self.clock() * 1000)
+        return candle_open_time(self.timeframe, now)
+
+    def load_initial(self):
+        """
+        Загружает последние history закрытых свечей из кэша (или запросом к базе) и прогревает индикаторы.
+        """
+        open_time = self.open_time()
+        if self.cache is not None:
+            candles = CandleBatch.from_frame(self.cache.load(self.symbol, self.timeframe))
+            candles = candles[candles.timestamp < open_time][-self.history:]
+        else:
+            candles = CandleBatch.from_arrays(self.db_manager.query_candles(
+                self.symbol, self.timeframe, end=open_time, limit=self.history, as_arrays=True))
+        moving_averages, pivots = self._engine.warm_up(candles)
+        with self._lock:
+            self._candles.extend(list(candle) for candle in candles)
+            for column, values in self._moving_averages.items():
+                values.extend(moving_averages[column].tolist())
+            self._pivots.extend(self._pivot_json(pivot) for pivot in pivots)
+        self.logger.debug("График %s: загружено свечей %s.", self.name, len(candles))
+
+    @staticmethod
+    def _pivot_json(pivot):
+        return {'type': pivot['Pivot Type'], 'value': pivot['Pivot Value'], 'timestamp': int(pivot['Date'])}
+
+    def snapshot(self):
+        return {
+            'pair': self.name,
+            'candles': [[_json_number(value) for value in candle] for candle in self._candles],
+            'moving_averages': {column: [_json_number(value) for value in values]
+                                for column, values in self._moving_averages.items()},
+            'pivots': list(self._pivots),
+        }
+
+    def subscribe(self):
+        """
+        Регистрирует клиента.
+
+        Returns:
+            tuple: (Subscriber, закодированный снимок). Снимок и регистрация выполняются под
+                одной блокировкой, поэтому ни одно событие не теряется и не дублируется.
+        """
+        subscriber = Subscriber(self.queue_size)
+        with self._lock:
+            snapshot = _encode_event('snapshot', self.snapshot())
+            self._subscribers.add(subscriber)
+        self._wakeup.set()
+        return subscriber, snapshot
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _publish(self, payload):
+        # Вызывается под self._lock
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.events.put_nowait(payload)
+            except queue.Full:
+                subscriber.dropped = True
+                self._subscribers.discard(subscriber)
+                self.logger.warning("График %s: клиент не успевает читать события и отключён.", self.name)
+
+    def poll(self):
+        """
+        Запрашивает закрытые свечи после последней известной и рассылает их.
+
+        Returns:
+            int: Количество разосланных событий.
+        """
+        last = self._candles[-1] if self._candles else None
+        arrays = self.db_manager.query_candles(self.symbol, self.timeframe,
+                                               start=last[0] + 1 if last else None, end=self.open_time(),
+                                               limit=None if last else self.history, as_arrays=True)
+        self.polls += 1
+        events = 0
+        with self._lock:
+            for candle in CandleBatch.from_arrays(arrays):
+                candle = list(candle)
+                indicators = self._engine.update(candle[0], candle[2], candle[3], candle[4])
+                if indicators is None:
+                    # Свеча уже разослана
+                    continue
+                values, pivot = indicators
+                self._candles.append(candle)
+                for column, value in values.items():
+                    self._moving_averages[column].append(value)
+                data = {'candle': candle,
+                        'moving_averages': {column: _json_number(value) for column, value in values.items()}}
+                if pivot is not None:
+                    data['pivot'] = self._pivot_json(pivot)
+                    self._pivots.append(data['pivot'])
+                self._publish(_encode_event('candle', data))
+                events += 1
+        return events
+
+    def run(self):
+        while not self._stopped.is_set():
+            if not self._subscribers:
+                # Без клиентов база не опрашивается; пропущенное догружается при первом опросе
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            try:
+                self.poll()
+            except Exception:
+                self.logger.exception("Ошибка опроса свечей %s.", self.name)
+            self._stopped.wait(self.poll_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=f'chart-feed-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Charts</title>
+<script src="https://cdn.plot.ly/plotly-2.35.2.min.js"></script>
+<style>body {margin: 0; font-family: sans-serif} .chart {height: %(height)s}</style>
+</head>
+<body>
+<div id="charts"></div>
+<script>
+const COLORS = {'3_day_ma_shifted': 'green', '5_day_ma_shifted': 'blue', '25_day_ma_shifted': 'red'};
+const HISTORY = %(history)s;
+const time = ms => new Date(ms).toISOString().replace('T', ' ').slice(0, 19);
+
+function openChart(pair) {
+    const div = document.createElement('div');
+    div.className = 'chart';
+    document.getElementById('charts').appendChild(div);
+    let state = null;
+
+    function render() {
+        const x = state.candles.map(c => time(c[0]));
+        const traces = [{type: 'candlestick', name: pair, x: x,
+                         open: state.candles.map(c => c[1]), high: state.candles.map(c => c[2]),
+                         low: state.candles.map(c => c[3]), close: state.candles.map(c => c[4])}];
+        for (const [column, values] of Object.entries(state.moving_averages)) {
+            traces.push({type: 'scatter', mode: 'lines', name: column, x: x, y: values,
+                         line: {color: COLORS[column]}});
+        }
+        // Снимок пары без сохранённых свечей пуст: точки разворота показываются только вместе со свечами
+        const first = state.candles.length ? state.candles[0][0] : Infinity;
+        const pivots = state.pivots.filter(p => p.timestamp >= first);
+        traces.push({type: 'scatter', mode: 'lines+markers', name: 'Beer Points',
+                     x: pivots.map(p => time(p.timestamp)), y: pivots.map(p => p.value),
+                     line: {color: 'gray', width: 2},
+                     marker: {size: 10, color: pivots.map(p => p.type.includes('High') ? 'red' : 'green'),
+                              symbol: pivots.map(p => p.type.includes('High') ? 'triangle-down' : 'triangle-up')}});
+        Plotly.react(div, traces, {title: pair, xaxis: {rangeslider: {visible: false}}, uirevision: pair});
+    }
+
+    const source = new EventSource('/events?pair=' + encodeURIComponent(pair));
+    source.addEventListener('snapshot', e => { state = JSON.parse(e.data); render(); });
+    source.addEventListener('candle', e => {
+        const data = JSON.parse(e.data);
+        state.candles.push(data.candle);
+        for (const [column, value] of Object.entries(data.moving_averages)) {
+            state.moving_averages[column].push(value);
+        }
+        if (data.pivot) state.pivots.push(data.pivot);
+        if (state.candles.length > HISTORY) {
+            state.candles.shift();
+            for (const values of Object.values(state.moving_averages)) values.shift();
+        }
+        render();
+    });
+}
+
+fetch('/pairs').then(r => r.json()).then(pairs => pairs.forEach(openChart));
+</script>
+</body>
+</html>
+"""
+
+
+class ChartRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /        - страница с графиками всех пар;
+    GET /pairs   - список пар (JSON);
+    GET /events?pair=SYMBOL:TIMEFRAME - поток Server-Sent Events: снимок, затем изменения.
+    """
+
+    server_version = 'ChartServer'
+
+    def log_message(self, format, *args):
+        self.server.chart_server.logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        chart_server = self.server.chart_server
+        url = urlparse(self.path)
+        if url.path == '/':
+            self._send(chart_server.page().encode(), 'text/html; charset=utf-8')
+        elif url.path == '/pairs':
+            self._send(json.dumps(list(chart_server.feeds)).encode(), 'application/json')
+        elif url.path == '/events':
+            feed = chart_server.feeds.get(parse_qs(url.query).get('pair', [''])[0])
+            if feed is None:
+                self.send_error(404, 'Unknown pair')
+                return
+            self._stream(feed)
+        else:
+            self.send_error(404)
+
+    def _stream(self, feed):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        subscriber, snapshot = feed.subscribe()
+        try:
+            self.wfile.write(snapshot)
+            self.wfile.flush()
+            while not subscriber.dropped and not self.server.chart_server.stopped.is_set():
+                try:
+                    payload = subscriber.events.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    payload = b': keep-alive\n\n'
+                self.wfile.write(payload)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            feed.unsubscribe(subscriber)
+
+
+class ChartServer:
+    """
+    Локальный сервер живых графиков для нескольких пар.
+
+    Для каждой пары работает один SymbolFeed; браузер получает начальный снимок и затем
+    только изменения через Server-Sent Events, поэтому ни перезапуск скрипта, ни полная
+    перезагрузка таблицы для новой свечи не нужны.
+
+    Parameters:
+        pairs (list): Пары (symbol, timeframe).
+        db_manager (DatabaseManager): Источник свечей.
+        host (str): Адрес сервера.
+        port (int): Порт сервера.
+        cache (CandleCache): Локальный кэш для начальных снимков (см. SymbolFeed).
+        history (int): Сколько последних свечей показывать.
+        poll_interval (float): Период опроса базы, секунды.
+    """
+
+    def __init__(self, pairs, db_manager, host='127.0.0.1', port=8050, cache=None, history=1000, poll_interval=2.0):
+        self.history = history
+        self.feeds = {}
+        for symbol, timeframe in pairs:
+            feed = SymbolFeed(db_manager, symbol, timeframe, cache=cache, history=history,
+                              poll_interval=poll_interval)
+            self.feeds[feed.name] = feed
+        self.stopped = threading.Event()
+        self.httpd = ThreadingHTTPServer((host, port), ChartRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.chart_server = self
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def page(self):
+        height = '100vh' if len(self.feeds) == 1 else f'{max(40, 100 // len(self.feeds))}vh'
+        return PAGE % {'height': height, 'history': self.history}
+
+    def start(self):
+        """
+        Загружает начальные снимки, запускает опрос и сервер в фоновых потоках.
+        """
+        for feed in self.feeds.values():
+            feed.load_initial()
+            feed.start()
+        thread = threading.Thread(target=self.httpd.serve_forever, name='chart-server', daemon=True)
+        thread.start()
+        self.logger.info("Сервер графиков: %s (%s).", self.url, ', '.join(self.feeds))
+        return thread
+
+    def stop(self):
+        self.stopped.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for feed in self.feeds.values():
+            feed.stop()
+
+
+if __name__ == '__main__':
+    from database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description='Локальный сервер живых графиков свечей.')
+    parser.add_argument('pairs', nargs='+', help="Пары 'SYMBOL:TIMEFRAME', например BTC/USDT:1m ETH/USDT:15m")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--history', type=int, default=1000, help='Сколько последних свечей показывать')
+    parser.add_argument('--poll', type=float, default=2.0, help='Период опроса базы, секунды')
+    parser.add_argument('--cache', action='store_true', help='Начальные снимки из локального кэша свечей')
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    cache = None
+    if args.cache:
+        from candle_cache import CandleCache
+        cache = CandleCache(db_manager)
+    server = ChartServer([pair.rsplit(':', 1) for pair in args.pairs], db_manager, host=args.host,
+                         port=args.port, cache=cache, history=args.history, poll_interval=args.poll)
+    server.start().join()
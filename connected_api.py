@@ -1,37 +1,92 @@
 from binance_f import RequestClient
-from io import StringIO
-import sys
+from binance_f.impl.restapiinvoker import check_response, get_limits_usage
+from binance_f.impl.utils import parse_json_from_string
+from binance_f.model.constant import OrderRespType, PositionSide, TimeInForce, WorkingType
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
 from custom_logger import LoggerConfig
+from metrics import timed
+from output_capture import capture_output
+
+# Адреса фьючерсов Binance: тестовая сеть используется, пока testnet не отключён явно
+TESTNET_URL = 'https://testnet.binancefuture.com'
+MAINNET_URL = 'https://fapi.binance.com'
 
 
 class ConnectedAPI:
     """
     Класс ConnectedAPI представляет подключение к API.
 
+    Все запросы выполняются одним клиентом RequestClient через общую сессию requests
+    с постоянными соединениями (keep-alive), поэтому TLS-соединение устанавливается один раз.
+    Баланс и позиции кэшируются на cache_ttl секунд: повторные чтения в пределах торгового
+    цикла не обращаются к бирже. После событий по ордерам кэш сбрасывается
+    (invalidate_account_state).
+
+    Методы можно вызывать из нескольких потоков одновременно: вывод библиотеки перехватывается
+    отдельно для каждого вызова (output_capture), а не переключением sys.stdout.
+
     Parameters:
         api_key (str): Ключ API для аутентификации.
         secret_key (str): Секретный ключ для дополнительной аутентификации.
+        url (str): Адрес REST API (по умолчанию: TESTNET_URL, при testnet=False - MAINNET_URL);
+            позволяет подключиться к локальной заглушке HTTP.
+        cache_ttl (float): Время жизни кэша состояния аккаунта, секунды (0 - без кэша).
+        timeout (float): Таймаут HTTP-запроса, секунды.
+        max_workers (int): Количество потоков для параллельных запросов (и соединений сессии).
+        testnet (bool): Тестовая сеть Binance; реальные ордера - только при testnet=False.
 
     Attributes:
         api_key (str): Ключ API для аутентификации.
         secret_key (str): Секретный ключ для дополнительной аутентификации.
+        client (RequestClient): Клиент API, создаётся один раз.
+        session (requests.Session): Сессия HTTP с пулом постоянных соединений.
         logger (logging.Logger): Объект логгера для записи сообщений.
 
     Methods:
         __init__: Инициализация объекта ConnectedAPI с указанием ключей API и настройки логгера.
+        get_account_state: Баланс и позиции, запрошенные параллельно.
+        get_stats: Доля попаданий в кэш и задержки запросов к API.
     """
 
-    def __init__(self, api_key, secret_key):
+    def __init__(self, api_key, secret_key, url=None, cache_ttl=5.0, timeout=10.0, max_workers=4, testnet=True):
         """
         Инициализация объекта ConnectedAPI.
 
         Parameters:
             api_key (str): Ключ API для аутентификации.
             secret_key (str): Секретный ключ для дополнительной аутентификации.
+            url (str): Адрес REST API (по умолчанию: TESTNET_URL или MAINNET_URL).
+            cache_ttl (float): Время жизни кэша состояния аккаунта, секунды.
+            timeout (float): Таймаут HTTP-запроса, секунды.
+            max_workers (int): Количество потоков для параллельных запросов.
+            testnet (bool): Подключение к тестовой сети Binance.
         """
         self.api_key = api_key
         self.secret_key = secret_key
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.testnet = testnet
+
+        client_options = {'api_key': api_key, 'secret_key': secret_key, 'testnet': testnet,
+                          'url': url or (TESTNET_URL if testnet else MAINNET_URL)}
+        self.client = RequestClient(**client_options)
+        self.session = requests.Session()
+        # По соединению на поток: параллельные запросы не ждут освобождения соединения
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = None
+
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'requests': 0, 'errors': 0,
+                       'latency_total': 0.0, 'latency_max': 0.0}
 
         # Конфигурация логгера
         self.logger = logging.getLogger(__name__)
@@ -49,12 +104,141 @@ class ConnectedAPI:
         self.logger.error('Error message')
         self.logger.exception('Critical message')
 
+    @timed('api_request')
+    def _execute(self, request):
+        """
+        Выполняет подготовленный запрос RequestClient через общую сессию и разбирает ответ.
+        """
+        started = time.perf_counter()
+        try:
+            response = self.session.request(request.method, request.host + request.url,
+                                            headers=request.header, timeout=self.timeout)
+        except Exception:
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            with self._lock:
+                self._stats['requests'] += 1
+                self._stats['latency_total'] += latency
+                self._stats['latency_max'] = max(self._stats['latency_max'], latency)
+
+        self.client.refresh_limits(get_limits_usage(response))
+        json_wrapper = parse_json_from_string(response.text)
+        check_response(json_wrapper)
+        return request.json_parser(json_wrapper)
+
+    def _call(self, build):
+        """
+        Формирует запрос функцией build(request_impl) и выполняет его.
+
+        RequestClient печатает формируемые запросы в стандартный вывод; вывод перехватывается
+        только для текущего вызова и возвращается вместе с результатом.
+
+        Returns:
+            tuple: (результат запроса, захваченный вывод).
+        """
+        with capture_output() as output:
+            request = build(self.client.request_impl)
+        return self._execute(request), output.getvalue().strip()
+
+    def _cached(self, key, load):
+        """
+        Возвращает значение кэша key, если оно не старше cache_ttl, иначе вызывает load().
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+
+        value = load()
+        if self.cache_ttl > 0:
+            with self._lock:
+                self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+        return value
+
+    def invalidate_account_state(self):
+        """
+        Сбрасывает кэш баланса и позиций; вызывается после размещения, отмены и исполнения ордеров.
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def post_order(self, symbol, side, ordertype, timeInForce=TimeInForce.INVALID, quantity=None, reduceOnly=None,
+                   price=None, newClientOrderId=None, stopPrice=None, workingType=WorkingType.INVALID,
+                   closePosition=None, positionSide=PositionSide.INVALID, callbackRate=None, activationPrice=None,
+                   newOrderRespType=OrderRespType.INVALID):
+        """
+        Размещает ордер (параметры RequestClient.post_order) через общую сессию
+        и сбрасывает кэш состояния аккаунта.
+        """
+        try:
+            order, _ = self._call(lambda impl: impl.post_order(
+                symbol, side, ordertype, timeInForce, quantity, reduceOnly, price, newClientOrderId, stopPrice,
+                workingType, closePosition, positionSide, callbackRate, activationPrice, newOrderRespType))
+            return order
+        finally:
+            self.invalidate_account_state()
+
+    def cancel_order(self, symbol, order_id=None, client_order_id=None):
+        """
+        Отменяет ордер и сбрасывает кэш состояния аккаунта.
+        """
+        try:
+            order, _ = self._call(lambda impl: impl.cancel_order(symbol, order_id, client_order_id))
+            return order
+        finally:
+            self.invalidate_account_state()
+
+    def get_account_state(self):
+        """
+        Запрашивает баланс и открытые позиции параллельно (из кэша, если он действителен).
+
+        Returns:
+            tuple: (balances, positions) в формате get_account_balance и get_open_positions.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='binance-api')
+        balances = self._executor.submit(self.get_account_balance)
+        positions = self._executor.submit(self.get_open_positions)
+        return balances.result()[0], positions.result()[0]
+
+    def get_stats(self):
+        """
+        Статистика кэша состояния аккаунта и запросов к API.
+
+        Returns:
+            dict: hits, misses, hit_rate, requests, errors, latency_avg, latency_max (секунды).
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['latency_avg'] = stats.pop('latency_total') / stats['requests'] if stats['requests'] else 0.0
+        return stats
+
+    def close(self):
+        """
+        Закрывает соединения сессии и пул потоков.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
+
     def get_account_balance(self):
         """
         Получает баланс аккаунта.
 
-        Метод подавляет вывод, используя StringIO, и восстанавливает стандартный вывод после завершения запроса к API.
-        Баланс аккаунта извлекается с использованием соответствующего эндпоинта.
+        Вывод библиотеки перехватывается только для этого вызова (output_capture.capture_output).
+        Баланс аккаунта извлекается с использованием соответствующего эндпоинта; результат кэшируется на cache_ttl секунд.
 
         Возвращает:
             tuple: Кортеж, содержащий балансы аккаунта и захваченный вывод.
@@ -64,35 +248,28 @@ class ConnectedAPI:
                 - output_data (str): Захваченный вывод.
         """
         try:
-            # Подавление вывода с использованием StringIO
-            output = StringIO()
-            sys.stdout = output
-
-            client = RequestClient(api_key=self.api_key, secret_key=self.secret_key, testnet=True)
-            account_balance = client.get_balance_v2()  # Используется правильный эндпоинт
-
-            # Восстановление стандартного вывода
-            sys.stdout = sys.__stdout__
-
-            # Получение захваченного вывода
-            output_data = output.getvalue().strip()  # Удаление завершающего перевода строки
-
-            # Обработка данных о балансе аккаунта
-            if account_balance is not None:
-                balances = []
-                for balance in account_balance:
-                    if float(balance.balance) != 0:
-                        balances.append((balance.asset, balance.balance))
-                # Log successful balance retrieval
-                self.logger.debug("Баланс успешно получен.")
-            else:
-                balances = []
-                # Log that no balance was received
-                self.logger.error("Не удалось получить баланс.")
+            return self._cached('balance', self._load_account_balance)
         except Exception as e:
             # Log any exceptions that occur during balance retrieval
             self.logger.exception("Ошибка при получении баланса: %s", str(e))
-            balances = []  # Return empty balances if an error occurs
+            return [], ''  # Return empty balances if an error occurs
+
+    def _load_account_balance(self):
+        account_balance, output_data = self._call(
+            lambda impl: impl.get_balance_v2())  # Используется правильный эндпоинт
+
+        # Обработка данных о балансе аккаунта
+        if account_balance is not None:
+            balances = []
+            for balance in account_balance:
+                if float(balance.balance) != 0:
+                    balances.append((balance.asset, balance.balance))
+            # Log successful balance retrieval
+            self.logger.debug("Баланс успешно получен.")
+        else:
+            balances = []
+            # Log that no balance was received
+            self.logger.error("Не удалось получить баланс.")
 
         # Возврат балансов и захваченного вывода
         return balances, output_data
@@ -101,8 +278,9 @@ class ConnectedAPI:
         """
         Получает открытые позиции.
 
-        Метод подавляет вывод, используя StringIO, и восстанавливает стандартный вывод после запроса к API.
-        Извлекает данные об открытых позициях с использованием соответствующего эндпоинта.
+        Вывод библиотеки перехватывается только для этого вызова (output_capture.capture_output).
+        Извлекает данные об открытых позициях с использованием соответствующего эндпоинта; результат
+        кэшируется на cache_ttl секунд.
 
         Returns:
             tuple: Кортеж, содержащий открытые позиции и захваченный вывод.
@@ -112,18 +290,15 @@ class ConnectedAPI:
               представляющих символ, направление позиции и соответствующий объем позиции.
             - output_data (str): Захваченный вывод.
         """
-        # Подавление вывода с использованием StringIO
-        output = StringIO()
-        sys.stdout = output
-
-        client = RequestClient(api_key=self.api_key, secret_key=self.secret_key, testnet=True)
-        open_positions = client.get_position_v2()  # Используется правильный эндпоинт
-
-        # Восстановление стандартного вывода
-        sys.stdout = sys.__stdout__
+        try:
+            return self._cached('positions', self._load_open_positions)
+        except Exception as e:
+            self.logger.exception("Ошибка при получении открытых позиций: %s", str(e))
+            return [], ''
 
-        # Получение захваченного вывода
-        output_data = output.getvalue().strip()  # Удаление завершающего перевода строки
+    def _load_open_positions(self):
+        open_positions, output_data = self._call(
+            lambda impl: impl.get_position_v2())  # Используется правильный эндпоинт
 
         if open_positions is not None:
             # Обработка данных об открытых позициях
@@ -0,0 +1,229 @@
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from dotenv import load_dotenv
+from custom_logger import LoggerConfig
+
+DB_CREDENTIALS_PATH = r'C:\Users\wangr\PycharmProjects\pythonProject9\config\db_credintials.env'
+
+
+class PoolTimeout(Exception):
+    """Свободное соединение не появилось за отведённое время."""
+
+
+class ConnectionPool:
+    """
+    Пул долгоживущих соединений с PostgreSQL фиксированного размера.
+
+    Соединения открываются лениво (не больше size), выдаются через контекстный менеджер
+    connection() и возвращаются в пул после использования. Перед выдачей соединение,
+    простаивавшее дольше health_check_interval, проверяется запросом SELECT 1;
+    разорванные соединения закрываются и открываются заново.
+
+    Parameters:
+        size (int): Максимальное количество соединений.
+        timeout (float): Максимальное время ожидания свободного соединения, секунды.
+        health_check_interval (float): Простой, после которого соединение проверяется перед выдачей.
+        **connect_kwargs: Параметры psycopg2.connect.
+
+    Attributes:
+        stats (dict): Счётчики пула: hits - выдано готовое соединение, misses - пришлось открыть
+            новое или ждать, waits - количество ожиданий, wait_time_total/wait_time_max - время
+            ожидания в секундах, reconnects - переоткрытые соединения,
+            health_check_failures - неудачные проверки.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, size=4, timeout=30.0, health_check_interval=60.0, **connect_kwargs):
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'reconnects': 0,
+            'health_check_failures': 0,
+        }
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    @classmethod
+    def from_env(cls, dotenv_path=DB_CREDENTIALS_PATH, **kwargs):
+        """
+        Создаёт пул с параметрами подключения из переменных окружения DB_*.
+        """
+        load_dotenv(dotenv_path=dotenv_path)
+        return cls(
+            database=os.getenv("DB_DATABASE"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            host=os.getenv("DB_HOST"),
+            port=os.getenv("DB_PORT"),
+            **kwargs
+        )
+
+    @classmethod
+    def shared(cls):
+        """
+        Возвращает общий для процесса пул (создаётся при первом обращении).
+        """
+        with cls._shared_lock:
+            if cls._shared is None or cls._shared._closed:
+                cls._shared = cls.from_env()
+            return cls._shared
+
+    def _connect(self):
+        connection = psycopg2.connect(**self.connect_kwargs)
+        self.logger.debug('Успешно подключено к базе данных.')
+        return connection
+
+    def _is_healthy(self, connection):
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        with self._lock:
+            self._opened -= 1
+
+    def _release(self, connection):
+        if self._closed or connection.closed:
+            self._discard(connection)
+        else:
+            self._idle.put((connection, time.monotonic()))
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.stats[name] += value
+
+    def _acquire(self):
+        """
+        Возвращает пару (соединение, момент последнего использования).
+        """
+        if self._closed:
+            raise PoolTimeout('Пул соединений закрыт')
+
+        try:
+            item = self._idle.get_nowait()
+            self._count('hits')
+            return item
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            self.stats['misses'] += 1
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect(), time.monotonic()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        self._count('waits')
+        started = time.monotonic()
+        try:
+            item = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f'Нет свободного соединения за {self.timeout} с') from None
+        finally:
+            waited = time.monotonic() - started
+            with self._lock:
+                self.stats['wait_time_total'] += waited
+                self.stats['wait_time_max'] = max(self.stats['wait_time_max'], waited)
+        return item
+
+    @contextmanager
+    def connection(self):
+        """
+        Выдаёт соединение из пула на время блока with.
+
+        Незавершённая транзакция откатывается при выходе из блока. Если соединение разорвано,
+        оно закрывается, а вместо него при следующем запросе открывается новое.
+        """
+        connection, last_used = self._acquire()
+
+        if connection.closed or time.monotonic() - last_used > self.health_check_interval:
+            if not self._is_healthy(connection):
+                self._count('health_check_failures')
+                self._count('reconnects')
+                self.logger.warning('Соединение с базой данных потеряно, переподключение.')
+                try:
+                    connection.close()
+                except psycopg2.Error:
+                    pass
+                try:
+                    connection = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+
+        try:
+            yield connection
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self._discard(connection)
+            raise
+        except Exception:
+            if not connection.closed:
+                connection.rollback()
+            self._release(connection)
+            raise
+        else:
+            if (not connection.closed and
+                    connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+                connection.rollback()
+            self._release(connection)
+
+    def get_stats(self):
+        """
+        Возвращает копию счётчиков пула вместе с текущим количеством открытых и свободных соединений.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['opened'] = self._opened
+        stats['idle'] = self._idle.qsize()
+        return stats
+
+    def close(self):
+        """
+        Закрывает все свободные соединения и запрещает выдачу новых.
+        """
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
@@ -1,6 +1,21 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
 
 class ColoredConsoleHandler(logging.StreamHandler):
+    """
+    Вывод в консоль с цветом по уровню записи.
+
+    Цвет добавляется к уже отформатированной строке (включая трассировку исключения),
+    сама запись не изменяется, поэтому другие обработчики получают её без кодов ANSI.
+    """
+
     COLOR_CODES = {
         'DEBUG': '\033[94m',  # Blue
         'INFO': '\033[92m',   # Green
@@ -8,33 +23,125 @@ class ColoredConsoleHandler(logging.StreamHandler):
         'ERROR': '\033[91m',  # Red
         'CRITICAL': '\033[95m'  # Purple
     }
+    RESET = '\033[0m'
+
+    def format(self, record):
+        # Get the color corresponding to the log level
+        level_color = self.COLOR_CODES.get(record.levelname, self.RESET)
+        return f"{level_color}{super().format(record)}{self.RESET}"
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Передача записей фоновому потоку через очередь ограниченного размера.
+
+    В потоке вызова запись только ставится в очередь: форматирование и вывод выполняет
+    QueueListener. Если очередь заполнена, записи DEBUG и INFO отбрасываются (счётчик dropped),
+    а WARNING и выше ждут места до block_timeout секунд.
+
+    Сообщение форматируется в фоновом потоке, поэтому аргументы записи не должны
+    изменяться после вызова логгера.
+
+    Parameters:
+        log_queue (queue.Queue): Очередь записей.
+        block_timeout (float): Ожидание места в очереди для WARNING и выше, секунды.
+    """
+
+    def __init__(self, log_queue, block_timeout=1.0):
+        super().__init__(log_queue)
+        self.block_timeout = block_timeout
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Форматирование откладывается до фонового потока (QueueHandler.prepare форматирует здесь)
+        return record
 
-    def emit(self, record):
+    def enqueue(self, record):
         try:
-            # Get the color corresponding to the log level
-            level_color = self.COLOR_CODES.get(record.levelname, '\033[0m')  # Default to reset color
-            msg = f"{level_color}{record.msg}\033[0m"  # Apply color to the message
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
-            # Update the record message
-            record.msg = msg
 
-            super().emit(record)
-        except Exception:
-            self.handleError(record)
+def build_queue_logging(handlers, queue_size=10000):
+    """
+    Создаёт связку обработчика-очереди и фонового слушателя.
+
+    Parameters:
+        handlers (list): Конечные обработчики (консоль, файл), вызываемые в фоновом потоке.
+        queue_size (int): Размер очереди записей.
+
+    Returns:
+        tuple: (BoundedQueueHandler, logging.handlers.QueueListener); слушатель не запущен.
+    """
+    log_queue = queue.Queue(maxsize=queue_size)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    return BoundedQueueHandler(log_queue), listener
 
-    def formatException(self, ei):
-        # Format the exception with the appropriate color
-        return f"{self.COLOR_CODES['ERROR']}{super().formatException(ei)}\033[0m"
 
 class LoggerConfig:
-    @staticmethod
-    def configure_logger(logger):
-        logger.setLevel(logging.DEBUG)
+    """
+    Общая настройка логирования процесса.
+
+    Все логгеры получают один и тот же BoundedQueueHandler; консольный обработчик
+    работает в фоновом потоке QueueListener. Повторные вызовы configure_logger для того же
+    логгера (например, при создании нового DatabaseManager) обработчиков не добавляют.
+    """
+
+    queue_size = 10000
+    _lock = threading.Lock()
+    _handler = None
+    _listener = None
+
+    @classmethod
+    def install(cls, stream=None):
+        """
+        Запускает фоновый вывод при первом вызове; последующие вызовы возвращают тот же обработчик.
 
-        # Create a handler and set the formatter
-        handler = ColoredConsoleHandler()
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
+        Parameters:
+            stream: Поток консольного вывода (по умолчанию: sys.stderr). Учитывается только
+                при первом вызове.
+
+        Returns:
+            BoundedQueueHandler: Обработчик для логгеров.
+        """
+        with cls._lock:
+            if cls._handler is None:
+                console = ColoredConsoleHandler(stream or sys.stderr)
+                console.setFormatter(logging.Formatter(LOG_FORMAT))
+                cls._handler, cls._listener = build_queue_logging([console], cls.queue_size)
+                cls._listener.start()
+                # Записи, оставшиеся в очереди, выводятся при завершении процесса
+                atexit.register(cls.shutdown)
+            return cls._handler
+
+    @classmethod
+    def shutdown(cls):
+        """
+        Выводит оставшиеся записи и останавливает фоновый поток.
+        """
+        with cls._lock:
+            if cls._listener is not None and cls._listener._thread is not None:
+                cls._listener.stop()
+
+    @classmethod
+    def stats(cls):
+        """
+        Returns:
+            dict: queued - записей в очереди, dropped - отброшено из-за переполнения.
+        """
+        if cls._handler is None:
+            return {'queued': 0, 'dropped': 0}
+        return {'queued': cls._handler.queue.qsize(), 'dropped': cls._handler.dropped}
+
+    @classmethod
+    def configure_logger(cls, logger):
+        logger.setLevel(logging.DEBUG)
 
-        # Add the handler to the logger
-        logger.addHandler(handler)
+        # Add the shared queue handler to the logger once
+        handler = cls.install()
+        if handler not in logger.handlers:
+            logger.addHandler(handler)
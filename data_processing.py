@@ -3,7 +3,7 @@ class DataProcessor:
         self.df = df
 
     def calculate_moving_average(self, window, offset):
-        ma = self.df['Close Pricнапиши функцию, которая будет извеe'].rolling(window=window).mean()
+        ma = self.df['close_price'].rolling(window=window).mean()
         ma_shifted = ma.shift(offset)
         return ma_shifted
 
@@ -1,58 +1,48 @@
+import io
+import itertools
 import logging
-import os
-import psycopg2
-import pandas as pd
-from dotenv import load_dotenv
+import numpy as np
 from custom_logger import LoggerConfig
 from configuration_default import DefaultConfig
+from connection_pool import ConnectionPool
+from timeutils import to_epoch_ms
+from candles import CANDLE_COLUMNS, CANDLE_DTYPES, CandleBatch
+from metrics import count_error, row_count, timed
+
+
+class LegacyTimestampError(Exception):
+    """Столбец timestamp хранит строки или даты, а не миллисекунды (см. migrate_timestamps.py)."""
+
 
 class DatabaseManager:
     """
     Класс для управления базой данных.
 
+    Все операции берут соединение из пула (ConnectionPool) на время запроса, поэтому
+    один экземпляр можно использовать на протяжении всей работы бота.
+
     Attributes:
-        connection (psycopg2.extensions.connection): Соединение с базой данных.
-        cursor (psycopg2.extensions.cursor): Курсор для выполнения операций с базой данных.
+        pool (ConnectionPool): Пул соединений с базой данных.
+        table_name (str): Таблица свечей, ключ (symbol, timeframe, timestamp).
     """
 
-    def __init__(self):
+    def __init__(self, table_name=None, pool=None):
         """
         Инициализация объекта DatabaseManager.
 
-        Подключается к базе данных и инициализирует курсор.
-
-        Raises:
-            Exception: В случае ошибки подключения к базе данных.
+        Parameters:
+            table_name (str): Таблица свечей (по умолчанию: DefaultConfig().table_name).
+            pool (ConnectionPool): Пул соединений (по умолчанию: общий пул процесса
+                с параметрами из переменных окружения DB_*).
         """
-        load_dotenv(dotenv_path=r'C:\Users\wangr\PycharmProjects\pythonProject9\config\db_credintials.env')
-
-        # Use the provided database_name or default from DefaultConfig
-        self.db_host = os.getenv("DB_HOST")
-        self.db_name = os.getenv("DB_DATABASE")
-        self.db_user = os.getenv("DB_USER")
-        self.db_password = os.getenv("DB_PASSWORD")
-        self.db_port = os.getenv("DB_PORT")
+        self.pool = pool or ConnectionPool.shared()
+        self.table_name = table_name or DefaultConfig().table_name
+        self._schema_ready = set()
 
         # Конфигурация логгера
         self.logger = logging.getLogger(__name__)
         LoggerConfig.configure_logger(self.logger)
 
-        try:
-            # Установление соединения
-            self.connection = psycopg2.connect(
-                database=self.db_name,
-                user=self.db_user,
-                password=self.db_password,
-                host=self.db_host,
-                port=self.db_port
-            )
-
-            self.cursor = self.connection.cursor()
-            self.logger.debug('Успешно подключено к базе данных.')
-        except Exception as e:
-            self.logger.exception(f'Ошибка подключения к базе данных: {str(e)}')
-            raise e
-
     def some_method(self):
         self.logger.debug('Debug message')
         self.logger.info('Informational message')
@@ -60,75 +50,404 @@ class DatabaseManager:
         self.logger.error('Error message')
         self.logger.exception('Critical message')
 
-    def insert_data(self, data):
+    def ensure_schema(self, table_name=None):
+        """
+        Создаёт таблицу свечей и уникальный индекс (symbol, timeframe, timestamp), если их нет.
+
+        Таблицы старого формата (без symbol/timeframe) дополняются недостающими столбцами,
+        существующие строки получают symbol и timeframe из DefaultConfig.
+        Метки времени хранятся как BIGINT - миллисекунды Unix (UTC), в том же виде, в котором их
+        отдаёт биржа.
+
+        Parameters:
+            table_name (str): Имя таблицы (по умолчанию: self.table_name).
+
+        Raises:
+            LegacyTimestampError: Если timestamp таблицы не BIGINT; такую таблицу нужно
+                перевести в новый формат через migrate_timestamps.py.
+        """
+        table_name = table_name or self.table_name
+        if table_name in self._schema_ready:
+            return
+
+        config = DefaultConfig()
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {table_name} ("
+                "symbol TEXT NOT NULL, "
+                "timeframe TEXT NOT NULL, "
+                "timestamp BIGINT NOT NULL, "
+                "open_price DOUBLE PRECISION, "
+                "high_price DOUBLE PRECISION, "
+                "low_price DOUBLE PRECISION, "
+                "close_price DOUBLE PRECISION, "
+                "volume DOUBLE PRECISION)"
+            )
+            cursor.execute(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = %s AND column_name = 'timestamp' AND table_schema = ANY(current_schemas(false))",
+                (table_name,)
+            )
+            data_type = cursor.fetchone()[0]
+            if data_type != 'bigint':
+                raise LegacyTimestampError(
+                    f"Столбец {table_name}.timestamp имеет тип {data_type}; "
+                    f"выполните python migrate_timestamps.py {table_name} --timezone <пояс исходных дат>")
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS symbol TEXT")
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS timeframe TEXT")
+            cursor.execute(f"UPDATE {table_name} SET symbol = %s WHERE symbol IS NULL", (config.symbol,))
+            cursor.execute(f"UPDATE {table_name} SET timeframe = %s WHERE timeframe IS NULL", (config.timeframe,))
+            # Индекс служит и ключом ON CONFLICT, и индексом диапазонных запросов query_candles
+            cursor.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_candle_key "
+                f"ON {table_name} (symbol, timeframe, timestamp)"
+            )
+            connection.commit()
+        self._schema_ready.add(table_name)
+
+    @staticmethod
+    def _copy_buffer(rows, symbol, timeframe):
+        """
+        Формирует буфер в текстовом формате COPY (разделитель - табуляция, NULL - \\N).
+        """
+        buffer = io.StringIO()
+        for row in rows:
+            values = [symbol, timeframe]
+            values.extend('\\N' if value is None else str(value) for value in row[:len(CANDLE_COLUMNS)])
+            buffer.write('\t'.join(values))
+            buffer.write('\n')
+        buffer.seek(0)
+        return buffer
+
+    @staticmethod
+    def _copy_binary_buffer(batch, symbol, timeframe):
+        """
+        Формирует буфер в двоичном формате COPY из массивов CandleBatch без перевода чисел в текст.
+
+        Каждая строка - запись структурированного массива NumPy: количество полей, затем длина
+        и значение каждого поля в сетевом порядке байтов.
+        """
+        symbol = symbol.encode()
+        timeframe = timeframe.encode()
+        fields = [('count', '>i2'), ('symbol_length', '>i4'), ('symbol', f'S{len(symbol)}'),
+                  ('timeframe_length', '>i4'), ('timeframe', f'S{len(timeframe)}'),
+                  ('timestamp_length', '>i4'), ('timestamp', '>i8')]
+        for column in CANDLE_COLUMNS[1:]:
+            fields += [(f'{column}_length', '>i4'), (column, '>f8')]
+
+        records = np.empty(len(batch), dtype=fields)
+        records['count'] = 2 + len(CANDLE_COLUMNS)
+        records['symbol_length'] = len(symbol)
+        records['symbol'] = symbol
+        records['timeframe_length'] = len(timeframe)
+        records['timeframe'] = timeframe
+        records['timestamp_length'] = 8
+        records['timestamp'] = batch.timestamp
+        for column in CANDLE_COLUMNS[1:]:
+            records[f'{column}_length'] = 8
+            records[column] = getattr(batch, column)
+
+        # Заголовок: сигнатура, флаги и длина расширения; в конце - признак конца данных (-1)
+        return io.BytesIO(b'PGCOPY\n\xff\r\n\x00' + bytes(8) + records.tobytes() + b'\xff\xff')
+
+    @timed('db_insert', rows=row_count)
+    def insert_data(self, data, symbol=None, timeframe=None, on_conflict='ignore', batch_size=50000,
+                    raise_errors=False):
         """
         Вставка данных в таблицу.
 
+        Данные передаются пакетами через COPY во временную таблицу, откуда переносятся
+        в основную одним INSERT ... ON CONFLICT. Дубликаты по ключу (symbol, timeframe, timestamp)
+        отсекаются самой базой данных, существующие строки не читаются. Из повторов одной свечи
+        внутри data берётся последний.
+        CandleBatch передаётся в двоичном формате COPY прямо из массивов столбцов.
+
         Args:
-            data (list): Данные для вставки в виде списка кортежей.
+            data (CandleBatch | list): Свечи: CandleBatch или список кортежей
+                (timestamp, open, high, low, close, volume).
+            symbol (str): Символ инструмента (по умолчанию: DefaultConfig().symbol).
+            timeframe (str): Временной интервал (по умолчанию: DefaultConfig().timeframe).
+            on_conflict (str): 'ignore' - пропускать существующие свечи,
+                'update' - перезаписывать их новыми значениями.
+            batch_size (int): Количество строк в одном пакете COPY.
+            raise_errors (bool): Пробрасывать ошибку вставки вызывающему коду вместо записи в лог.
+
+        Returns:
+            int: Количество вставленных (или обновлённых) строк.
 
         Raises:
-            Exception: В случае ошибки вставки данных.
+            ValueError: При неизвестном значении on_conflict.
         """
-        cursor = None  # Инициализация курсора
+        if on_conflict == 'ignore':
+            conflict_action = "DO NOTHING"
+        elif on_conflict == 'update':
+            conflict_action = "DO UPDATE SET " + ", ".join(
+                f"{column} = EXCLUDED.{column}" for column in CANDLE_COLUMNS[1:])
+        else:
+            raise ValueError(f"Неизвестный режим on_conflict: {on_conflict}")
+
+        config = DefaultConfig()
+        symbol = symbol or config.symbol
+        timeframe = timeframe or config.timeframe
+        table_name = self.table_name
+        columns = ', '.join(('symbol', 'timeframe') + CANDLE_COLUMNS)
+        inserted = 0
 
         try:
-            # Fetch the table name from default settings
-            table_name = DefaultConfig().table_name
-
-            cursor = self.connection.cursor()
-            # Извлечение меток времени из новых данных
-            new_timestamps = set([item[0] for item in data])
-
-            # Получение меток времени существующих записей
-            cursor.execute(f"SELECT timestamp FROM {table_name}")
-            existing_timestamps = {str(row[0]) for row in cursor.fetchall()}
-
-            # Фильтрация данных, которые уже присутствуют в базе данных
-            new_data = [row for row in data if str(row[0]) not in existing_timestamps]
-
-            # Вставка новых данных
-            if new_data:
-                cursor.executemany(
-                    f"INSERT INTO {table_name} (timestamp, open_price, high_price, low_price, close_price, volume) "
-                    "VALUES (%s, %s, %s, %s, %s, %s)",
-                    new_data
-                )
-                self.connection.commit()
-                self.logger.info("Успешная вставка данных.")
+            self.ensure_schema(table_name)
+
+            with self.pool.connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        # Временная таблица живёт до конца сессии, строки очищаются после каждого пакета.
+                        # Типы заданы явно: двоичный COPY требует точного совпадения типов, а INSERT
+                        # приводит их к типам основной таблицы (в том числе старого формата).
+                        # ordinal нумерует строки в порядке COPY: из дубликатов пакета побеждает последний
+                        cursor.execute(
+                            f"CREATE TEMP TABLE IF NOT EXISTS {table_name}_stage ("
+                            "symbol TEXT, timeframe TEXT, timestamp BIGINT, "
+                            + ", ".join(f"{column} DOUBLE PRECISION" for column in CANDLE_COLUMNS[1:])
+                            + ", ordinal BIGSERIAL) ON COMMIT DELETE ROWS"
+                        )
+
+                        if isinstance(data, CandleBatch):
+                            # Части набора - представления его массивов, без копирования
+                            batches = data.split(batch_size)
+                        else:
+                            rows = iter(data)
+                            batches = iter(lambda: list(itertools.islice(rows, batch_size)), [])
+
+                        for batch in batches:
+                            if isinstance(batch, CandleBatch):
+                                cursor.copy_expert(
+                                    f"COPY {table_name}_stage ({columns}) FROM STDIN WITH (FORMAT binary)",
+                                    self._copy_binary_buffer(batch, symbol, timeframe)
+                                )
+                            else:
+                                cursor.copy_expert(
+                                    f"COPY {table_name}_stage ({columns}) FROM STDIN",
+                                    self._copy_buffer(batch, symbol, timeframe)
+                                )
+                            # DISTINCT ON: одна команда не может дважды изменить одну и ту же строку;
+                            # без ORDER BY PostgreSQL оставил бы произвольный из дубликатов
+                            cursor.execute(
+                                f"INSERT INTO {table_name} ({columns}) "
+                                f"SELECT DISTINCT ON (symbol, timeframe, timestamp) {columns} "
+                                f"FROM {table_name}_stage "
+                                f"ORDER BY symbol, timeframe, timestamp, ordinal DESC "
+                                f"ON CONFLICT (symbol, timeframe, timestamp) {conflict_action}"
+                            )
+                            inserted += cursor.rowcount
+                            cursor.execute(f"TRUNCATE {table_name}_stage")
+
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+
+            if inserted:
+                self.logger.info("Успешная вставка данных: %s строк.", inserted)
             else:
                 self.logger.info("Нет новых данных для вставки.")
 
         except Exception as e:
-            self.connection.rollback()
+            if raise_errors:
+                raise
+            count_error('db_insert')
             self.logger.exception(f"Ошибка при вставке данных: {str(e)}")
+            inserted = 0
+
+        return inserted
+
+    def get_last_timestamp(self, symbol=None, timeframe=None, start=None, end=None):
+        """
+        Возвращает метку времени последней сохранённой свечи.
 
-        finally:
-            if cursor:  # Проверка, что курсор не равен None
-                cursor.close()
+        Parameters:
+            symbol (str): Символ инструмента (по умолчанию: DefaultConfig().symbol).
+            timeframe (str): Временной интервал (по умолчанию: DefaultConfig().timeframe).
+            start: Учитывать только свечи не раньше start.
+            end: Учитывать только свечи раньше end.
 
-    def fetch_data_for_chart(self):
+        Returns:
+            int: Метка времени (мс) или None, если подходящих свечей нет.
+        """
+        return self._timestamp_bound('max', symbol, timeframe, start, end)
+
+    def get_first_timestamp(self, symbol=None, timeframe=None, start=None, end=None):
+        """
+        Возвращает метку времени первой сохранённой свечи (параметры - как у get_last_timestamp).
+        """
+        return self._timestamp_bound('min', symbol, timeframe, start, end)
+
+    def _timestamp_bound(self, aggregate, symbol, timeframe, start, end):
+        config = DefaultConfig()
+        query = f"SELECT {aggregate}(timestamp) FROM {self.table_name} WHERE symbol = %s AND timeframe = %s"
+        params = [symbol or config.symbol, timeframe or config.timeframe]
+        if start is not None:
+            query += " AND timestamp >= %s"
+            params.append(to_epoch_ms(start))
+        if end is not None:
+            query += " AND timestamp < %s"
+            params.append(to_epoch_ms(end))
+
+        self.ensure_schema()
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchone()[0]
+
+    @timed('db_query', rows=row_count)
+    def query_candles(self, symbol=None, timeframe=None, start=None, end=None, columns=None, limit=None,
+                      as_arrays=False):
+        """
+        Извлекает свечи инструмента за диапазон времени.
+
+        Все условия (инструмент, интервал, диапазон, набор столбцов, лимит) выполняются в SQL
+        по индексу (symbol, timeframe, timestamp), поэтому время запроса зависит от размера
+        результата, а не таблицы.
+
+        Parameters:
+            symbol (str): Символ инструмента (по умолчанию: DefaultConfig().symbol).
+            timeframe (str): Временной интервал (по умолчанию: DefaultConfig().timeframe).
+            start: Начало диапазона, включительно: миллисекунды, datetime или строка ISO (UTC);
+                None - без ограничения.
+            end: Конец диапазона, не включительно (None - без ограничения).
+            columns (list): Столбцы из CANDLE_COLUMNS (по умолчанию: все).
+            limit (int): Вернуть только limit последних свечей диапазона.
+            as_arrays (bool): Вернуть словарь типизированных массивов NumPy вместо фрейма.
+
+        Returns:
+            pd.DataFrame | dict: Свечи по возрастанию времени.
+
+        Raises:
+            ValueError: При неизвестном имени столбца.
+        """
+        columns = list(columns or CANDLE_COLUMNS)
+        unknown = [column for column in columns if column not in CANDLE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Неизвестные столбцы: {', '.join(unknown)}")
+
+        config = DefaultConfig()
+        where = "symbol = %s AND timeframe = %s"
+        params = [symbol or config.symbol, timeframe or config.timeframe]
+        if start is not None:
+            where += " AND timestamp >= %s"
+            params.append(to_epoch_ms(start))
+        if end is not None:
+            where += " AND timestamp < %s"
+            params.append(to_epoch_ms(end))
+
+        select = ', '.join(columns)
+        if limit is None:
+            query = f"SELECT {select} FROM {self.table_name} WHERE {where} ORDER BY timestamp"
+        else:
+            # Последние limit свечей по индексу в обратном порядке, затем по возрастанию времени
+            query = (f"SELECT {select} FROM (SELECT * FROM {self.table_name} WHERE {where} "
+                     "ORDER BY timestamp DESC LIMIT %s) AS last_candles ORDER BY timestamp")
+            params.append(int(limit))
+
+        self.ensure_schema()
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, params)
+            data = cursor.fetchall()
+
+        values = list(zip(*data)) if data else [()] * len(columns)
+        arrays = {column: np.array(column_values, dtype=CANDLE_DTYPES[column])
+                  for column, column_values in zip(columns, values)}
+        if as_arrays:
+            return arrays
+        import pandas as pd
+        return pd.DataFrame(arrays, columns=columns, copy=False)
+
+    def fetch_candles_since(self, symbol=None, timeframe=None, since=None):
+        """
+        Извлекает свечи инструмента, начиная с метки времени since (включительно), по возрастанию времени.
+
+        Returns:
+            pd.DataFrame: Фрейм со столбцами CANDLE_COLUMNS.
+        """
+        return self.query_candles(symbol, timeframe, start=since)
+
+    def fetch_data_for_chart(self, symbol=None, timeframe=None, start=None, end=None, limit=None):
         """
         Извлекает данные из указанной таблицы для отображения на графике.
 
+        Parameters:
+            symbol (str): Символ инструмента (по умолчанию: DefaultConfig().symbol).
+            timeframe (str): Временной интервал (по умолчанию: DefaultConfig().timeframe).
+            start, end, limit: Ограничения диапазона (см. query_candles).
+
         Returns:
             pd.DataFrame: Фрейм данных с требуемыми данными.
         """
         try:
-            table_name = DefaultConfig().table_name
-            cursor = self.connection.cursor()
-            cursor.execute(
-                f"SELECT timestamp, open_price, high_price, low_price, close_price, volume FROM {table_name}")
-            data = cursor.fetchall()
-            cursor.close()
-            columns = ['timestamp', 'open_price', 'high_price', 'low_price', 'close_price', 'volume']
-            return pd.DataFrame(data, columns=columns)
+            return self.query_candles(symbol, timeframe, start=start, end=end, limit=limit)
         except Exception as e:
             self.logger.error(f"Failed to fetch data for chart: {str(e)}")
+            import pandas as pd
             return pd.DataFrame()
 
+    def migrate_timestamps_to_epoch(self, source_timezone, table_name=None):
+        """
+        Переводит столбец timestamp таблицы старого формата в BIGINT (миллисекунды Unix).
+
+        Строки и даты без часового пояса интерпретируются в source_timezone - поясе машины,
+        на которой их записывал прежний fetch_historical_data (datetime.fromtimestamp).
+        Таблица переписывается одной командой ALTER TABLE в транзакции.
+
+        Parameters:
+            source_timezone (str): Часовой пояс исходных дат (например, 'Europe/Moscow').
+            table_name (str): Таблица (по умолчанию: self.table_name).
+
+        Returns:
+            bool: True, если столбец был преобразован; False, если он уже BIGINT.
+        """
+        table_name = table_name or self.table_name
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = %s AND column_name = 'timestamp' AND table_schema = ANY(current_schemas(false))",
+                (table_name,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Таблица {table_name} не найдена или не содержит столбца timestamp")
+            data_type = row[0]
+            if data_type == 'bigint':
+                return False
+
+            if data_type == 'timestamp with time zone':
+                using = "EXTRACT(EPOCH FROM timestamp)"
+                params = None
+            else:
+                using = "EXTRACT(EPOCH FROM (timestamp::timestamp AT TIME ZONE %s))"
+                params = (source_timezone,)
+            cursor.execute(
+                f"ALTER TABLE {table_name} ALTER COLUMN timestamp TYPE BIGINT "
+                f"USING (round({using} * 1000))::bigint",
+                params
+            )
+            connection.commit()
+
+        self._schema_ready.discard(table_name)
+        self.logger.info("Столбец %s.timestamp переведён из %s в миллисекунды.", table_name, data_type)
+        return True
 
+    def pool_stats(self):
+        """
+        Возвращает счётчики пула соединений (см. ConnectionPool.get_stats).
+        """
+        return self.pool.get_stats()
 
     def close_connection(self):
-        self.cursor.close()
-        self.connection.close()
\ No newline at end of file
+        """
+        Соединения принадлежат пулу и остаются открытыми для следующих запросов.
+        Чтобы закрыть их, используйте close_pool().
+        """
+        self.logger.debug('Соединения возвращены в пул.')
+
+    def close_pool(self):
+        """
+        Закрывает все соединения пула.
+        """
+        self.pool.close()
@@ -0,0 +1,180 @@
+"""
+Заглушки внешних систем без сети для тестов (tests/) и замеров (benchmarks.py).
+
+generate_candles - детерминированные свечи, FakeExchange - биржа в памяти процесса,
+AccountStubServer - локальный REST API фьючерсов Binance: баланс, позиции и ордера.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from candles import CandleBatch
+from timeutils import timeframe_to_ms
+
+START = 1420070400000  # 2015-01-01 00:00 UTC
+MINUTE = 60_000
+
+
+def generate_candles(count, seed=0, start=START, step=MINUTE):
+    """
+    Детерминированные свечи: геометрическое случайное блуждание с согласованными OHLC
+    (high не ниже open/close, low не выше). Одинаковы для одинаковых count и seed на любой машине.
+
+    Returns:
+        CandleBatch: Свечи по возрастанию времени.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.001, count)))
+    open_price = np.concatenate(([100.0], close[:-1]))
+    spread = rng.uniform(0.0, 0.002, count) * close
+    return CandleBatch(
+        start + np.arange(count, dtype=np.int64) * step,
+        open_price,
+        np.maximum(open_price, close) + spread,
+        np.minimum(open_price, close) - spread,
+        close,
+        rng.uniform(1.0, 100.0, count),
+    )
+
+
+class FakeExchange:
+    """
+    Замена ccxt.binance() в процессе: отдаёт заранее заданные свечи страницами fetch_ohlcv.
+
+    Поддерживает методы, которыми пользуется HistoricalPriceFetcher: fetch_ticker,
+    fetch_ohlcv и parse_timeframe.
+
+    Parameters:
+        candles (CandleBatch | list): Свечи биржи (набор или строки fetch_ohlcv).
+        timeframe (str): Интервал свечей.
+        now (int): Время биржи, мс; по умолчанию - открытие свечи, следующей за последней.
+        latency (float): Задержка ответа на запрос, секунды.
+
+    Attributes:
+        requests (list): Параметры (since, limit) каждого запроса fetch_ohlcv.
+    """
+
+    enableRateLimit = True
+    rateLimit = 0
+
+    def __init__(self, candles, timeframe='1m', now=None, latency=0.0):
+        self.candles = candles if isinstance(candles, CandleBatch) else CandleBatch.from_rows(candles)
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.now = now
+        self.latency = latency
+        self.requests = []
+
+    @property
+    def calls(self):
+        return len(self.requests)
+
+    @staticmethod
+    def parse_timeframe(timeframe):
+        return timeframe_to_ms(timeframe) // 1000
+
+    def fetch_ticker(self, symbol):
+        now = self.now if self.now is not None else int(self.candles.timestamp[-1]) + self.timeframe_ms
+        return {'symbol': symbol, 'timestamp': now, 'last': float(self.candles.close_price[-1])}
+
+    def fetch_ohlcv(self, symbol, timeframe=None, since=None, limit=None):
+        self.requests.append((since, limit))
+        if self.latency:
+            time.sleep(self.latency)
+        first = 0 if since is None else int(np.searchsorted(self.candles.timestamp, since))
+        last = len(self.candles) if limit is None else first + limit
+        # Списки Python - как в ответе ccxt
+        return [list(candle) for candle in self.candles[first:last]]
+
+ACCOUNT_STUB_PAYLOADS = {
+    '/fapi/v2/balance': [
+        {'accountAlias': 'bench', 'asset': 'USDT', 'balance': '1000.0', 'crossWalletBalance': '1000.0',
+         'crossUnPnl': '0.0', 'availableBalance': '1000.0', 'maxWithdrawAmount': '1000.0'},
+    ],
+    '/fapi/v2/positionRisk': [
+        {'entryPrice': '30000.0', 'isAutoAddMargin': 'false', 'leverage': '10', 'maxNotionalValue': '1000000',
+         'liquidationPrice': '27000.0', 'markPrice': '30100.0', 'positionAmt': '0.010', 'symbol': 'BTCUSDT',
+         'unRealizedProfit': '1.0', 'marginType': 'cross', 'isolatedMargin': '0.0', 'positionSide': 'BOTH'},
+    ],
+    '/fapi/v1/order': {
+        'clientOrderId': 'bench', 'cumQuote': '0', 'executedQty': '0', 'orderId': 1, 'origQty': '0.001',
+        'price': '0', 'reduceOnly': False, 'side': 'BUY', 'status': 'NEW', 'stopPrice': '0', 'symbol': 'BTCUSDT',
+        'timeInForce': 'GTC', 'type': 'MARKET', 'updateTime': 0, 'workingType': 'CONTRACT_PRICE',
+        'avgPrice': '0', 'origType': 'MARKET', 'positionSide': 'BOTH', 'closePosition': False,
+    },
+}
+
+
+class AccountStubHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик AccountStubServer: отвечает ACCOUNT_STUB_PAYLOADS с задержкой server.delay,
+    для путей из server.failing - ошибкой API в формате Binance.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело уходят отдельными пакетами: без TCP_NODELAY keep-alive упирается в задержку ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self):
+        path = self.path.split('?')[0]
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path))
+        if path in self.server.failing:
+            status, payload = 401, {'code': -2015, 'msg': 'Invalid API-key, IP, or permissions for action.'}
+        else:
+            payload = ACCOUNT_STUB_PAYLOADS.get(path)
+            status = 200 if payload is not None else 404
+        body = json.dumps(payload).encode()
+        time.sleep(self.server.delay)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_DELETE = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AccountStubServer(ThreadingHTTPServer):
+    """
+    Локальная заглушка REST API фьючерсов на свободном порту 127.0.0.1; обслуживает запросы
+    в фоновом потоке после start().
+
+    Parameters:
+        delay (float): Задержка каждого ответа, секунды.
+
+    Attributes:
+        url (str): Адрес заглушки для ConnectedAPI(url=...).
+        connections (int): Количество установленных TCP-соединений.
+        requests (list): Принятые запросы (метод, путь с параметрами).
+        failing (set): Пути, на которые отвечать ошибкой API.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.0):
+        super().__init__(('127.0.0.1', 0), AccountStubHandler)
+        self.delay = delay
+        self.url = f'http://127.0.0.1:{self.server_address[1]}'
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+        self.failing = set()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
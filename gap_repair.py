@@ -0,0 +1,334 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+
+import candle_cache
+from candles import CandleBatch
+from custom_logger import LoggerConfig
+from resampling import BASE_TIMEFRAME
+from timeutils import DAY_MS, candle_close_time, candle_open_time, format_timestamp, timeframe_to_ms, to_epoch_ms
+
+
+def plan_requests(gaps, timeframe_ms, page_limit):
+    """
+    Минимальный набор запросов fetch_ohlcv, покрывающий все пропуски.
+
+    Каждый запрос возвращает до page_limit свечей начиная с since, поэтому пропуски,
+    попадающие в окно предыдущего запроса, отдельного запроса не требуют, а длинный пропуск
+    делится на окна по page_limit свечей. Уже сохранённые свечи внутри окон при вставке
+    пропускаются базой данных.
+
+    Parameters:
+        gaps (np.ndarray): Пропуски [start, end) по возрастанию, мс; форма (k, 2).
+        timeframe_ms (int): Длительность свечи, мс.
+        page_limit (int): Свечей в одном ответе биржи.
+
+    Returns:
+        list: Окна запросов (since, end), мс.
+    """
+    window = timeframe_ms * page_limit
+    requests = []
+    covered = None
+    for start, end in np.asarray(gaps, dtype=np.int64).tolist():
+        since = start if covered is None else max(start, covered)
+        while since < end:
+            requests.append((since, since + window))
+            since += window
+        covered = since
+    return requests
+
+
+def gap_sizes(gaps, timeframe_ms):
+    """
+    Количество пропущенных свечей в каждом пропуске. Для месячных интервалов timeframe_ms -
+    номинальная длина (timeutils.timeframe_to_ms), поэтому результат округляется.
+    """
+    return np.rint((gaps[:, 1] - gaps[:, 0]) / timeframe_ms).astype(np.int64)
+
+
+class GapScanner:
+    """
+    Поиск пропущенных свечей в таблице без выгрузки рядов в Python.
+
+    Пропуски находятся одним запросом с оконной функцией LAG по индексу
+    (symbol, timeframe, timestamp): клиенту передаются только границы пропусков,
+    поэтому время и память не зависят от размера ряда на стороне Python.
+
+    Parameters:
+        db_manager (DatabaseManager): Хранилище свечей.
+        fetch_size (int): Строк за одно чтение серверного курсора.
+    """
+
+    def __init__(self, db_manager, fetch_size=10000):
+        self.db_manager = db_manager
+        self.fetch_size = fetch_size
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    def series(self):
+        """
+        Все пары (symbol, timeframe) таблицы. Рекурсивный запрос перескакивает по индексу
+        от пары к паре вместо полного просмотра таблицы (SELECT DISTINCT).
+        """
+        table_name = self.db_manager.table_name
+        query = f"""
+            WITH RECURSIVE pairs AS (
+                (SELECT symbol, timeframe FROM {table_name} ORDER BY symbol, timeframe LIMIT 1)
+                UNION ALL
+                SELECT next.symbol, next.timeframe FROM pairs, LATERAL (
+                    SELECT symbol, timeframe FROM {table_name}
+                    WHERE (symbol, timeframe) > (pairs.symbol, pairs.timeframe)
+                    ORDER BY symbol, timeframe LIMIT 1
+                ) AS next
+            )
+            SELECT symbol, timeframe FROM pairs
+        """
+        self.db_manager.ensure_schema()
+        with self.db_manager.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query)
+            return cursor.fetchall()
+
+    def find_gaps(self, symbol, timeframe, start=None, end=None):
+        """
+        Пропуски ряда внутри диапазона.
+
+        Parameters:
+            symbol (str): Символ инструмента.
+            timeframe (str): Временной интервал.
+            start: Начало диапазона (мс, datetime или строка UTC); если первая свеча ряда
+                позже, промежуток до неё тоже считается пропуском. None - с первой свечи.
+            end: Конец диапазона (не включительно); промежуток после последней свечи
+                тоже считается пропуском. None - до последней свечи.
+
+        Returns:
+            np.ndarray: Пропуски [start, end), мс, форма (k, 2), по возрастанию.
+        """
+        timeframe_ms = timeframe_to_ms(timeframe)
+        # Соседние месячные свечи отстоят на 28-31 день: пропуск - расстояние больше самого длинного месяца
+        longest_ms = int(timeframe[:-1] or 1) * 31 * DAY_MS if timeframe[-1] == 'M' else timeframe_ms
+        start_ms = to_epoch_ms(start)
+        end_ms = to_epoch_ms(end)
+        where = "symbol = %s AND timeframe = %s"
+        params = [symbol, timeframe]
+        if start_ms is not None:
+            where += " AND timestamp >= %s"
+            params.append(start_ms)
+        if end_ms is not None:
+            where += " AND timestamp < %s"
+            params.append(end_ms)
+        query = f"""
+            SELECT previous, timestamp FROM (
+                SELECT timestamp, LAG(timestamp) OVER (ORDER BY timestamp) AS previous
+                FROM {self.db_manager.table_name} WHERE {where}
+            ) AS series
+            WHERE timestamp - previous > %s
+            ORDER BY timestamp
+        """
+
+        gaps = []
+        self.db_manager.ensure_schema()
+        with self.db_manager.pool.connection() as connection:
+            # Серверный курсор: пропуски читаются порциями, даже если их миллионы
+            with connection.cursor(name='gap_scan') as cursor:
+                cursor.itersize = self.fetch_size
+                cursor.execute(query, params + [longest_ms])
+                for row in cursor:
+                    gaps.append(row)
+            connection.commit()
+        gaps = np.array(gaps, dtype=np.int64).reshape(-1, 2)
+        # Пропуск начинается с закрытия свечи перед ним
+        gaps[:, 0] = candle_close_time(timeframe, gaps[:, 0], timeframe_ms)
+
+        if start_ms is not None or end_ms is not None:
+            first = self.db_manager.get_first_timestamp(symbol, timeframe, start=start_ms, end=end_ms)
+            last = self.db_manager.get_last_timestamp(symbol, timeframe, start=start_ms, end=end_ms)
+            edges = []
+            if start_ms is not None:
+                aligned = candle_open_time(timeframe, start_ms, timeframe_ms)
+                if aligned < start_ms:
+                    aligned = candle_close_time(timeframe, aligned, timeframe_ms)
+                head_end = first if first is not None else end_ms
+                if head_end is not None and aligned < head_end:
+                    edges.append((aligned, head_end))
+            if end_ms is not None and last is not None:
+                tail_start = candle_close_time(timeframe, last, timeframe_ms)
+                if tail_start < end_ms:
+                    edges.append((tail_start, end_ms))
+            if edges:
+                gaps = np.concatenate([gaps, np.array(edges, dtype=np.int64)])
+                gaps = gaps[np.argsort(gaps[:, 0], kind='stable')]
+        return gaps
+
+    def report(self, symbol, timeframe, start=None, end=None, page_limit=1000):
+        """
+        Сводка по пропускам ряда.
+
+        Returns:
+            dict: symbol, timeframe, gaps, missing (свечей), largest (свечей), first_gap,
+                requests (запросов к бирже для восстановления), а также сами пропуски (gap_ranges).
+        """
+        timeframe_ms = timeframe_to_ms(timeframe)
+        gaps = self.find_gaps(symbol, timeframe, start, end)
+        sizes = gap_sizes(gaps, timeframe_ms)
+        return {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'gaps': len(gaps),
+            'missing': int(sizes.sum()),
+            'largest': int(sizes.max()) if len(sizes) else 0,
+            'first_gap': format_timestamp(int(gaps[0, 0])) if len(gaps) else None,
+            'requests': len(plan_requests(gaps, timeframe_ms, page_limit)),
+            'gap_ranges': gaps,
+        }
+
+
+class GapRepairer:
+    """
+    Восстановление пропусков запросами к бирже.
+
+    Пропуски объединяются в минимальный набор запросов (plan_requests), ответы
+    накапливаются и записываются пакетами по flush_size свечей. Ошибки записи
+    не поглощаются. После записи ряд сканируется повторно: оставшиеся пропуски -
+    периоды, за которые у биржи нет данных. Месяцы локального кэша свечей, в которые
+    попали восстановленные свечи, удаляются (candle_cache.invalidate).
+
+    Parameters:
+        db_manager (DatabaseManager): Хранилище свечей.
+        exchange (ccxt.Exchange): Клиент биржи, общий для всех рядов (по умолчанию: ccxt.binance()).
+        flush_size (int): Свечей в одной вставке.
+        cache_root (str): Каталог кэша свечей (по умолчанию: candle_cache.DEFAULT_CACHE_DIR).
+    """
+
+    def __init__(self, db_manager, exchange=None, flush_size=50000, cache_root=None):
+        self.db_manager = db_manager
+        self.exchange = exchange
+        self.flush_size = flush_size
+        self.cache_root = cache_root
+        self.scanner = GapScanner(db_manager)
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    def _fetcher(self, symbol, timeframe):
+        from historical_prices import HistoricalPriceFetcher
+        fetcher = HistoricalPriceFetcher(symbol=symbol, timeframe=timeframe, exchange=self.exchange)
+        self.exchange = fetcher.exchange
+        return fetcher
+
+    def repair(self, symbol, timeframe, start=None, end=None):
+        """
+        Находит и восстанавливает пропуски ряда.
+
+        Parameters:
+            symbol (str): Символ инструмента.
+            timeframe (str): Временной интервал.
+            start: Начало диапазона (см. GapScanner.find_gaps).
+            end: Конец диапазона; по умолчанию не дальше начала текущей, незакрытой свечи.
+
+        Returns:
+            dict: gaps, requests, fetched, inserted, remaining (пропусков после восстановления),
+                seconds, а также gap_ranges - исходные пропуски.
+        """
+        started = time.perf_counter()
+        timeframe_ms = timeframe_to_ms(timeframe)
+        end_ms = to_epoch_ms(end)
+        now = int(time.time() * 1000)
+        closed = candle_open_time(timeframe, now, timeframe_ms)
+        end_ms = closed if end_ms is None else min(end_ms, closed)
+
+        # Без явного конца промежуток после последней свечи не восстанавливается: ряд мог быть
+        # остановлен намеренно
+        gaps = self.scanner.find_gaps(symbol, timeframe, start, None if end is None else end_ms)
+        gaps = gaps[gaps[:, 0] < end_ms]
+        gaps[:, 1] = np.minimum(gaps[:, 1], end_ms)
+        result = {'gaps': len(gaps), 'requests': 0, 'fetched': 0, 'inserted': 0, 'remaining': 0,
+                  'seconds': 0.0, 'gap_ranges': gaps}
+        if not len(gaps):
+            return result
+
+        fetcher = self._fetcher(symbol, timeframe)
+        requests = plan_requests(gaps, timeframe_ms, fetcher.page_limit)
+        self.logger.info("Пропусков %s %s: %s (%s свечей), запросов к бирже: %s.", symbol, timeframe, len(gaps),
+                         int(gap_sizes(gaps, timeframe_ms).sum()), len(requests))
+
+        buffer = []
+        buffered = 0
+        for since, until in requests:
+            for page in fetcher.iter_ohlcv_pages(since, min(until, end_ms)):
+                buffer.append(CandleBatch.from_rows(page))
+                buffered += len(page)
+            result['requests'] += 1
+            if buffered >= self.flush_size:
+                result['inserted'] += self._flush(buffer, symbol, timeframe)
+                result['fetched'] += buffered
+                buffer, buffered = [], 0
+        result['inserted'] += self._flush(buffer, symbol, timeframe)
+        result['fetched'] += buffered
+
+        remaining = self.scanner.find_gaps(symbol, timeframe, int(gaps[0, 0]), int(gaps[-1, 1]))
+        result['remaining'] = len(remaining)
+        result['seconds'] = time.perf_counter() - started
+        self.logger.info("Восстановление %s %s: получено %s свечей, записано %s, осталось пропусков %s "
+                         "(нет данных у биржи), %.1f с.", symbol, timeframe, result['fetched'],
+                         result['inserted'], result['remaining'], result['seconds'])
+        return result
+
+    def _flush(self, buffer, symbol, timeframe):
+        if not buffer:
+            return 0
+        candles = CandleBatch.concat(buffer)
+        inserted = self.db_manager.insert_data(candles, symbol=symbol, timeframe=timeframe, raise_errors=True)
+        candle_cache.invalidate(symbol, timeframe, int(candles.timestamp.min()), root=self.cache_root)
+        return inserted
+
+
+if __name__ == '__main__':
+    from database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description='Поиск и восстановление пропущенных свечей в базе данных.')
+    parser.add_argument('--symbol', help='Только этот символ (по умолчанию: все ряды таблицы)')
+    parser.add_argument('--timeframe', help='Только этот интервал')
+    parser.add_argument('--start', help="Начало диапазона (UTC), 'YYYY-MM-DD[ HH:MM:SS]'")
+    parser.add_argument('--end')
+    parser.add_argument('--report', action='store_true', help='Только отчёт, без запросов к бирже')
+    parser.add_argument('--verbose', action='store_true', help='Вывести границы каждого пропуска')
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    scanner = GapScanner(db_manager)
+    series = [(symbol, timeframe) for symbol, timeframe in scanner.series()
+              if (args.symbol is None or symbol == args.symbol)
+              and (args.timeframe is None or timeframe == args.timeframe)]
+
+    if args.report:
+        print(f"{'symbol':<14} {'timeframe':<9} {'gaps':>8} {'missing':>10} {'largest':>9} {'requests':>9}  first gap")
+        for symbol, timeframe in series:
+            report = scanner.report(symbol, timeframe, args.start, args.end)
+            print(f"{symbol:<14} {timeframe:<9} {report['gaps']:>8} {report['missing']:>10} {report['largest']:>9} "
+                  f"{report['requests']:>9}  {report['first_gap'] or '-'}")
+            if args.verbose:
+                for gap_start, gap_end in report['gap_ranges'].tolist():
+                    print(f"    {format_timestamp(gap_start)} - {format_timestamp(gap_end)}")
+    else:
+        # Старшие интервалы рядов с минутной базой не запрашиваются у биржи, а пересчитываются
+        # из восстановленной базы (resampling.py)
+        from resampling import DERIVED_TIMEFRAMES, ResamplingEngine
+        bases = {symbol for symbol, timeframe in series if timeframe == BASE_TIMEFRAME}
+        repairer = GapRepairer(db_manager)
+        for symbol, timeframe in series:
+            if symbol in bases and timeframe in DERIVED_TIMEFRAMES:
+                continue
+            result = repairer.repair(symbol, timeframe, args.start, args.end)
+            if timeframe != BASE_TIMEFRAME:
+                continue
+            spans = [result['gap_ranges']] if result['inserted'] else []
+            spans += [scanner.find_gaps(symbol, derived, args.start, args.end)
+                      for derived in DERIVED_TIMEFRAMES if (symbol, derived) in series]
+            spans = np.concatenate(spans) if spans else np.empty((0, 2), dtype=np.int64)
+            if len(spans):
+                ResamplingEngine(db_manager, symbol).materialize(int(spans[:, 0].min()), int(spans[:, 1].max()))
@@ -1,41 +1,201 @@
 import logging
-import plotly.graph_objects as go
-from database import DatabaseManager
+import numpy as np
+from candles import CandleBatch
+from pivots import find_pivots
+from resampling import bucket_bounds, resample_candles
+from timeutils import to_display_time, to_epoch_ms
 import warnings
 from custom_logger import LoggerConfig
+from metrics import timed
+
+# Интервалы отображения, мс: от 1 минуты до недели
+DISPLAY_INTERVALS_MS = [60_000 * minutes for minutes in (1, 3, 5, 15, 30, 60, 120, 240, 360, 720, 1440, 4320, 10080)]
+# Сколько свечей отдавать в браузер: больше ширины графика в пикселях смысла нет
+DEFAULT_MAX_CANDLES = 2000
+
+
+def display_interval(timestamp, max_candles=DEFAULT_MAX_CANDLES):
+    """
+    Наименьший интервал из DISPLAY_INTERVALS_MS (или кратный неделе), при котором диапазон
+    укладывается в max_candles свечей.
+
+    Parameters:
+        timestamp (np.ndarray): Метки времени свечей по возрастанию, мс.
+        max_candles (int): Предельное количество свечей на графике.
+
+    Returns:
+        int | None: Интервал агрегации, мс; None - свечей не больше max_candles, агрегация не нужна.
+    """
+    if len(timestamp) <= max_candles:
+        return None
+    span = int(timestamp[-1]) - int(timestamp[0])
+    for interval in DISPLAY_INTERVALS_MS:
+        if span // interval + 1 <= max_candles:
+            return interval
+    week = DISPLAY_INTERVALS_MS[-1]
+    return week * -(-span // (week * (max_candles - 1)))
+
+
+@timed('chart_figure')
+def build_candlestick_figure(candles, moving_averages=None, pivot_length=None, max_candles=DEFAULT_MAX_CANDLES,
+                             title='Candlestick Chart', pivots=None):
+    """
+    Строит график свечей с разрешением, соответствующим ширине графика.
+
+    Свечи агрегируются до max_candles на стороне Python (resampling.resample_candles), скользящие
+    средние берутся на закрытии каждого интервала, точки разворота ищутся по отображаемым
+    свечам (или передаются готовыми в pivots). Все вершины и впадины - один трейс маркеров,
+    соединяющая их линия - один трейс, поэтому количество трейсов не зависит от длины истории.
+
+    Parameters:
+        candles (CandleBatch): Свечи по возрастанию времени.
+        moving_averages (dict): Подпись -> (массив значений на каждую свечу candles, цвет).
+        pivot_length (int): Окно точек разворота (см. pivots.find_pivots); None - без них.
+        max_candles (int): Предельное количество свечей на графике.
+        title (str): Заголовок графика.
+        pivots (tuple): Готовые точки разворота (timestamps мс, is_high, values); рисуются
+            на своих местах вместо поиска по отображаемым свечам, pivot_length не используется.
+
+    Returns:
+        go.Figure: График; в layout.meta['interval_ms'] - интервал агрегации (None - исходные свечи).
+    """
+    import plotly.graph_objects as go
+
+    interval = display_interval(candles.timestamp, max_candles)
+    shown = candles if interval is None else resample_candles(candles, interval)
+    dates = to_display_time(shown.timestamp)
+
+    fig = go.Figure(data=[go.Candlestick(x=dates,
+                                         open=shown.open_price,
+                                         high=shown.high_price,
+                                         low=shown.low_price,
+                                         close=shown.close_price,
+                                         name='Candles')])
+
+    for name, (values, color) in (moving_averages or {}).items():
+        values = np.asarray(values, dtype=np.float64)
+        if interval is not None and len(values):
+            values = values[bucket_bounds(candles.timestamp, interval)[1]]
+        fig.add_trace(go.Scatter(x=dates, y=values, mode='lines', name=name, line=dict(color=color)))
+
+    pivot_dates = None
+    if pivots is not None:
+        timestamps, is_high, values = (np.asarray(column) for column in pivots)
+        is_high = is_high.astype(bool)
+        pivot_dates = to_display_time(timestamps.astype(np.int64))
+    elif pivot_length is not None:
+        indices, is_high, values = find_pivots(shown.high_price, shown.low_price, pivot_length)
+        pivot_dates = dates[indices]
+    if pivot_dates is not None:
+        fig.add_trace(go.Scatter(x=pivot_dates, y=values, mode='lines', name='Beer Points line',
+                                 line=dict(color='gray', width=2), hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=pivot_dates, y=values, mode='markers', name='Beer Points',
+                                 text=np.where(is_high, 'Potential High', 'Potential Low'),
+                                 marker=dict(color=np.where(is_high, 'red', 'green'), size=10,
+                                             symbol=np.where(is_high, 'triangle-down', 'triangle-up'))))
+
+    fig.update_layout(
+        title=title,
+        yaxis_title='Price',
+        xaxis_rangeslider_visible=False,
+        meta={'interval_ms': interval},
+    )
+    return fig
 
 
 class CandlestickChart:
-    def __init__(self):
+    """
+    График свечей из локального кэша с уровнем детализации по видимому диапазону.
+
+    Parameters:
+        db_manager (DatabaseManager): Источник свечей для кэша.
+        cache (CandleCache): Локальный кэш свечей.
+        max_candles (int): Предельное количество свечей на графике.
+        pivot_length (int): Окно точек разворота; None - без них.
+    """
+
+    def __init__(self, db_manager=None, cache=None, max_candles=DEFAULT_MAX_CANDLES, pivot_length=None):
+        # Общий DatabaseManager (соединения берутся из его пула); создаётся при первом построении
+        self.db_manager = db_manager
+        # Локальный кэш свечей: из базы запрашиваются только новые свечи
+        self.cache = cache
+        self.max_candles = max_candles
+        self.pivot_length = pivot_length
+        self.candles = None
 
         # Конфигурация логгера
         self.logger = logging.getLogger(__name__)
         LoggerConfig.configure_logger(self.logger)
 
-    def plot_chart(self):
+    def load(self):
+        """
+        Загружает (обновляет) свечи из кэша.
+        """
+        if self.cache is None:
+            from candle_cache import CandleCache
+            from database import DatabaseManager
+            self.cache = CandleCache(self.db_manager or DatabaseManager())
+        self.candles = CandleBatch.from_frame(self.cache.load())
+        return self.candles
+
+    def figure(self, start=None, end=None):
+        """
+        График диапазона [start, end) с детализацией по его длине: чем уже диапазон,
+        тем мельче интервал агрегации, вплоть до исходных свечей.
+
+        Parameters:
+            start: Начало диапазона: миллисекунды, datetime или строка (UTC); None - с начала.
+            end: Конец диапазона (не включительно); None - до конца.
+        """
+        if self.candles is None:
+            self.load()
+        timestamp = self.candles.timestamp
+        first = 0 if start is None else int(np.searchsorted(timestamp, to_epoch_ms(start), side='left'))
+        last = len(timestamp) if end is None else int(np.searchsorted(timestamp, to_epoch_ms(end), side='left'))
+        return build_candlestick_figure(self.candles[first:last], pivot_length=self.pivot_length,
+                                        max_candles=self.max_candles)
+
+    def zoom_widget(self):
+        """
+        go.FigureWidget для Jupyter, который при изменении видимого диапазона по оси X
+        перестраивает трейсы с детализацией этого диапазона (требует пакет anywidget).
+        """
+        import plotly.graph_objects as go
+
+        widget = go.FigureWidget(self.figure())
+
+        def on_range(layout, x_range):
+            if not x_range:
+                return
+            detail = self.figure(*x_range)
+            with widget.batch_update():
+                for trace, new_trace in zip(widget.data, detail.data):
+                    if trace.type == 'candlestick':
+                        trace.update(x=new_trace.x, open=new_trace.open, high=new_trace.high,
+                                     low=new_trace.low, close=new_trace.close)
+                    elif trace.mode == 'markers':
+                        trace.update(x=new_trace.x, y=new_trace.y, text=new_trace.text, marker=new_trace.marker)
+                    else:
+                        trace.update(x=new_trace.x, y=new_trace.y)
+
+        widget.layout.on_change(on_range, 'xaxis.range')
+        return widget
+
+    def plot_chart(self, start=None, end=None):
         self.logger.info('Plotting candlestick chart...')
 
         try:
-            db_manager = DatabaseManager()
-            data = db_manager.fetch_data_for_chart()
+            self.load()
 
             with warnings.catch_warnings():
                 # Suppress the specific FutureWarning
                 warnings.simplefilter(action='ignore', category=FutureWarning)
 
-                fig = go.Figure(data=[go.Candlestick(x=data['timestamp'],
-                                                     open=data['open_price'],
-                                                     high=data['high_price'],
-                                                     low=data['low_price'],
-                                                     close=data['close_price'])])
-
-                fig.update_layout(
-                    title='Candlestick Chart',
-                    yaxis_title='Price',
-                    xaxis_title='Timestamp'
-                )
+                fig = self.figure(start, end)
+                fig.update_layout(xaxis_title='Timestamp')
                 fig.show()
 
-            self.logger.info('Candlestick chart plot completed.')
+            self.logger.info('Candlestick chart plot completed (%s candles, interval %s ms).',
+                             len(self.candles), fig.layout.meta['interval_ms'])
         except Exception as e:
-            self.logger.exception(f'Error occurred while plotting candlestick chart: {str(e)}')
\ No newline at end of file
+            self.logger.exception(f'Error occurred while plotting candlestick chart: {str(e)}')
@@ -1,10 +1,10 @@
-import ccxt
-import datetime
 import logging
 import time
-from datetime import datetime, timedelta
 from custom_logger import LoggerConfig
 from configuration_default import DefaultConfig
+from timeutils import format_timestamp
+from candles import CandleBatch
+from metrics import count_error, timed, timer
 
 
 class HistoricalPriceFetcher:
@@ -15,6 +15,7 @@ class HistoricalPriceFetcher:
         symbol (str): Символ торгуемого инструмента (по умолчанию: 'BTC/USDT').
         timeframe (str): Временной интервал (по умолчанию: '1h').
         period (int): Количество свечей (по умолчанию: 1500).
+        exchange (ccxt.Exchange): Клиент биржи (по умолчанию: ccxt.binance()).
 
     Attributes:
         symbol (str): Символ торгуемого инструмента.
@@ -25,9 +26,15 @@ class HistoricalPriceFetcher:
 
     Methods:
         fetch_historical_data: Получает исторические данные о цене для указанного инструмента и периода.
+        iter_ohlcv_pages: Постранично обходит произвольный диапазон времени.
     """
 
-    def __init__(self, symbol=None, timeframe=None, period=None):
+    # Максимальное количество свечей в одном ответе fetch_ohlcv
+    page_limit = 1000
+    # Количество повторов запроса страницы при сетевых ошибках
+    max_retries = 5
+
+    def __init__(self, symbol=None, timeframe=None, period=None, exchange=None):
         """
         Инициализация объекта HistoricalPriceFetcher.
 
@@ -35,6 +42,7 @@ class HistoricalPriceFetcher:
             symbol (str): Символ торгуемого инструмента.
             timeframe (str): Временной интервал.
             period (int): Количество свечей.
+            exchange (ccxt.Exchange): Клиент биржи или совместимая заглушка для тестов.
 
         """
         self.configuration_default = DefaultConfig()  # Initialize with default settings
@@ -46,8 +54,14 @@ class HistoricalPriceFetcher:
         if period:
             self.configuration_default.period = period
 
+        if exchange is None:
+            # ccxt импортируется только при создании настоящего клиента биржи
+            import ccxt
+            exchange = ccxt.binance()
+        self.exchange = exchange
+        self._last_request = 0.0
+
         # Конфигурация логгера
-        self.exchange = ccxt.binance()
         self.logger = logging.getLogger(__name__)
         LoggerConfig.configure_logger(self.logger)
 
@@ -59,85 +73,143 @@ class HistoricalPriceFetcher:
         self.logger.exception('Critical message')
 
 
+    @property
+    def timeframe_ms(self):
+        """
+        Длительность свечи текущего временного интервала в миллисекундах.
+        """
+        return self.exchange.parse_timeframe(self.configuration_default.timeframe) * 1000
+
+    def _throttle(self):
+        """
+        Выдерживает паузу exchange.rateLimit между запросами, если биржа не делает этого сама.
+        """
+        if getattr(self.exchange, 'enableRateLimit', False):
+            return
+        delay = getattr(self.exchange, 'rateLimit', 0) / 1000.0 - (time.monotonic() - self._last_request)
+        if delay > 0:
+            time.sleep(delay)
+        self._last_request = time.monotonic()
+
+    def _fetch_page(self, since, limit):
+        """
+        Запрашивает одну страницу свечей, повторяя запрос с экспоненциальной задержкой
+        при сетевых ошибках и превышении лимита запросов.
+        """
+        for attempt in range(self.max_retries):
+            self._throttle()
+            try:
+                # Каждая попытка - отдельное измерение; сетевые ошибки учитываются как ошибки стадии
+                with timer('fetch_ohlcv') as fetch_timer:
+                    ohlcv = self.exchange.fetch_ohlcv(self.configuration_default.symbol,
+                                                      timeframe=self.configuration_default.timeframe,
+                                                      since=since, limit=limit)
+                    fetch_timer.rows = len(ohlcv or [])
+                return ohlcv
+            except Exception as e:
+                import ccxt
+                if not isinstance(e, ccxt.NetworkError) or attempt == self.max_retries - 1:
+                    raise
+                delay = 2 ** attempt
+                self.logger.warning("Ошибка сети при запросе свечей (%s), повтор через %s с.", e, delay)
+                time.sleep(delay)
+
+    def iter_ohlcv_pages(self, start_time, end_time, page_limit=None):
+        """
+        Постранично обходит свечи в диапазоне [start_time, end_time).
+
+        Parameters:
+            start_time (int): Начало диапазона, миллисекунды.
+            end_time (int): Конец диапазона (не включительно), миллисекунды.
+            page_limit (int): Размер страницы (по умолчанию: page_limit класса).
+
+        Yields:
+            list: Страница свечей [timestamp, open, high, low, close, volume] в исходном формате биржи.
+        """
+        page_limit = page_limit or self.page_limit
+        since = start_time
+        while since < end_time:
+            ohlcv = self._fetch_page(since, page_limit)
+            page = [candle for candle in ohlcv or [] if since <= candle[0] < end_time]
+            if not page:
+                break
+            yield page
+            since = page[-1][0] + self.timeframe_ms
+
+    @timed('fetch_historical_data', rows=len)
     def fetch_historical_data(self):
+        """
+        Получает последние period закрытых свечей инструмента. Текущая, ещё не закрытая свеча
+        не возвращается: её значения неполны, а после закрытия она придёт из потока свечей.
+
+        Returns:
+            CandleBatch: Свечи по возрастанию времени (пустой набор при ошибке).
+        """
         try:
             # Use self.configuration_default.symbol instead of self.symbol
             current_server_time = self.exchange.fetch_ticker(self.configuration_default.symbol)['timestamp']
-            timeframe_in_milliseconds = self.exchange.parse_timeframe(self.configuration_default.timeframe) * 1000
+            timeframe_in_milliseconds = self.timeframe_ms
             # Рассчет подходящего начального и конечного времени на основе временного интервала и количества периодов
-            periods = 1000  # Желаемое количество периодов
-            end_time = current_server_time
-            start_time = current_server_time - (periods * timeframe_in_milliseconds)
+            periods = int(self.configuration_default.period)
+            # Конец диапазона - время открытия текущей свечи (не включительно)
+            end_time = current_server_time - current_server_time % timeframe_in_milliseconds
+            start_time = end_time - (periods * timeframe_in_milliseconds)
 
-            # Извлечение данных OHLCV
-            ohlcv = self.exchange.fetch_ohlcv(self.configuration_default.symbol, timeframe=self.configuration_default.timeframe, since=start_time, limit=1500)
-            # Фильтрация данных до указанного конечного времени
-            filtered_ohlcv = [candle for candle in ohlcv if candle[0] <= end_time]
-
-            # Переформатирование меток времени для читаемости
-            for i in range(len(filtered_ohlcv)):
-                filtered_ohlcv[i][0] = datetime.fromtimestamp(filtered_ohlcv[i][0] / 1000.0).strftime(
-                    '%Y-%m-%d %H:%M:%S')
+            # Извлечение данных OHLCV страницами.
+            # Метки времени остаются в миллисекундах - в этом виде они хранятся в базе данных.
+            # Каждая страница сразу переводится в массивы, списки ответа биржи не накапливаются
+            pages = [CandleBatch.from_rows(page) for page in self.iter_ohlcv_pages(start_time, end_time)]
+            filtered_ohlcv = CandleBatch.concat(pages)
 
             self.logger.debug("Успешно получены исторические ценовые данные.")
             return filtered_ohlcv
 
         except Exception as e:
+            count_error('fetch_historical_data')
             self.logger.error(f"Произошла ошибка при извлечении исторических данных: {str(e)}")
-            return []
+            return CandleBatch.empty()
+
+    def backfill(self, db_manager, start_time, end_time=None, resume=True):
+        """
+        Загружает историю за произвольный диапазон в базу данных (см. BackfillEngine).
+        """
+        from backfill import BackfillEngine
+        return BackfillEngine(self, db_manager).run(start_time, end_time, resume=resume)
+
+    def fetch_latest_candle_data(self, open_time=None):
+        """
+        Получает последнюю закрытую свечу одним REST-запросом.
 
-    def fetch_latest_candle_data(self):
+        Для получения свечей сразу по закрытию используйте KlineStream (kline_stream.py)
+        или CandleCloseScheduler (scheduler.py); этот метод служит для разовых запросов и дозагрузки.
+
+        Parameters:
+            open_time (int): Время открытия нужной свечи, мс (по умолчанию: последняя закрытая
+                свеча по локальным часам).
+
+        Returns:
+            list: Свеча [timestamp, open, high, low, close, volume] или None.
+        """
         try:
-            while True:
-                # Get the current server time in milliseconds
-                current_server_time_ms = self.exchange.fetch_ticker(self.configuration_default.symbol)['timestamp']
-
-                # Convert the timestamp to the desired format
-                current_server_time = datetime.fromtimestamp(current_server_time_ms / 1000.0).strftime(
-                    '%Y-%m-%d %H:%M:%S.%f')[:-3]
-
-                # Calculate the start time for the next hour, plus one minute
-                next_hour = (datetime.fromtimestamp(current_server_time_ms / 1000.0)
-                             .replace(minute=1, second=0, microsecond=0))  # Set the minute to 1 for the next hour
-                if datetime.now().minute >= 1:
-                    next_hour = next_hour + timedelta(
-                        hours=1)  # Move to the next hour if the current time is past 1 minute
-
-                start_of_next_hour = int(next_hour.timestamp()) * 1000  # Convert to milliseconds
-
-                # Fetch data for the next hour
-                data_for_next_hour = self.exchange.fetch_ohlcv(self.configuration_default.symbol,
-                                                               timeframe=self.configuration_default.timeframe,
-                                                               since=start_of_next_hour, limit=1)
-
-                # Sleep until the start of the next candle
-                sleep_time = max(0, (start_of_next_hour - current_server_time_ms) / 1000) + 60  # Add 60 seconds
-                time.sleep(sleep_time)
-
-                # Fetch the next upcoming candle
-                next_candle_data = self.exchange.fetch_ohlcv(self.configuration_default.symbol,
-                                                             timeframe=self.configuration_default.timeframe,
-                                                             since=start_of_next_hour,
-                                                             limit=1)
-
-                if next_candle_data:
-                    latest_candle_data = {
-                        'timestamp': current_server_time,
-                        'open_price': next_candle_data[0][1],
-                        'high_price': next_candle_data[0][2],
-                        'low_price': next_candle_data[0][3],
-                        'close_price': next_candle_data[0][4],
-                        'volume': next_candle_data[0][5]
-                    }
-                    # Log the fetched candle data and success message
-                    self.logger.info("Fetched Latest Candle Data: %s", latest_candle_data)
-                    self.logger.info("Successfully fetched the latest candle data.")
-
-                    # Save the latest candle data (you can modify this to your specific use case)
-                    self.latest_candle_data = latest_candle_data
-
-                else:
-                    self.logger.warning("No data available for the next candle.")
+            last_closed = open_time
+            if last_closed is None:
+                timeframe_ms = self.timeframe_ms
+                now = int(time.time() * 1000)
+                last_closed = now - now % timeframe_ms - timeframe_ms
+
+            candles = self._fetch_page(last_closed, 1)
+            if candles and candles[0][0] == last_closed:
+                latest_candle_data = list(candles[0][:6])
+                self.logger.info("Fetched Latest Candle Data: %s %s", format_timestamp(latest_candle_data[0]),
+                                 latest_candle_data[1:])
+
+                # Save the latest candle data
+                self.latest_candle_data = latest_candle_data
+                return latest_candle_data
+
+            self.logger.warning("No data available for the last closed candle.")
+            return None
 
         except Exception as e:
             self.logger.exception("Error fetching latest candle data: %s", str(e))
+            return None
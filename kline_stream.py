@@ -0,0 +1,186 @@
+import asyncio
+import inspect
+import json
+import logging
+import time
+
+import websockets
+from custom_logger import LoggerConfig
+from historical_prices import HistoricalPriceFetcher
+
+BINANCE_STREAM_URL = 'wss://stream.binance.com:9443'
+
+
+class KlineStream:
+    """
+    Поток закрытых свечей через WebSocket kline-канал Binance.
+
+    Свеча выдаётся сразу после прихода сообщения с признаком закрытия (k.x = true).
+    При разрыве соединения, отказе сервера в подключении (например, HTTP 503) или ошибке
+    REST-дозагрузки поток переподключается с экспоненциальной задержкой, а пропущенные
+    за это время свечи догружает через REST (HistoricalPriceFetcher), так что потребитель
+    получает непрерывную последовательность.
+
+    Использование:
+        async for candle in KlineStream(fetcher):
+            ...
+
+    Parameters:
+        fetcher (HistoricalPriceFetcher): Символ, интервал и REST-клиент для дозагрузки.
+        url (str): Адрес WebSocket-сервера (по умолчанию: BINANCE_STREAM_URL).
+        last_timestamp (int): Метка (мс) последней уже полученной свечи; с неё начинается дозагрузка.
+        reconnect_delay (float): Начальная задержка переподключения, секунды.
+        max_reconnect_delay (float): Максимальная задержка переподключения, секунды.
+
+    Yields:
+        list: Закрытая свеча [timestamp (мс), open, high, low, close, volume].
+    """
+
+    def __init__(self, fetcher=None, url=BINANCE_STREAM_URL, last_timestamp=None, reconnect_delay=1.0,
+                 max_reconnect_delay=60.0):
+        self.fetcher = fetcher or HistoricalPriceFetcher()
+        self.url = url
+        self.last_timestamp = last_timestamp
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.reconnects = 0
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    @property
+    def symbol(self):
+        return self.fetcher.configuration_default.symbol
+
+    @property
+    def timeframe(self):
+        return self.fetcher.configuration_default.timeframe
+
+    @property
+    def stream_url(self):
+        stream = self.symbol.replace('/', '').lower()
+        return f"{self.url}/ws/{stream}@kline_{self.timeframe}"
+
+    @staticmethod
+    def parse_message(message):
+        """
+        Разбирает сообщение kline; возвращает закрытую свечу или None.
+        """
+        data = json.loads(message)
+        kline = data.get('k')
+        if data.get('e') != 'kline' or not kline or not kline.get('x'):
+            return None
+        return [int(kline['t']), float(kline['o']), float(kline['h']), float(kline['l']),
+                float(kline['c']), float(kline['v'])]
+
+    async def _gap_fill(self, end_time):
+        """
+        Догружает через REST свечи между последней полученной и end_time (не включительно).
+        """
+        if self.last_timestamp is None:
+            return []
+        start_time = self.last_timestamp + self.fetcher.timeframe_ms
+        if start_time >= end_time:
+            return []
+
+        loop = asyncio.get_running_loop()
+        pages = await loop.run_in_executor(
+            None, lambda: list(self.fetcher.iter_ohlcv_pages(start_time, end_time)))
+        candles = [candle[:6] for page in pages for candle in page]
+        if candles:
+            self.logger.info("Дозагружено %s пропущенных свечей %s %s.", len(candles), self.symbol,
+                             self.timeframe)
+        return candles
+
+    def _accept(self, candle):
+        if self.last_timestamp is not None and candle[0] <= self.last_timestamp:
+            return False
+        self.last_timestamp = candle[0]
+        return True
+
+    async def __aiter__(self):
+        import ccxt
+
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with websockets.connect(self.stream_url) as websocket:
+                    self.logger.debug("Подключено к потоку свечей %s.", self.stream_url)
+                    delay = self.reconnect_delay
+
+                    # Свечи, закрывшиеся пока соединения не было
+                    timeframe_ms = self.fetcher.timeframe_ms
+                    now = int(time.time() * 1000)
+                    for candle in await self._gap_fill(now - now % timeframe_ms):
+                        if self._accept(candle):
+                            yield candle
+
+                    async for message in websocket:
+                        candle = self.parse_message(message)
+                        if candle is None:
+                            continue
+                        for missed in await self._gap_fill(candle[0]):
+                            if self._accept(missed):
+                                yield missed
+                        if self._accept(candle):
+                            yield candle
+
+                reason = 'соединение закрыто сервером'
+            except (websockets.ConnectionClosed, websockets.InvalidHandshake, OSError, asyncio.TimeoutError,
+                    ccxt.BaseError) as e:
+                # Дозагрузка повторяется после переподключения: last_timestamp не изменился
+                reason = str(e) or type(e).__name__
+
+            self.reconnects += 1
+            self.logger.warning("Поток свечей прерван (%s), переподключение через %s с.", reason, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+
+async def stream_to_database(stream, db_manager, on_candle=None):
+    """
+    Записывает закрытые свечи потока в базу данных по мере поступления.
+
+    Если потоку не задана последняя полученная свеча, ею считается последняя закрытая свеча
+    в базе данных, и пропуск с того момента догружается через REST. Свечи потока
+    перезаписывают сохранённые ранее (например, незакрытую свечу из fetch_historical_data).
+
+    Свеча, которую не удалось записать, записывается повторно с экспоненциальной задержкой
+    (reconnect_delay ... max_reconnect_delay потока); до успешной записи on_candle не вызывается,
+    а последней полученной свечой потока остаётся предыдущая, поэтому при переподключении
+    незаписанная свеча будет догружена заново.
+
+    Parameters:
+        stream (KlineStream): Источник свечей.
+        db_manager (DatabaseManager): Получатель свечей.
+        on_candle (callable): Вызывается с каждой записанной свечой; может быть сопрограммой
+            (async def), тогда следующая свеча обрабатывается после её завершения.
+    """
+    loop = asyncio.get_running_loop()
+    if stream.last_timestamp is None:
+        timeframe_ms = stream.fetcher.timeframe_ms
+        now = int(time.time() * 1000)
+        stream.last_timestamp = await loop.run_in_executor(None, lambda: db_manager.get_last_timestamp(
+            stream.symbol, stream.timeframe, end=now - now % timeframe_ms))
+
+    written = stream.last_timestamp
+    async for candle in stream:
+        stream.last_timestamp = written
+        delay = stream.reconnect_delay
+        while True:
+            try:
+                await loop.run_in_executor(None, lambda: db_manager.insert_data(
+                    [candle], symbol=stream.symbol, timeframe=stream.timeframe, on_conflict='update',
+                    raise_errors=True))
+                break
+            except Exception as e:
+                stream.logger.warning("Свеча %s %s %s не записана (%s), повтор через %s с.", candle[0],
+                                      stream.symbol, stream.timeframe, e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, stream.max_reconnect_delay)
+        stream.last_timestamp = written = candle[0]
+        if on_candle is not None:
+            result = on_candle(candle)
+            if inspect.isawaitable(result):
+                await result
@@ -1,40 +1,82 @@
 from dotenv import load_dotenv
+import asyncio
 import os
-import time
-import datetime
 import logging
 import sys
+import time
 from connected_api import ConnectedAPI
 from historical_prices import HistoricalPriceFetcher
+from kline_stream import KlineStream, stream_to_database
+from scheduler import CandleCloseScheduler, candle_close_job
+from streaming_indicators import IndicatorEngine
+from resampling import BASE_TIMEFRAME, ResamplingEngine
+from startup import StartupOrchestrator
+from timeutils import format_timestamp
 from database import DatabaseManager
-from custom_logger import ColoredConsoleHandler
+from candles import CandleBatch
+from custom_logger import LoggerConfig
+import metrics
 from grapf_objects import CandlestickChart
 
 # Настройка логирования
 logger = logging.getLogger(__name__)  # Инициализация логгера
-logger.setLevel(logging.INFO)  # Установка уровня логирования на INFO
-
-# Создание обработчика для вывода в консоль с цветами
-handler = ColoredConsoleHandler(sys.stdout)
-handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 
-# Добавление обработчика к логгеру
-logger.addHandler(handler)
 
 def main():
+    # Вывод в консоль с цветами выполняется фоновым потоком; общий обработчик добавляется один раз.
+    # Настройка выполняется при запуске, а не при импорте модуля
+    LoggerConfig.install(sys.stdout)
+    LoggerConfig.configure_logger(logger)
+    logger.setLevel(logging.INFO)  # Установка уровня логирования на INFO
+
     # Загрузка переменных окружения из файла .env
     load_dotenv(dotenv_path=r'C:\Users\wangr\PycharmProjects\pythonProject9\config\api.keys.env')
     api_key = os.getenv("API_KEY")
     secret_key = os.getenv("SECRET_KEY")
 
+    # Метрики и профилирование включаются переменными METRICS, METRICS_PORT, METRICS_FILE и PROFILE
+    metrics.configure_from_env()
+
     # Создание экземпляра ConnectedAPI
     connected_api = ConnectedAPI(api_key, secret_key)
 
-    # Вызов метода get_account_balance
-    balances, output_data = connected_api.get_account_balance()
-
-    # Вызов метода get_open_positions
-    positions, output_data = connected_api.get_open_positions()
+    # Один DatabaseManager на всё время работы: соединения берутся из общего пула
+    db_manager = DatabaseManager()
+    metrics.registry.register_collector('pool', db_manager.pool_stats)
+    metrics.registry.register_collector('api', connected_api.get_stats)
+    metrics.registry.register_collector('logging', LoggerConfig.stats)
+    fetcher = HistoricalPriceFetcher()
+    # Индикаторы пересчитываются инкрементально: история прогоняется один раз при запуске
+    indicator_engine = IndicatorEngine()
+    # Старшие интервалы строятся из минутных свечей в базе, а не загружаются с биржи отдельно
+    resampling_engine = None
+    if fetcher.configuration_default.timeframe == BASE_TIMEFRAME:
+        resampling_engine = ResamplingEngine(db_manager, fetcher.configuration_default.symbol)
+
+    # Независимые запросы запуска выполняются параллельно; время готовности - самая длинная цепочка
+    startup = StartupOrchestrator(timeout=60.0)
+    startup.add_phase('balance', connected_api.get_account_balance)
+    startup.add_phase('positions', connected_api.get_open_positions)
+    startup.add_phase('database', db_manager.ensure_schema, required=True)
+    startup.add_phase('history', fetcher.fetch_historical_data)
+    startup.add_phase('store_history', lambda _, candles: db_manager.insert_data(candles, raise_errors=True),
+                      depends=('database', 'history'))
+    # Прогрев индикаторов ждёт записи истории, но выполняется и без неё - по уже сохранённым свечам.
+    # Учитываются только закрытые свечи: текущая придёт в log_candle после закрытия
+    def warm_up_indicators(_):
+        now = int(time.time() * 1000)
+        open_time = now - now % fetcher.timeframe_ms
+        return indicator_engine.warm_up(
+            CandleBatch.from_arrays(db_manager.query_candles(end=open_time, as_arrays=True)))
+
+    startup.add_phase('indicators', warm_up_indicators, depends=('database',), after=('store_history',))
+    if resampling_engine is not None:
+        startup.add_phase('resample', lambda _: resampling_engine.catch_up(),
+                          depends=('database',), after=('store_history',))
+    results = startup.run()
+
+    balances, _ = results.get('balance', ([], ''))
+    positions, _ = results.get('positions', ([], ''))
 
     # Логирование балансов и позиций
     logger.info("=====================\nBalances:")
@@ -51,13 +93,7 @@ def main():
     else:
         logger.info("Открытых позиций нет.\n======================")
 
-    # Определение имени таблицы
-    table_name = "traiding_bot_binance"
-
-    # Получение исторических данных по инструменту
-    fetcher = HistoricalPriceFetcher()
-    historical_candle_data = fetcher.fetch_historical_data()
-
+    historical_candle_data = results.get('history')
     if historical_candle_data:
         # Логирование успешного получения и количества записей
         logger.info("Количество полученных записей: %s", len(historical_candle_data))
@@ -68,47 +104,47 @@ def main():
         # Вывод последних данных
         latest_candle = historical_candle_data[-1]
         logger.info(' | '.join(column_names))
-        logger.info(' | '.join(str(item) for item in latest_candle))
-
-        # Подключение к базе данных и вставка данных
-        db_manager = DatabaseManager()
-        db_manager.insert_data(table_name, historical_candle_data)
-
-        db_manager.close_connection()
+        logger.info(' | '.join([format_timestamp(latest_candle[0])] + [str(item) for item in latest_candle[1:]]))
     else:
         logger.error("No historical data received.")
 
-        # Create an instance of DatabaseManager
-        db_manager = DatabaseManager()
-
-        # Fetch data for chart
-        chart_data = db_manager.fetch_data_for_chart(table_name)
-
         # Plot the candlestick chart
-        chart = CandlestickChart()
-        chart.plot_chart(chart_data)
-
-    historical_price_fetcher = HistoricalPriceFetcher()
-
-    # Получение начального времени для сравнения
-    initial_timeframe = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
-
-    while True:
-        # Ожидание изменения временного интервала (в данном случае каждый час)
-        while datetime.datetime.now().replace(minute=0, second=0, microsecond=0) == initial_timeframe:
-            time.sleep(10)  # Подстройте это задержку в зависимости от желаемой частоты проверки
-
-        # Обновление начального временного интервала для следующей итерации
-        initial_timeframe = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
-
-        # Получение последних данных свечи
-        latest_candle_data = historical_price_fetcher.fetch_latest_candle_data()
-
-        # Вставка данных последней свечи в базу данных
-        if latest_candle_data:
-            db_manager = DatabaseManager()
-            db_manager.insert_data(table_name, [latest_candle_data])  # Обратите внимание на [latest_candle_data]
-            db_manager.close_connection()
+        chart = CandlestickChart(db_manager)
+        chart.plot_chart()
+
+    # Получение свечей сразу по закрытию через WebSocket и запись их в базу данных
+    def log_candle(candle):
+        logger.info("Новая свеча: %s", ' | '.join([format_timestamp(candle[0])] + [str(item) for item in candle[1:]]))
+        indicators = indicator_engine.update(candle[0], candle[2], candle[3], candle[4])
+        if indicators is not None:
+            moving_averages, pivot = indicators
+            logger.info("Скользящие средние: %s", moving_averages)
+            if pivot is not None:
+                logger.info("Точка разворота: %s", pivot)
+        logger.debug("Пул соединений: %s", db_manager.pool_stats())
+        logger.debug("Кэш состояния аккаунта: %s", connected_api.get_stats())
+
+    if os.getenv("CANDLE_SOURCE", "stream") == "rest":
+        # Без WebSocket: закрытые свечи запрашиваются через REST точно по закрытию по часам биржи.
+        # Задания выполняются в потоках планировщика, поэтому агрегация вызывается напрямую
+        def on_closed_candle(candle):
+            log_candle(candle)
+            if resampling_engine is not None:
+                resampling_engine.on_base_candle(candle)
+
+        scheduler = CandleCloseScheduler(fetcher.exchange)
+        scheduler.add_job(fetcher.configuration_default.timeframe,
+                          candle_close_job(fetcher, db_manager, on_candle=on_closed_candle))
+        scheduler.run()
+    else:
+        async def on_streamed_candle(candle):
+            log_candle(candle)
+            if resampling_engine is not None:
+                # Агрегация читает и пишет базу данных: вне цикла событий, чтобы не задерживать поток
+                await asyncio.to_thread(resampling_engine.on_base_candle, candle)
+
+        stream = KlineStream(fetcher)
+        asyncio.run(stream_to_database(stream, db_manager, on_candle=on_streamed_candle))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,426 @@
+import argparse
+import atexit
+import bisect
+import cProfile
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Границы корзин гистограмм времени, секунды (как в клиентах Prometheus, с добавленными малыми значениями)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PREFIX = 'bot'
+
+
+def row_count(result):
+    """
+    Количество строк в результате стадии: число (insert_data), словарь массивов
+    (query_candles(as_arrays=True)) или объект с len (CandleBatch, DataFrame, список).
+    """
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict):
+        return len(next(iter(result.values()), ()))
+    return len(result)
+
+
+class StageMetrics:
+    """
+    Метрики одной стадии: гистограмма времени выполнения, обработанные строки и ошибки.
+
+    Attributes:
+        buckets (tuple): Верхние границы корзин, секунды.
+        counts (list): Количество наблюдений по корзинам (последняя - +Inf), не накопительное.
+        total (float): Суммарное время, секунды.
+        calls (int): Количество вызовов.
+        rows (int): Обработанные строки (для стадий, которые их сообщают).
+        errors (int): Вызовы, завершившиеся исключением.
+    """
+
+    __slots__ = ('buckets', 'counts', 'total', 'calls', 'rows', 'errors', '_lock')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.calls = 0
+        self.rows = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, rows=None, error=False):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.calls += 1
+            if rows:
+                self.rows += rows
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.calls, self.rows, self.errors
+
+
+class _Timer:
+    __slots__ = ('stage', 'rows', '_started')
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.rows = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stage.record(time.perf_counter() - self._started, self.rows, exc_type is not None)
+        return False
+
+
+class _NullTimer:
+    # Возвращается timer() при выключенных метриках: присваивание rows и with ничего не делают
+    __slots__ = ('rows',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса.
+
+    Пока реестр выключен, timed() и timer() сводятся к проверке одного флага: время не
+    измеряется, блокировки не берутся. Стадии создаются при первом измерении.
+
+    Parameters:
+        enabled (bool): Собирать ли метрики с момента создания.
+
+    Attributes:
+        enabled (bool): Флаг сбора метрик; переключается enable()/disable().
+        stages (dict): Имя стадии -> StageMetrics.
+        collectors (dict): Имя -> функция без аргументов, возвращающая словарь числовых
+            показателей (например, DatabaseManager.pool_stats); выводятся как gauge.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.collectors = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            with self._lock:
+                stage = self.stages.setdefault(name, StageMetrics())
+        return stage
+
+    def error(self, name):
+        """
+        Учитывает ошибку, которую стадия обработала сама (записала в лог и вернула пустой результат).
+        """
+        if self.enabled:
+            stage = self.stage(name)
+            with stage._lock:
+                stage.errors += 1
+
+    def register_collector(self, name, collect):
+        self.collectors[name] = collect
+
+    def timer(self, name):
+        """
+        Контекстный менеджер измерения блока кода; строки задаются через атрибут rows:
+
+            with registry.timer('fetch_ohlcv') as timer:
+                candles = exchange.fetch_ohlcv(...)
+                timer.rows = len(candles)
+
+        Исключение внутри блока учитывается как ошибка стадии и пробрасывается дальше.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.stage(name))
+
+    def timed(self, name, rows=None):
+        """
+        Декоратор измерения функции.
+
+        Parameters:
+            name (str): Имя стадии.
+            rows (callable): Функция результата -> количество обработанных строк (например, row_count).
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                stage = self.stage(name)
+                started = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    stage.record(time.perf_counter() - started, error=True)
+                    raise
+                stage.record(time.perf_counter() - started, rows(result) if rows is not None else None)
+                return result
+            return wrapper
+        return decorator
+
+    def render(self):
+        """
+        Метрики в текстовом формате Prometheus (text/plain; version=0.0.4).
+        """
+        histogram = f'{METRICS_PREFIX}_stage_seconds'
+        lines = [f'# HELP {histogram} Время выполнения стадии, секунды.', f'# TYPE {histogram} histogram']
+        rows = [f'# HELP {METRICS_PREFIX}_stage_rows_total Строки, обработанные стадией.',
+                f'# TYPE {METRICS_PREFIX}_stage_rows_total counter']
+        errors = [f'# HELP {METRICS_PREFIX}_stage_errors_total Вызовы стадии, завершившиеся ошибкой.',
+                  f'# TYPE {METRICS_PREFIX}_stage_errors_total counter']
+        with self._lock:
+            stages = sorted(self.stages.items())
+        for name, stage in stages:
+            counts, total, calls, processed, failed = stage.snapshot()
+            cumulative = 0
+            for bound, count in zip(stage.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{histogram}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{histogram}_sum{{stage="{name}"}} {total!r}')
+            lines.append(f'{histogram}_count{{stage="{name}"}} {calls}')
+            rows.append(f'{METRICS_PREFIX}_stage_rows_total{{stage="{name}"}} {processed}')
+            errors.append(f'{METRICS_PREFIX}_stage_errors_total{{stage="{name}"}} {failed}')
+        lines += rows + errors
+
+        for collector, collect in sorted(self.collectors.items()):
+            try:
+                values = collect()
+            except Exception as e:
+                lines.append(f'# {collector}: {e}')
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, (int, float)):
+                    metric = f'{METRICS_PREFIX}_{collector}_{key}'
+                    lines.append(f'# TYPE {metric} gauge')
+                    lines.append(f'{metric} {float(value)!r}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Атомарно записывает render() в файл (например, для textfile collector node_exporter).
+        """
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(self.render())
+        os.replace(temporary, path)
+
+
+# Общий реестр процесса; METRICS=1 включает сбор с запуска
+registry = MetricsRegistry(enabled=os.getenv('METRICS', '0') == '1')
+timed = registry.timed
+timer = registry.timer
+count_error = registry.error
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsExporter:
+    """
+    Публикация метрик: HTTP-адрес /metrics и/или файл, перезаписываемый раз в interval секунд.
+
+    Parameters:
+        registry (MetricsRegistry): Реестр метрик.
+        port (int): Порт HTTP-сервера (None - без сервера).
+        path (str): Файл метрик (None - без файла); записывается и при остановке.
+        host (str): Адрес HTTP-сервера.
+        interval (float): Период записи файла, секунды.
+    """
+
+    def __init__(self, registry=registry, port=None, path=None, host='127.0.0.1', interval=15.0):
+        self.registry = registry
+        self.port = port
+        self.path = path
+        self.host = host
+        self.interval = interval
+        self.server = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _write_periodically(self):
+        while not self._stop.wait(self.interval):
+            self.registry.write(self.path)
+
+    def start(self):
+        if self.port is not None:
+            self.server = ThreadingHTTPServer((self.host, self.port), MetricsRequestHandler)
+            self.server.daemon_threads = True
+            self.server.registry = self.registry
+            self._threads.append(threading.Thread(target=self.server.serve_forever, daemon=True))
+        if self.path is not None:
+            self._threads.append(threading.Thread(target=self._write_periodically, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.path is not None:
+            self.registry.write(self.path)
+
+
+class Profiler:
+    """
+    Профилирование по запросу.
+
+    Режим 'cprofile' - детерминированный cProfile потока, вызвавшего start(); результат -
+    файл pstats (python -m pstats path, snakeviz). Режим 'sample' - выборка стеков всех потоков
+    раз в interval секунд через sys._current_frames(); почти не замедляет программу, результат -
+    свёрнутые стеки 'файл:функция;...;файл:функция количество' для flamegraph.pl/speedscope.
+
+    Parameters:
+        path (str): Файл результата.
+        mode (str): 'cprofile' или 'sample'.
+        interval (float): Период выборки в режиме 'sample', секунды.
+    """
+
+    def __init__(self, path, mode='cprofile', interval=0.005):
+        if mode not in ('cprofile', 'sample'):
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.path = path
+        self.mode = mode
+        self.interval = interval
+        self.samples = Counter()
+        self._profile = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.path)
+            self._profile = None
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            with open(self.path, 'w', encoding='utf-8') as file:
+                for stack, count in self.samples.most_common():
+                    file.write(f'{stack} {count}\n')
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+        return False
+
+
+def configure_from_env():
+    """
+    Включает метрики и профилирование по переменным окружения:
+    METRICS=1 - сбор метрик, METRICS_PORT - HTTP-адрес /metrics, METRICS_FILE - файл метрик,
+    PROFILE=cprofile:путь или sample:путь - профилирование до завершения процесса.
+    Задание METRICS_PORT или METRICS_FILE само включает сбор.
+
+    Returns:
+        tuple: (MetricsExporter или None, Profiler или None).
+    """
+    port = os.getenv('METRICS_PORT')
+    path = os.getenv('METRICS_FILE')
+    exporter = None
+    if port or path:
+        registry.enable()
+        exporter = MetricsExporter(registry, port=int(port) if port else None, path=path).start()
+        atexit.register(exporter.stop)
+
+    profiler = None
+    profile = os.getenv('PROFILE')
+    if profile:
+        mode, _, profile_path = profile.partition(':')
+        profiler = Profiler(profile_path or f'{mode}.out', mode).start()
+        atexit.register(profiler.stop)
+    return exporter, profiler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Сводка метрик из файла METRICS_FILE.')
+    parser.add_argument('path', help='Файл метрик в текстовом формате Prometheus')
+    args = parser.parse_args()
+
+    # Среднее время, строки и ошибки по стадиям из _sum/_count и счётчиков
+    totals = {}
+    with open(args.path, encoding='utf-8') as file:
+        for line in file:
+            if line.startswith('#') or 'stage="' not in line or '_bucket{' in line:
+                continue
+            metric, value = line.rsplit(' ', 1)
+            name = metric.split('{', 1)[0][len(f'{METRICS_PREFIX}_stage_'):]
+            stage = metric.split('stage="', 1)[1].split('"', 1)[0]
+            totals.setdefault(stage, {})[name] = float(value)
+    for stage, values in sorted(totals.items()):
+        calls = values.get('seconds_count', 0)
+        mean = values.get('seconds_sum', 0.0) / calls if calls else 0.0
+        print(f"{stage:<24} calls={calls:>8.0f}  mean={mean * 1000:9.3f}ms  "
+              f"rows={values.get('rows_total', 0):>10.0f}  errors={values.get('errors_total', 0):>5.0f}")
@@ -0,0 +1,25 @@
+"""
+Перевод таблицы свечей со строковыми/датовыми метками времени на миллисекунды Unix.
+
+Запуск:
+    python migrate_timestamps.py [таблица] --timezone Europe/Moscow
+
+--timezone - часовой пояс машины, на которой прежняя версия бота записывала свечи
+(метки времени получались через datetime.fromtimestamp в локальном времени).
+"""
+import argparse
+
+from database import DatabaseManager
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Перевод столбца timestamp в миллисекунды Unix (BIGINT).')
+    parser.add_argument('table', nargs='?', help='Таблица свечей (по умолчанию: DefaultConfig().table_name)')
+    parser.add_argument('--timezone', required=True, help="Часовой пояс исходных дат, например 'Europe/Moscow'")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(table_name=args.table)
+    if db_manager.migrate_timestamps_to_epoch(args.timezone):
+        print(f"Таблица {db_manager.table_name} переведена на миллисекунды.")
+    else:
+        print(f"Таблица {db_manager.table_name} уже хранит миллисекунды.")
@@ -0,0 +1,67 @@
+import contextlib
+import contextvars
+import io
+import sys
+import threading
+
+# Буфер перехвата текущего потока или задачи asyncio; None - вывод идёт в исходный поток
+_capture_buffer = contextvars.ContextVar('capture_buffer', default=None)
+_install_lock = threading.Lock()
+
+
+class ContextStdout:
+    """
+    Замена sys.stdout, направляющая вывод в буфер текущего контекста (contextvars).
+
+    Устанавливается один раз на процесс; sys.stdout после этого не меняется, поэтому
+    перехват в одном потоке не затрагивает вывод других потоков и обработчики логгеров.
+    Вне capture_output вывод передаётся в исходный поток без изменений.
+
+    Parameters:
+        stream: Исходный поток вывода.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        buffer = _capture_buffer.get()
+        if buffer is None:
+            return self.stream.write(text)
+        return buffer.write(text)
+
+    def flush(self):
+        if _capture_buffer.get() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def install():
+    """
+    Устанавливает ContextStdout вместо sys.stdout, если он ещё не установлен.
+    """
+    with _install_lock:
+        if not isinstance(sys.stdout, ContextStdout):
+            sys.stdout = ContextStdout(sys.stdout)
+
+
+@contextlib.contextmanager
+def capture_output():
+    """
+    Перехватывает print и другой вывод в sys.stdout внутри блока with для текущего потока
+    (или задачи asyncio) и возвращает его в StringIO.
+
+    Пример:
+        with capture_output() as output:
+            client.get_balance_v2()
+        chatter = output.getvalue()
+    """
+    install()
+    buffer = io.StringIO()
+    token = _capture_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _capture_buffer.reset(token)
@@ -0,0 +1,408 @@
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import time
+from functools import lru_cache
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from backtesting import Backtester, load_candles
+from candles import CANDLE_COLUMNS, CANDLE_DTYPES, CandleBatch
+from configuration_default import DefaultConfig
+from custom_logger import LoggerConfig
+from pivots import find_pivots
+from strategy import BeerPointStrategy, MovingAverageCrossover, shifted_moving_average
+
+# Сетки параметров по умолчанию; окна и сдвиги - как в indicators.calculate_moving_averages
+SWEEP_GRIDS = {
+    'ma_crossover': {
+        'fast_window': [3, 5, 8, 13, 21],
+        'fast_shift': [0, 3, 5],
+        'slow_window': [25, 50, 100, 200],
+        'slow_shift': [0, 5, 25],
+        'allow_short': [False, True],
+    },
+    'beer_points': {
+        'length': list(range(1, 51)),
+        'allow_short': [False, True],
+    },
+}
+
+
+class IndicatorCache:
+    """
+    Кэш индикаторов одного набора свечей внутри процесса перебора.
+
+    Скользящая средняя хранится по окну, сдвиг накладывается при запросе, поэтому
+    комбинации с одинаковым окном и разными сдвигами или разной второй средней считают
+    rolling один раз. Точки разворота хранятся по length.
+
+    Parameters:
+        candles (CandleBatch): Свечи, для которых считаются индикаторы.
+        maxsize (int): Сколько массивов каждого вида держать в памяти.
+    """
+
+    def __init__(self, candles, maxsize=64):
+        self.candles = candles
+        self._rolling_mean = lru_cache(maxsize=maxsize)(self._compute_rolling_mean)
+        self._pivots = lru_cache(maxsize=maxsize)(self._compute_pivots)
+
+    def _compute_rolling_mean(self, window):
+        return shifted_moving_average(self.candles.close_price, window, 0)
+
+    def _compute_pivots(self, length):
+        return find_pivots(self.candles.high_price, self.candles.low_price, length)
+
+    def moving_average(self, close, window, shift):
+        """
+        Замена strategy.shifted_moving_average с тем же результатом.
+        """
+        if close is not self.candles.close_price:
+            return shifted_moving_average(close, window, shift)
+        mean = self._rolling_mean(window)
+        if shift == 0:
+            return mean
+        shifted = np.full_like(mean, np.nan)
+        # При shift >= len(mean) все значения - NaN
+        shifted[shift:] = mean[:max(0, len(mean) - shift)]
+        return shifted
+
+    def pivots(self, high, low, length):
+        """
+        Замена pivots.find_pivots с тем же результатом.
+        """
+        if high is not self.candles.high_price or low is not self.candles.low_price:
+            return find_pivots(high, low, length)
+        return self._pivots(length)
+
+    def info(self):
+        """
+        Returns:
+            tuple: (попадания, промахи) по всем видам индикаторов.
+        """
+        hits = misses = 0
+        for cached in (self._rolling_mean, self._pivots):
+            info = cached.cache_info()
+            hits += info.hits
+            misses += info.misses
+        return hits, misses
+
+
+def build_strategy(name, params, cache=None):
+    """
+    Создаёт стратегию по плоскому набору параметров сетки.
+
+    Parameters:
+        name (str): Имя стратегии (см. SWEEP_GRIDS).
+        params (dict): Значения параметров.
+        cache (IndicatorCache): Кэш индикаторов; без него индикаторы считаются заново.
+    """
+    if name == MovingAverageCrossover.name:
+        return MovingAverageCrossover(
+            fast=(params['fast_window'], params['fast_shift']),
+            slow=(params['slow_window'], params['slow_shift']),
+            allow_short=params.get('allow_short', False),
+            average=cache.moving_average if cache else shifted_moving_average,
+        )
+    if name == BeerPointStrategy.name:
+        return BeerPointStrategy(
+            length=params['length'],
+            allow_short=params.get('allow_short', False),
+            pivots=cache.pivots if cache else find_pivots,
+        )
+    raise ValueError(f"Неизвестная стратегия: {name}")
+
+
+def expand_grid(name, grid):
+    """
+    Все комбинации параметров сетки в порядке itertools.product (последний параметр
+    меняется быстрее всех). Для пересечения средних быстрое окно должно быть меньше медленного.
+    """
+    keys = list(grid)
+    for values in itertools.product(*(grid[key] for key in keys)):
+        params = dict(zip(keys, values))
+        if name == MovingAverageCrossover.name and params['fast_window'] >= params['slow_window']:
+            continue
+        yield params
+
+
+def params_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def _json_value(value):
+    if isinstance(value, (np.integer, int)) and not isinstance(value, bool):
+        return int(value)
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+# Состояние процесса перебора: свечи в общей памяти, кэш индикаторов, бэктестер
+_worker = {}
+
+
+def _attach_candles(shm, length):
+    """
+    Столбцы свечей - последовательные участки общей памяти по length элементов (8 байт каждый).
+    """
+    columns = []
+    for position, column in enumerate(CANDLE_COLUMNS):
+        array = np.ndarray(length, dtype=CANDLE_DTYPES[column], buffer=shm.buf, offset=position * length * 8)
+        array.flags.writeable = False
+        columns.append(array)
+    return CandleBatch(*columns)
+
+
+def _init_worker(shm_name, length, strategy_name, backtester_options, cache_size):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    candles = _attach_candles(shm, length)
+    _worker.update(
+        shm=shm,
+        candles=candles,
+        strategy=strategy_name,
+        cache=IndicatorCache(candles, cache_size),
+        backtester=Backtester(**backtester_options),
+    )
+
+
+def _run_chunk(chunk):
+    candles = _worker['candles']
+    cache = _worker['cache']
+    results = []
+    for params in chunk:
+        started = time.perf_counter()
+        strategy = build_strategy(_worker['strategy'], params, cache)
+        stats = _worker['backtester'].run(candles, strategy).stats
+        results.append({
+            'strategy': _worker['strategy'],
+            'params': params,
+            'stats': {key: _json_value(value) for key, value in stats.items()},
+            'seconds': round(time.perf_counter() - started, 6),
+        })
+    return os.getpid(), cache.info(), results
+
+
+class ParameterSweep:
+    """
+    Перебор параметров стратегии на всех ядрах.
+
+    Свечи один раз копируются в общую память (multiprocessing.shared_memory), и процессы
+    пула читают их оттуда без копирования, вместо того чтобы получать фрейм в каждом задании.
+    Комбинации раздаются пачками в порядке сетки, поэтому соседние комбинации с общими
+    окнами средних или length попадают в один процесс и берут индикаторы из его IndicatorCache.
+    Результаты пишутся в JSONL по мере готовности; при повторном запуске с тем же файлом
+    пропускаются комбинации, уже посчитанные на тех же свечах (инструмент, интервал, диапазон)
+    с теми же комиссией и проскальзыванием (см. context).
+
+    Parameters:
+        candles (CandleBatch): Свечи для бэктеста.
+        strategy (str): Имя стратегии (см. SWEEP_GRIDS).
+        grid (dict): Параметр -> список значений (по умолчанию SWEEP_GRIDS[strategy]).
+        workers (int): Количество процессов (по умолчанию - количество ядер).
+        chunk_size (int): Комбинаций в одном задании пула.
+        cache_size (int): Размер IndicatorCache каждого процесса.
+        fee (float): Комиссия (см. Backtester).
+        slippage (float): Проскальзывание (см. Backtester).
+        progress_interval (float): Период записи прогресса в лог, секунды.
+        symbol (str): Символ инструмента свечей (по умолчанию: DefaultConfig().symbol).
+        timeframe (str): Интервал свечей (по умолчанию: DefaultConfig().timeframe).
+    """
+
+    def __init__(self, candles, strategy, grid=None, workers=None, chunk_size=16, cache_size=64,
+                 fee=0.001, slippage=0.0, progress_interval=5.0, symbol=None, timeframe=None):
+        config = DefaultConfig()
+        self.candles = candles
+        self.symbol = symbol or config.symbol
+        self.timeframe = timeframe or config.timeframe
+        self.strategy = strategy
+        self.grid = grid or SWEEP_GRIDS[strategy]
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.backtester_options = {'fee': fee, 'slippage': slippage}
+        self.progress_interval = progress_interval
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    def context(self):
+        """
+        Условия перебора, от которых зависят результаты, кроме параметров стратегии:
+        инструмент, интервал, диапазон и количество свечей, комиссия и проскальзывание.
+        """
+        timestamps = self.candles.timestamp
+        return {
+            'symbol': self.symbol,
+            'timeframe': self.timeframe,
+            'start': int(timestamps[0]) if len(timestamps) else None,
+            'end': int(timestamps[-1]) if len(timestamps) else None,
+            'candles': len(timestamps),
+            **self.backtester_options,
+        }
+
+    @staticmethod
+    def load_completed(path, context=None):
+        """
+        Ключи комбинаций, уже записанных в файл результатов с условиями context.
+        Результаты с другими условиями (или записанные без них) не учитываются.
+        Недописанная последняя строка (прерванный запуск) отрезается.
+        """
+        if not os.path.exists(path):
+            return set()
+        with open(path, 'rb+') as file:
+            content = file.read()
+            complete = content.rfind(b'\n') + 1
+            if complete != len(content):
+                file.truncate(complete)
+        records = (json.loads(line) for line in content[:complete].splitlines() if line)
+        return {params_key(record['params']) for record in records if record.get('context') == context}
+
+    def _share_candles(self):
+        length = len(self.candles)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, length * 8 * len(CANDLE_COLUMNS)))
+        for position, column in enumerate(CANDLE_COLUMNS):
+            target = np.ndarray(length, dtype=CANDLE_DTYPES[column], buffer=shm.buf, offset=position * length * 8)
+            target[:] = getattr(self.candles, column)
+            del target
+        return shm
+
+    def run(self, output, resume=True):
+        """
+        Выполняет перебор.
+
+        Parameters:
+            output (str): Файл результатов JSONL: одна строка на комбинацию
+                ({'strategy', 'params', 'context', 'stats', 'seconds'}).
+            resume (bool): Пропускать комбинации, уже записанные в output с теми же условиями
+                (context); при False файл перезаписывается.
+
+        Returns:
+            dict: done, skipped, seconds, combinations_per_second, cache_hit_rate.
+        """
+        combinations = list(expand_grid(self.strategy, self.grid))
+        context = self.context()
+        completed = self.load_completed(output, context) if resume else set()
+        pending = [params for params in combinations if params_key(params) not in completed]
+        chunks = [pending[start:start + self.chunk_size] for start in range(0, len(pending), self.chunk_size)]
+        self.logger.info("Перебор %s %s %s: %s комбинаций, уже посчитано %s, процессов %s, свечей %s.",
+                         self.strategy, self.symbol, self.timeframe, len(combinations),
+                         len(combinations) - len(pending), self.workers, len(self.candles))
+
+        done = 0
+        cache_info = {}
+        started = time.perf_counter()
+        last_report = started
+        shm = self._share_candles()
+        try:
+            with open(output, 'a' if resume else 'w') as file, \
+                    Pool(self.workers, initializer=_init_worker,
+                         initargs=(shm.name, len(self.candles), self.strategy,
+                                   self.backtester_options, self.cache_size)) as pool:
+                for pid, info, results in pool.imap_unordered(_run_chunk, chunks):
+                    for result in results:
+                        result['context'] = context
+                        file.write(json.dumps(result) + '\n')
+                    file.flush()
+                    done += len(results)
+                    cache_info[pid] = info
+                    now = time.perf_counter()
+                    if now - last_report >= self.progress_interval:
+                        last_report = now
+                        self.logger.info("Перебор %s: %s/%s, %.1f комбинаций/с.", self.strategy,
+                                         done, len(pending), done / (now - started))
+        finally:
+            shm.close()
+            shm.unlink()
+
+        seconds = time.perf_counter() - started
+        hits = sum(info[0] for info in cache_info.values())
+        lookups = hits + sum(info[1] for info in cache_info.values())
+        summary = {
+            'done': done,
+            'skipped': len(combinations) - len(pending),
+            'seconds': seconds,
+            'combinations_per_second': done / seconds if seconds > 0 else math.nan,
+            'cache_hit_rate': hits / lookups if lookups else math.nan,
+        }
+        if done:
+            self.logger.info("Перебор %s завершён: %s комбинаций за %.2f с (%.1f комбинаций/с), "
+                             "попаданий в кэш индикаторов %.0f%%.", self.strategy, done, seconds,
+                             summary['combinations_per_second'], summary['cache_hit_rate'] * 100)
+        return summary
+
+
+def load_results(path):
+    """
+    Результаты перебора в виде фрейма: столбцы параметров и статистики.
+    """
+    with open(path) as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    import pandas as pd
+
+    if not records:
+        return pd.DataFrame()
+    return pd.concat([pd.DataFrame([record['params'] for record in records]),
+                      pd.DataFrame([record['stats'] for record in records])], axis=1)
+
+
+def parse_values(text):
+    """
+    Значения параметра из командной строки: '3,5,8', 'true,false' или 'start:stop[:step]' (как range).
+    """
+    if ':' in text:
+        return list(range(*(int(part) for part in text.split(':'))))
+    values = []
+    for part in text.split(','):
+        if part.lower() in ('true', 'false'):
+            values.append(part.lower() == 'true')
+        else:
+            number = float(part)
+            values.append(int(number) if number.is_integer() and '.' not in part else number)
+    return values
+
+
+if __name__ == '__main__':
+    from database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description='Перебор параметров стратегии на всех ядрах.')
+    parser.add_argument('strategy', choices=sorted(SWEEP_GRIDS))
+    parser.add_argument('--symbol')
+    parser.add_argument('--timeframe')
+    parser.add_argument('--start', help="Начало диапазона (UTC), 'YYYY-MM-DD[ HH:MM:SS]'")
+    parser.add_argument('--end')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUES',
+                        help="Значения параметра вместо сетки по умолчанию, например slow_window=20:201:20")
+    parser.add_argument('--output', help='Файл результатов JSONL '
+                                         '(по умолчанию sweep_<стратегия>_<символ>_<интервал>.jsonl)')
+    parser.add_argument('--fresh', action='store_true', help='Начать заново, не продолжая output')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--chunk-size', type=int, default=16)
+    parser.add_argument('--fee', type=float, default=0.001)
+    parser.add_argument('--slippage', type=float, default=0.0005)
+    parser.add_argument('--sort', default='sharpe', help='Статистика для вывода лучших комбинаций')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    grid = dict(SWEEP_GRIDS[args.strategy])
+    for option in args.param:
+        name, values = option.split('=', 1)
+        if name not in grid:
+            parser.error(f"Неизвестный параметр {name}; параметры стратегии: {', '.join(grid)}")
+        grid[name] = parse_values(values)
+
+    config = DefaultConfig()
+    symbol = args.symbol or config.symbol
+    timeframe = args.timeframe or config.timeframe
+    output = args.output or f"sweep_{args.strategy}_{symbol.replace('/', '_')}_{timeframe}.jsonl"
+    candles = load_candles(DatabaseManager(), symbol, timeframe, args.start, args.end)
+    sweep = ParameterSweep(candles, args.strategy, grid, workers=args.workers, chunk_size=args.chunk_size,
+                           fee=args.fee, slippage=args.slippage, symbol=symbol, timeframe=timeframe)
+    sweep.run(output, resume=not args.fresh)
+    results = load_results(output)
+    if not results.empty:
+        print(results.sort_values(args.sort, ascending=False).head(args.top).to_string(index=False))
@@ -0,0 +1,75 @@
+import numpy as np
+
+from metrics import timed
+
+PIVOT_HIGH = 'Potential High'
+PIVOT_LOW = 'Potential Low'
+
+
+@timed('find_pivots')
+def find_pivots(high, low, length=1):
+    """
+    Находит точки разворота сравнением сдвинутых массивов high/low.
+
+    Свеча i - вершина, если её high строго больше high каждой из length свечей до и после неё;
+    впадина - если её low строго меньше low каждой из length соседних свечей. Если свеча
+    одновременно и вершина, и впадина, она считается вершиной. Крайние length свечей
+    с каждой стороны не проверяются, так как у них нет полного окна.
+
+    Parameters:
+        high (array-like): Максимальные цены.
+        low (array-like): Минимальные цены.
+        length (int): Количество свечей окна с каждой стороны.
+
+    Returns:
+        tuple: (indices, is_high, values) - позиции свечей (int64), признак вершины (bool)
+            и цена разворота (high для вершин, low для впадин).
+    """
+    high = np.asarray(high)
+    low = np.asarray(low)
+    n = len(high)
+    if length < 1:
+        raise ValueError("length должен быть не меньше 1")
+    if n < 2 * length + 1:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool), high[:0]
+
+    center_high = high[length:n - length]
+    center_low = low[length:n - length]
+    is_high = np.ones(n - 2 * length, dtype=bool)
+    is_low = np.ones(n - 2 * length, dtype=bool)
+    for k in range(1, length + 1):
+        is_high &= center_high > high[length - k:n - length - k]
+        is_high &= center_high > high[length + k:n - length + k]
+        is_low &= center_low < low[length - k:n - length - k]
+        is_low &= center_low < low[length + k:n - length + k]
+    is_low &= ~is_high
+
+    mask = is_high | is_low
+    indices = np.flatnonzero(mask) + length
+    is_high = is_high[mask]
+    values = np.where(is_high, high[indices], low[indices])
+    return indices, is_high, values
+
+
+def pivot_frame(price_data, length=1):
+    """
+    Точки разворота в виде столбцового фрейма с колонками 'Pivot Type', 'Pivot Value', 'Date'.
+
+    Parameters:
+        price_data (pd.DataFrame): Свечи с колонками high_price и low_price; индекс - даты.
+        length (int): Количество свечей окна с каждой стороны.
+
+    Returns:
+        pd.DataFrame: Точки разворота в порядке следования (пустой фрейм, если их нет).
+    """
+    import pandas as pd
+
+    indices, is_high, values = find_pivots(price_data['high_price'].to_numpy(),
+                                           price_data['low_price'].to_numpy(), length)
+    if len(indices) == 0:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        'Pivot Type': np.where(is_high, PIVOT_HIGH, PIVOT_LOW).astype(object),
+        'Pivot Value': values,
+        'Date': price_data.index[indices],
+    })
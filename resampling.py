@@ -0,0 +1,291 @@
+import argparse
+import logging
+
+import numpy as np
+
+import candle_cache
+from candles import CandleBatch
+from custom_logger import LoggerConfig
+from configuration_default import DefaultConfig
+from timeutils import DAY_MS, candle_close_time, candle_open_time, interval_open_time, timeframe_to_ms
+
+# Базовый ряд, который загружается с биржи; остальные интервалы строятся из него
+BASE_TIMEFRAME = '1m'
+DERIVED_TIMEFRAMES = ('5m', '15m', '1h', '4h', '1d')
+
+def bucket_open_times(timestamp, interval):
+    """
+    Время открытия интервала, в который попадает каждая метка timestamp, мс.
+
+    Parameters:
+        timestamp (np.ndarray): Метки времени, мс.
+        interval (str | int): Интервал свечей ('1h', '1w', '1M', ...) или длительность в мс;
+            выравнивание - как у свечей биржи (timeutils.candle_open_time).
+    """
+    if isinstance(interval, str):
+        return candle_open_time(interval, timestamp)
+    return interval_open_time(timestamp, interval)
+
+
+def bucket_bounds(timestamp, interval):
+    """
+    Границы групп свечей, попадающих в один интервал interval (см. bucket_open_times).
+
+    Returns:
+        tuple: (starts, ends) - индексы первой и последней свечи каждой группы.
+    """
+    buckets = bucket_open_times(timestamp, interval)
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[:1] - 1))
+    ends = np.append(starts[1:] - 1, len(timestamp) - 1)
+    return starts, ends
+
+
+def resample_candles(candles, interval):
+    """
+    Агрегирует свечи в интервал interval с сохранением OHLC: открытие первой свечи группы,
+    максимум максимумов, минимум минимумов, закрытие последней свечи, сумма объёмов.
+
+    Parameters:
+        candles (CandleBatch): Свечи по возрастанию времени.
+        interval (str | int): Интервал агрегации: строка интервала или длительность в мс.
+
+    Returns:
+        CandleBatch: Свечи с временем начала интервала. Последняя может быть незакрытой,
+            если базовый ряд заканчивается внутри интервала.
+    """
+    if len(candles) == 0:
+        return candles
+    starts, ends = bucket_bounds(candles.timestamp, interval)
+    return CandleBatch(
+        bucket_open_times(candles.timestamp[starts], interval),
+        candles.open_price[starts],
+        np.maximum.reduceat(candles.high_price, starts),
+        np.minimum.reduceat(candles.low_price, starts),
+        candles.close_price[ends],
+        np.add.reduceat(candles.volume, starts),
+    )
+
+
+def _nested(timeframe, outer):
+    """
+    Каждая свеча timeframe целиком лежит внутри одной свечи outer (с учётом выравнивания
+    недель по понедельникам и месяцев по календарю).
+    """
+    inner_ms, outer_ms = timeframe_to_ms(timeframe), timeframe_to_ms(outer)
+    if outer[-1] == 'M':
+        if timeframe[-1] == 'M':
+            return int(outer[:-1] or 1) % int(timeframe[:-1] or 1) == 0
+        return DAY_MS % inner_ms == 0
+    if timeframe[-1] == 'M':
+        return False
+    # Граница свечи outer должна быть и границей свечи timeframe
+    shift = interval_open_time(0, outer_ms) - interval_open_time(0, inner_ms)
+    return outer_ms % inner_ms == 0 and shift % inner_ms == 0
+
+
+def _aggregate(start, base):
+    candles = [base[timestamp] for timestamp in sorted(base)]
+    return [start, candles[0][1], max(candle[2] for candle in candles), min(candle[3] for candle in candles),
+            candles[-1][4], sum(candle[5] for candle in candles)]
+
+
+class IncrementalResampler:
+    """
+    Обновление старших интервалов по одной базовой свече.
+
+    Для каждого интервала хранится текущий (последний) бар и базовые свечи, из которых он
+    собран. Новая свеча в конце бара обновляет его за O(1); повторно пришедшая или
+    запоздавшая свеча внутри бара пересобирает только этот бар. Результат совпадает
+    с resample_candles по тем же базовым свечам.
+
+    Parameters:
+        timeframes (tuple): Старшие интервалы.
+        loader (callable): loader(start, end) - базовые свечи [start, end) из хранилища;
+            нужен, чтобы начать с середины бара (например, после перезапуска).
+    """
+
+    def __init__(self, timeframes=DERIVED_TIMEFRAMES, loader=None):
+        self.intervals = {timeframe: timeframe_to_ms(timeframe) for timeframe in timeframes}
+        self.loader = loader
+        # Интервал -> [начало бара, {timestamp: базовая свеча}, бар, последний timestamp]
+        self._bars = {}
+
+    def _load(self, start, end):
+        if self.loader is None or end <= start:
+            return {}
+        return {int(candle[0]): list(candle) for candle in self.loader(start, end)}
+
+    def update(self, candle):
+        """
+        Учитывает базовую свечу.
+
+        Parameters:
+            candle (list): Свеча [timestamp, open, high, low, close, volume].
+
+        Returns:
+            list: Пары (интервал, бар) для всех изменившихся баров.
+        """
+        timestamp = int(candle[0])
+        candle = [timestamp] + [float(value) for value in candle[1:6]]
+        changed = []
+        for timeframe, interval in self.intervals.items():
+            start = candle_open_time(timeframe, timestamp, interval)
+            state = self._bars.get(timeframe)
+            if state is not None and start < state[0]:
+                # Запоздавшая свеча более раннего бара: он пересобирается из хранилища, текущий не меняется
+                base = self._load(start, candle_close_time(timeframe, start, interval))
+                base[timestamp] = candle
+                changed.append((timeframe, _aggregate(start, base)))
+                continue
+            if state is None or start > state[0]:
+                base = self._load(start, timestamp)
+                state = [start, base, _aggregate(start, base) if base else None, max(base, default=None)]
+                self._bars[timeframe] = state
+
+            _, base, bar, last = state
+            revised = last is not None and timestamp <= last
+            base[timestamp] = candle
+            if bar is None or revised:
+                bar = _aggregate(start, base)
+            else:
+                bar = [start, bar[1], max(bar[2], candle[2]), min(bar[3], candle[3]), candle[4], bar[5] + candle[5]]
+            state[2] = bar
+            state[3] = max(timestamp, last) if last is not None else timestamp
+            changed.append((timeframe, list(bar)))
+        return changed
+
+
+class ResamplingEngine:
+    """
+    Материализация старших интервалов из базового ряда в таблице свечей.
+
+    Производные бары записываются в ту же таблицу с ключом (symbol, timeframe, timestamp),
+    поэтому читаются обычным DatabaseManager.query_candles(symbol, '1h', ...) - как если бы
+    были загружены с биржи, но без отдельных запросов к бирже на каждый интервал и всегда
+    согласованно с базовым рядом. При пересчёте диапазона (materialize) затронутые месяцы
+    локального кэша свечей удаляются (candle_cache.invalidate).
+
+    Parameters:
+        db_manager (DatabaseManager): Хранилище свечей.
+        symbol (str): Символ инструмента (по умолчанию: DefaultConfig().symbol).
+        base_timeframe (str): Базовый интервал.
+        timeframes (tuple): Производные интервалы; каждый кратен базовому и целиком
+            укладывается в свечи наибольшего (в том числе недельного или месячного).
+        chunk_bars (int): Сколько баров наибольшего интервала обрабатывать за один запрос.
+        cache_root (str): Каталог кэша свечей (по умолчанию: candle_cache.DEFAULT_CACHE_DIR).
+
+    Raises:
+        ValueError: Если интервалы несовместимы с базовым.
+    """
+
+    def __init__(self, db_manager, symbol=None, base_timeframe=BASE_TIMEFRAME, timeframes=DERIVED_TIMEFRAMES,
+                 chunk_bars=30, cache_root=None):
+        self.db_manager = db_manager
+        self.symbol = symbol
+        self.base_timeframe = base_timeframe
+        self.timeframes = tuple(timeframes)
+        self.chunk_bars = chunk_bars
+        self.cache_root = cache_root
+
+        base_ms = timeframe_to_ms(base_timeframe)
+        self.intervals = {timeframe: timeframe_to_ms(timeframe) for timeframe in self.timeframes}
+        self.largest = max(self.intervals, key=self.intervals.get)
+        self.largest_ms = self.intervals[self.largest]
+        invalid = [timeframe for timeframe, interval in self.intervals.items()
+                   if interval <= base_ms or not _nested(base_timeframe, timeframe)
+                   or not _nested(timeframe, self.largest)]
+        if invalid:
+            raise ValueError(f"Интервалы {', '.join(invalid)} нельзя построить из {base_timeframe}")
+
+        self.resampler = IncrementalResampler(self.timeframes, loader=self._load_base)
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    def _load_base(self, start, end):
+        return CandleBatch.from_arrays(self.db_manager.query_candles(
+            self.symbol, self.base_timeframe, start=start, end=end, as_arrays=True))
+
+    def materialize(self, start=None, end=None):
+        """
+        Векторно пересчитывает и записывает производные бары диапазона.
+
+        Диапазон расширяется до границ баров наибольшего интервала, поэтому каждый бар
+        собирается из всех своих базовых свечей, а свечи после бара с последней базовой
+        свечой диапазона не читаются. Данные читаются частями по chunk_bars наибольших баров.
+
+        Parameters:
+            start: Начало диапазона (мс, datetime или строка UTC); None - с первой базовой свечи.
+            end: Конец диапазона (не включительно); None - до последней базовой свечи.
+
+        Returns:
+            dict: Интервал -> количество записанных баров.
+        """
+        first = self.db_manager.get_first_timestamp(self.symbol, self.base_timeframe, start=start, end=end)
+        last = self.db_manager.get_last_timestamp(self.symbol, self.base_timeframe, start=start, end=end)
+        written = dict.fromkeys(self.timeframes, 0)
+        if first is None:
+            return written
+
+        chunk_start = candle_open_time(self.largest, first, self.largest_ms)
+        range_end = candle_close_time(self.largest, candle_open_time(self.largest, last, self.largest_ms),
+                                      self.largest_ms)
+        materialized_from = chunk_start
+        while chunk_start <= last:
+            chunk_end = chunk_start
+            for _ in range(self.chunk_bars):
+                chunk_end = candle_close_time(self.largest, chunk_end, self.largest_ms)
+            chunk_end = min(chunk_end, range_end)
+            base = self._load_base(chunk_start, chunk_end)
+            for timeframe, interval in self.intervals.items():
+                written[timeframe] += self.db_manager.insert_data(
+                    resample_candles(base, interval), symbol=self.symbol, timeframe=timeframe,
+                    on_conflict='update', raise_errors=True)
+            chunk_start = chunk_end
+        # Кэш производных интервалов перестраивается с первого пересчитанного бара
+        for timeframe in self.timeframes:
+            candle_cache.invalidate(self.symbol or DefaultConfig().symbol, timeframe, materialized_from,
+                                    root=self.cache_root)
+        self.logger.info("Производные интервалы %s построены из %s: %s", self.symbol or '', self.base_timeframe,
+                         ', '.join(f'{timeframe}={count}' for timeframe, count in written.items()))
+        return written
+
+    def catch_up(self):
+        """
+        Досчитывает производные бары с последнего сохранённого (он мог быть незакрытым).
+        Если какого-то интервала ещё нет, пересчитывается вся история.
+        """
+        last_bars = [self.db_manager.get_last_timestamp(self.symbol, timeframe) for timeframe in self.timeframes]
+        return self.materialize(None if None in last_bars else min(last_bars))
+
+    def on_base_candle(self, candle):
+        """
+        Обновляет и записывает только бары, в которые попадает новая базовая свеча.
+
+        Returns:
+            list: Пары (интервал, бар).
+        """
+        changed = self.resampler.update(candle)
+        for timeframe, bar in changed:
+            self.db_manager.insert_data([bar], symbol=self.symbol, timeframe=timeframe, on_conflict='update')
+        return changed
+
+
+if __name__ == '__main__':
+    from database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description='Построение старших интервалов из базовых свечей в базе данных.')
+    parser.add_argument('--symbol')
+    parser.add_argument('--base', default=BASE_TIMEFRAME, help='Базовый интервал')
+    parser.add_argument('--timeframes', default=','.join(DERIVED_TIMEFRAMES), help='Производные интервалы через запятую')
+    parser.add_argument('--start', help="Начало диапазона (UTC), 'YYYY-MM-DD[ HH:MM:SS]'")
+    parser.add_argument('--end')
+    parser.add_argument('--full', action='store_true', help='Пересчитать всю историю (по умолчанию - с последних баров)')
+    args = parser.parse_args()
+
+    engine = ResamplingEngine(DatabaseManager(), args.symbol, args.base, args.timeframes.split(','))
+    if args.full or args.start or args.end:
+        engine.materialize(args.start, args.end)
+    else:
+        engine.catch_up()
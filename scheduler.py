@@ -0,0 +1,217 @@
+import argparse
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from custom_logger import LoggerConfig
+from timeutils import candle_close_time, candle_open_time
+
+
+class CandleCloseScheduler:
+    """
+    Планировщик заданий по закрытию свечей, работающий по времени сервера биржи.
+
+    Для каждого задания вычисляется точный момент закрытия следующей свечи его интервала
+    (любого, который принимает exchange.parse_timeframe, кроме годовых; недельные и месячные
+    свечи выравниваются по календарю, см. candle_open_time). Все задания лежат в одной куче
+    по времени срабатывания и обслуживаются одним потоком, который спит до ближайшего закрытия.
+    Разница между локальными часами и часами сервера измеряется при запуске и раз
+    в resync_interval секунд. Сами задания выполняются в пуле потоков, поэтому долгое
+    задание не задерживает остальные.
+
+    Parameters:
+        exchange (ccxt.Exchange): Клиент биржи для parse_timeframe и fetch_time
+            (по умолчанию: ccxt.binance()).
+        grace (float): Задержка после закрытия свечи, секунды: биржа публикует закрытую
+            свечу не мгновенно.
+        resync_interval (float): Период пересчёта разницы часов, секунды.
+        max_workers (int): Количество потоков выполнения заданий.
+
+    Attributes:
+        offset_ms (float): Время сервера минус локальное время, мс.
+    """
+
+    def __init__(self, exchange=None, grace=1.0, resync_interval=3600.0, max_workers=4):
+        if exchange is None:
+            import ccxt
+            exchange = ccxt.binance()
+        self.exchange = exchange
+        self.grace = grace
+        self.resync_interval = resync_interval
+        self.max_workers = max_workers
+        self.offset_ms = 0.0
+
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._last_sync = None
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    def server_time_ms(self):
+        """
+        Текущее время сервера биржи по локальным часам с поправкой offset_ms, мс.
+        """
+        return time.time() * 1000 + self.offset_ms
+
+    def sync_clock(self):
+        """
+        Измеряет разницу часов: время сервера сравнивается с серединой интервала запроса.
+        """
+        try:
+            sent = time.time() * 1000
+            server_time = self.exchange.fetch_time()
+            received = time.time() * 1000
+        except Exception as e:
+            self.logger.warning("Не удалось получить время сервера (%s), используется прежняя поправка.", e)
+            return self.offset_ms
+        finally:
+            self._last_sync = time.monotonic()
+        self.offset_ms = server_time - (sent + received) / 2
+        self.logger.debug("Поправка часов: %.0f мс (задержка запроса %.0f мс).", self.offset_ms, received - sent)
+        return self.offset_ms
+
+    def add_job(self, timeframe, job, name=None):
+        """
+        Регистрирует задание, вызываемое по закрытию каждой свечи интервала timeframe.
+
+        Parameters:
+            timeframe (str): Интервал свечей ('1m', '15m', '1h', '1d', ...).
+            job (callable): Вызывается с временем открытия закрытой свечи (мс).
+            name (str): Имя задания для логов.
+
+        Raises:
+            ValueError: Если интервал не поддерживается (см. candle_open_time).
+        """
+        timeframe_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        # Неподдерживаемый интервал отклоняется до синхронизации часов
+        candle_open_time(timeframe, 0, timeframe_ms)
+        if self._last_sync is None:
+            # Первое закрытие считается уже по часам сервера
+            self.sync_clock()
+        now = int(self.server_time_ms())
+        deadline = candle_close_time(timeframe, candle_open_time(timeframe, now, timeframe_ms), timeframe_ms)
+        entry = (name or f'{timeframe}:{getattr(job, "__name__", "job")}', timeframe, timeframe_ms, job)
+        with self._condition:
+            heapq.heappush(self._queue, (deadline, next(self._sequence), entry))
+            # Новое задание может сработать раньше, чем то, до которого спит поток
+            self._condition.notify()
+
+    def _dispatch(self, name, job, open_time):
+        try:
+            job(open_time)
+        except Exception:
+            self.logger.exception("Ошибка задания %s для свечи %s.", name, open_time)
+
+    def run(self):
+        """
+        Обслуживает задания в текущем потоке до вызова stop().
+        """
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='candle-close')
+        if self._last_sync is None:
+            self.sync_clock()
+        try:
+            while not self._stopped.is_set():
+                if time.monotonic() - self._last_sync >= self.resync_interval:
+                    self.sync_clock()
+
+                due = []
+                with self._condition:
+                    if not self._queue:
+                        self._condition.wait(timeout=self.resync_interval)
+                        continue
+                    deadline = self._queue[0][0]
+                    delay = (deadline - self.server_time_ms()) / 1000.0 + self.grace
+                    if delay > 0:
+                        # Спим до ближайшего закрытия; новое задание или stop() будят раньше
+                        self._condition.wait(timeout=min(delay, self.resync_interval))
+                        continue
+                    # Все задания с этим временем закрытия срабатывают вместе
+                    while self._queue and self._queue[0][0] == deadline:
+                        _, _, entry = heapq.heappop(self._queue)
+                        due.append(entry)
+                        name, timeframe, timeframe_ms, _ = entry
+                        heapq.heappush(self._queue, (candle_close_time(timeframe, deadline, timeframe_ms),
+                                                     next(self._sequence), entry))
+
+                for name, timeframe, timeframe_ms, job in due:
+                    self._executor.submit(self._dispatch, name, job,
+                                          candle_open_time(timeframe, deadline - 1, timeframe_ms))
+                self.logger.debug("Закрытие свечей %s: запущено заданий %s.", deadline, len(due))
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def start(self):
+        """
+        Запускает run() в фоновом потоке.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run, name='candle-close-scheduler', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """
+        Останавливает планировщик и дожидается выполняющихся заданий.
+        """
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+def candle_close_job(fetcher, db_manager, on_candle=None):
+    """
+    Задание для CandleCloseScheduler: получает закрытую свечу через REST, записывает её
+    в базу данных и передаёт on_candle (например, для обновления индикаторов).
+
+    Parameters:
+        fetcher (HistoricalPriceFetcher): Символ, интервал и клиент биржи.
+        db_manager (DatabaseManager): Получатель свечей.
+        on_candle (callable): Вызывается с каждой записанной свечой.
+    """
+    symbol = fetcher.configuration_default.symbol
+    timeframe = fetcher.configuration_default.timeframe
+
+    def job(open_time):
+        candle = fetcher.fetch_latest_candle_data(open_time)
+        if candle is None:
+            return
+        db_manager.insert_data([candle], symbol=symbol, timeframe=timeframe, on_conflict='update')
+        if on_candle is not None:
+            on_candle(candle)
+
+    job.__name__ = f'{symbol} {timeframe}'
+    return job
+
+
+if __name__ == '__main__':
+    import ccxt
+    from database import DatabaseManager
+    from historical_prices import HistoricalPriceFetcher
+
+    parser = argparse.ArgumentParser(description='Загрузка закрытых свечей по расписанию для нескольких пар.')
+    parser.add_argument('pairs', nargs='+', help="Пары 'SYMBOL:TIMEFRAME', например BTC/USDT:1h ETH/USDT:15m")
+    parser.add_argument('--grace', type=float, default=1.0, help='Задержка после закрытия свечи, секунды')
+    args = parser.parse_args()
+
+    exchange = ccxt.binance({'enableRateLimit': True})
+    scheduler = CandleCloseScheduler(exchange, grace=args.grace)
+    db_manager = DatabaseManager()
+    for pair in args.pairs:
+        symbol, timeframe = pair.rsplit(':', 1)
+        fetcher = HistoricalPriceFetcher(symbol=symbol, timeframe=timeframe, exchange=exchange)
+        scheduler.add_job(timeframe, candle_close_job(fetcher, db_manager), name=pair)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
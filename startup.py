@@ -0,0 +1,169 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from custom_logger import LoggerConfig
+
+
+class StartupError(Exception):
+    """Обязательная фаза запуска завершилась ошибкой, по таймауту или была пропущена."""
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+class StartupPhase:
+    """
+    Фаза запуска: независимое действие ввода-вывода (запрос к API, подключение к базе и т.п.).
+
+    Attributes:
+        name (str): Имя фазы.
+        action (callable): Действие; получает результаты фаз depends позиционными аргументами.
+        depends (tuple): Фазы, которые должны успешно завершиться до начала этой.
+        after (tuple): Фазы, завершения которых нужно дождаться независимо от их результата.
+        timeout (float): Таймаут фазы, секунды.
+        required (bool): Без этой фазы бот не может работать.
+    """
+
+    __slots__ = ('name', 'action', 'depends', 'after', 'timeout', 'required')
+
+    def __init__(self, name, action, depends=(), after=(), timeout=None, required=False):
+        self.name = name
+        self.action = action
+        self.depends = tuple(depends)
+        self.after = tuple(after)
+        self.timeout = timeout
+        self.required = required
+
+
+class StartupOrchestrator:
+    """
+    Параллельный запуск независимых фаз с таймаутами и обработкой частичных отказов.
+
+    Фазы выполняются в пуле потоков, каждая - как только завершились фазы, от которых она
+    зависит. Ошибка или таймаут необязательной фазы записывается в отчёт, зависящие от неё
+    фазы пропускаются, остальные продолжают работу. Если не выполнена обязательная фаза,
+    run() выбрасывает StartupError. Время готовности - максимум по цепочкам зависимостей,
+    а не сумма всех фаз.
+
+    Поток фазы, превысившей таймаут, прервать нельзя: он завершится в фоне, а его результат
+    будет отброшен.
+
+    Parameters:
+        timeout (float): Таймаут фазы по умолчанию, секунды.
+        max_workers (int): Количество потоков.
+
+    Attributes:
+        report (dict): Имя фазы -> {'status': 'ok' | 'failed' | 'timeout' | 'skipped',
+            'seconds': длительность, 'error': текст ошибки или None}.
+        elapsed (float): Общее время запуска, секунды.
+    """
+
+    def __init__(self, timeout=30.0, max_workers=8):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.phases = {}
+        self.report = {}
+        self.elapsed = 0.0
+
+        # Конфигурация логгера
+        self.logger = logging.getLogger(__name__)
+        LoggerConfig.configure_logger(self.logger)
+
+    def add_phase(self, name, action, depends=(), after=(), timeout=None, required=False):
+        """
+        Регистрирует фазу. Фазы из depends и after должны быть зарегистрированы раньше,
+        поэтому циклические зависимости невозможны.
+
+        Raises:
+            ValueError: При повторном имени или неизвестной зависимости.
+        """
+        if name in self.phases:
+            raise ValueError(f"Фаза {name} уже зарегистрирована")
+        unknown = [dependency for dependency in tuple(depends) + tuple(after) if dependency not in self.phases]
+        if unknown:
+            raise ValueError(f"Неизвестные зависимости фазы {name}: {', '.join(unknown)}")
+        self.phases[name] = StartupPhase(name, action, depends, after, timeout, required)
+
+    def _record(self, name, status, seconds, error=None):
+        self.report[name] = {'status': status, 'seconds': seconds, 'error': error}
+        if status == 'ok':
+            self.logger.debug("Фаза запуска %s: %.3f с.", name, seconds)
+        else:
+            self.logger.warning("Фаза запуска %s: %s (%.3f с) %s", name, status, seconds, error or '')
+
+    def run(self):
+        """
+        Выполняет все фазы.
+
+        Returns:
+            dict: Имя фазы -> результат для успешно завершившихся фаз.
+
+        Raises:
+            StartupError: Если обязательная фаза не выполнена.
+        """
+        self.report = {}
+        results = {}
+        pending = dict(self.phases)
+        running = {}
+        started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='startup')
+        try:
+            while pending or running:
+                for name, phase in list(pending.items()):
+                    if any(dependency not in self.report for dependency in phase.depends + phase.after):
+                        continue
+                    del pending[name]
+                    failed = [dependency for dependency in phase.depends
+                              if self.report[dependency]['status'] != 'ok']
+                    if failed:
+                        self._record(name, 'skipped', 0.0, f"не выполнены зависимости: {', '.join(failed)}")
+                        continue
+                    phase_started = time.perf_counter()
+                    timeout = phase.timeout if phase.timeout is not None else self.timeout
+                    future = executor.submit(phase.action, *(results[dependency] for dependency in phase.depends))
+                    running[future] = (phase, phase_started, phase_started + timeout)
+
+                if not running:
+                    # Пропущенные фазы могли освободить зависящие от них: следующий проход их обработает
+                    continue
+
+                next_deadline = min(deadline for _, _, deadline in running.values())
+                done, _ = wait(running, timeout=max(0.0, next_deadline - time.perf_counter()),
+                               return_when=FIRST_COMPLETED)
+                now = time.perf_counter()
+                for future in done:
+                    phase, phase_started, _ = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        results[phase.name] = future.result()
+                        self._record(phase.name, 'ok', now - phase_started)
+                    else:
+                        self._record(phase.name, 'failed', now - phase_started, f"{type(error).__name__}: {error}")
+                for future, (phase, phase_started, deadline) in list(running.items()):
+                    if now >= deadline:
+                        del running[future]
+                        future.cancel()
+                        self._record(phase.name, 'timeout', now - phase_started)
+        finally:
+            # Не ждём потоков фаз, превысивших таймаут
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.elapsed = time.perf_counter() - started
+
+        self.log_report()
+        missing = [name for name, phase in self.phases.items()
+                   if phase.required and self.report[name]['status'] != 'ok']
+        if missing:
+            raise StartupError(f"Не выполнены обязательные фазы запуска: {', '.join(missing)}", self.report)
+        return results
+
+    def log_report(self):
+        """
+        Записывает в лог длительность и результат каждой фазы и общее время запуска.
+        """
+        lines = [f"{name:<16} {entry['status']:<8} {entry['seconds']:8.3f} с"
+                 for name, entry in self.report.items()]
+        total = sum(entry['seconds'] for entry in self.report.values())
+        self.logger.info("Запуск завершён за %.3f с (последовательно: %.3f с):\n%s",
+                         self.elapsed, total, '\n'.join(lines))
@@ -0,0 +1,109 @@
+import abc
+
+import numpy as np
+
+from pivots import find_pivots
+
+
+class Strategy(abc.ABC):
+    """
+    Интерфейс стратегии для Backtester (backtesting.py).
+
+    Стратегия по всей истории сразу вычисляет целевую позицию на закрытии каждой свечи:
+    доля капитала в позиции, 1 - лонг, -1 - шорт, 0 - вне рынка. Значение свечи t может
+    зависеть только от свечей 0..t; исполняется оно на открытии свечи t + 1.
+
+    Attributes:
+        name (str): Имя стратегии для отчётов.
+    """
+
+    name = 'strategy'
+
+    @abc.abstractmethod
+    def signals(self, candles):
+        """
+        Parameters:
+            candles (CandleBatch): Свечи по возрастанию времени.
+
+        Returns:
+            np.ndarray: Целевая позиция (float64) для каждой свечи; NaN считается нулём.
+        """
+
+
+def shifted_moving_average(close, window, shift):
+    """
+    rolling(window).mean().shift(shift), как в indicators.calculate_moving_averages.
+    """
+    import pandas as pd
+    return pd.Series(close, copy=False).rolling(window=window).mean().shift(shift).to_numpy()
+
+
+class MovingAverageCrossover(Strategy):
+    """
+    Пересечение сдвинутых скользящих средних из indicators.py: лонг, пока быстрая средняя
+    выше медленной, иначе шорт (или вне рынка при allow_short=False).
+
+    Parameters:
+        fast (tuple): (окно, сдвиг) быстрой средней.
+        slow (tuple): (окно, сдвиг) медленной средней.
+        allow_short (bool): Открывать шорт, когда быстрая средняя ниже медленной.
+        average (callable): average(close, window, shift) - расчёт средней; подменяется
+            кэширующей версией при переборе параметров (parameter_sweep.py).
+    """
+
+    name = 'ma_crossover'
+
+    def __init__(self, fast=(3, 3), slow=(25, 25), allow_short=False, average=shifted_moving_average):
+        self.fast = fast
+        self.slow = slow
+        self.allow_short = allow_short
+        self.average = average
+
+    def signals(self, candles):
+        fast = self.average(candles.close_price, *self.fast)
+        slow = self.average(candles.close_price, *self.slow)
+        # Сравнение с NaN ложно: пока средние не определены, позиция нулевая
+        target = np.where(fast > slow, 1.0, 0.0)
+        if self.allow_short:
+            target[fast < slow] = -1.0
+        return target
+
+
+class BeerPointStrategy(Strategy):
+    """
+    Торговля по точкам разворота ("beer points"): после подтверждённой впадины - лонг,
+    после подтверждённой вершины - выход (или шорт при allow_short=True).
+
+    Разворот на свече i подтверждается только через length свечей, поэтому сигнал
+    появляется на свече i + length и не заглядывает в будущее.
+
+    Parameters:
+        length (int): Окно точек разворота (см. pivots.find_pivots).
+        allow_short (bool): Открывать шорт после вершины.
+        pivots (callable): pivots(high, low, length) - поиск разворотов (см. average
+            в MovingAverageCrossover).
+    """
+
+    name = 'beer_points'
+
+    def __init__(self, length=1, allow_short=False, pivots=find_pivots):
+        self.length = length
+        self.allow_short = allow_short
+        self.pivots = pivots
+
+    def signals(self, candles):
+        indices, is_high, _ = self.pivots(candles.high_price, candles.low_price, self.length)
+        target = np.full(len(candles), np.nan)
+        target[indices + self.length] = np.where(is_high, -1.0 if self.allow_short else 0.0, 1.0)
+        # Позиция сохраняется до следующей точки разворота
+        filled = np.where(np.isnan(target), 0, np.arange(len(target)))
+        np.maximum.accumulate(filled, out=filled)
+        target = target[filled]
+        target[np.isnan(target)] = 0.0
+        return target
+
+
+STRATEGIES = {
+    MovingAverageCrossover.name: MovingAverageCrossover,
+    BeerPointStrategy.name: BeerPointStrategy,
+}
@@ -0,0 +1,249 @@
+import math
+from collections import deque
+
+import numpy as np
+
+from candles import CandleBatch
+from metrics import timed
+from pivots import PIVOT_HIGH, PIVOT_LOW, find_pivots
+
+# Окна и сдвиги скользящих средних indicators.calculate_moving_averages
+MOVING_AVERAGES = ((3, 3), (5, 5), (25, 25))
+
+
+def moving_average_column(window):
+    return f'{window}_day_ma_shifted'
+
+
+class RollingMean:
+    """
+    Скользящее среднее с обновлением за O(1) на каждое новое значение.
+
+    Повторяет алгоритм pandas Series.rolling(window).mean(): сумма окна с компенсацией Кахана
+    (отдельно для добавления и удаления значений), пропуск NaN, обнуление результата
+    с неверным знаком и подстановка самого значения при серии одинаковых значений.
+    Поэтому результат побитово совпадает с пакетным расчётом pandas.
+
+    Parameters:
+        window (int): Размер окна (он же минимальное количество наблюдений).
+    """
+
+    __slots__ = ('window', '_values', '_nobs', '_neg_ct', '_sum', '_compensation_add',
+                 '_compensation_remove', '_same_count', '_prev_value')
+
+    def __init__(self, window):
+        self.window = window
+        self._values = deque()
+        self._reset()
+
+    def _reset(self):
+        self._nobs = 0
+        self._neg_ct = 0
+        self._sum = 0.0
+        self._compensation_add = 0.0
+        self._compensation_remove = 0.0
+        self._same_count = 0
+        self._prev_value = math.nan
+
+    def _add(self, value):
+        if value != value:
+            return
+        self._nobs += 1
+        y = value - self._compensation_add
+        t = self._sum + y
+        self._compensation_add = t - self._sum - y
+        self._sum = t
+        if math.copysign(1.0, value) < 0:
+            self._neg_ct += 1
+        if value == self._prev_value:
+            self._same_count += 1
+        else:
+            self._same_count = 1
+        self._prev_value = value
+
+    def _remove(self, value):
+        if value != value:
+            return
+        self._nobs -= 1
+        y = -value - self._compensation_remove
+        t = self._sum + y
+        self._compensation_remove = t - self._sum - y
+        self._sum = t
+        if math.copysign(1.0, value) < 0:
+            self._neg_ct -= 1
+
+    def update(self, value):
+        """
+        Добавляет значение и возвращает среднее по последним window значениям (NaN, пока окно не заполнено).
+        """
+        value = float(value)
+        self._values.append(value)
+        if self.window == 1:
+            # pandas пересчитывает окно из одного значения заново на каждом шаге
+            self._values.popleft()
+            self._reset()
+            self._prev_value = value
+        elif len(self._values) > self.window:
+            self._remove(self._values.popleft())
+        self._add(value)
+
+        if self._nobs >= self.window and self._nobs > 0:
+            result = self._sum / self._nobs
+            if self._same_count >= self._nobs:
+                result = self._prev_value
+            elif self._neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self._neg_ct == self._nobs and result > 0:
+                result = 0.0
+            return result
+        return math.nan
+
+
+class ShiftedMovingAverage:
+    """
+    rolling(window).mean().shift(shift) с обновлением за O(1).
+    """
+
+    __slots__ = ('mean', 'shift', '_history')
+
+    def __init__(self, window, shift):
+        self.mean = RollingMean(window)
+        self.shift = shift
+        self._history = deque([math.nan] * shift, maxlen=shift + 1)
+
+    def update(self, value):
+        self._history.append(self.mean.update(value))
+        return self._history[0]
+
+
+class PivotDetector:
+    """
+    Подтверждение точек разворота по мере поступления свечей.
+
+    Хранит кольцевой буфер из 2 * length + 1 последних свечей; свеча в его центре
+    проверяется, когда за ней пришли length свечей. Правила совпадают с pivots.find_pivots.
+
+    Parameters:
+        length (int): Количество свечей окна с каждой стороны.
+    """
+
+    def __init__(self, length=1):
+        self.length = length
+        self._buffer = deque(maxlen=2 * length + 1)
+
+    def update(self, timestamp, high, low):
+        """
+        Добавляет свечу; возвращает подтверждённую точку разворота
+        {'Pivot Type', 'Pivot Value', 'Date'} или None.
+        """
+        self._buffer.append((timestamp, high, low))
+        if len(self._buffer) < self._buffer.maxlen:
+            return None
+
+        center_time, center_high, center_low = self._buffer[self.length]
+        neighbours = [candle for i, candle in enumerate(self._buffer) if i != self.length]
+        if all(center_high > candle[1] for candle in neighbours):
+            return {'Pivot Type': PIVOT_HIGH, 'Pivot Value': center_high, 'Date': center_time}
+        if all(center_low < candle[2] for candle in neighbours):
+            return {'Pivot Type': PIVOT_LOW, 'Pivot Value': center_low, 'Date': center_time}
+        return None
+
+
+class IndicatorEngine:
+    """
+    Инкрементальный расчёт индикаторов indicators.py для живого цикла.
+
+    На каждую закрытую свечу вычисляются только новые значения сдвинутых скользящих средних
+    и, если она подтверждает разворот, новая точка разворота. Свеча, время которой не позже
+    уже учтённой, пропускается: иначе одна свеча попала бы в окна дважды.
+
+    Parameters:
+        moving_averages (tuple): Пары (окно, сдвиг) скользящих средних.
+        pivot_length (int): Окно точек разворота.
+
+    Attributes:
+        last_timestamp: Время последней учтённой свечи (None, пока свечей не было).
+    """
+
+    def __init__(self, moving_averages=MOVING_AVERAGES, pivot_length=1):
+        self.moving_averages = {moving_average_column(window): ShiftedMovingAverage(window, shift)
+                                for window, shift in moving_averages}
+        self.pivots = PivotDetector(pivot_length)
+        self.last_timestamp = None
+
+    @timed('indicator_update')
+    def update(self, timestamp, high, low, close):
+        """
+        Обрабатывает закрытую свечу.
+
+        Returns:
+            tuple: (значения скользящих средних по колонкам, точка разворота или None);
+                None, если свеча с этим временем уже учтена.
+        """
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return None
+        return self._update(timestamp, high, low, close)
+
+    def _update(self, timestamp, high, low, close):
+        self.last_timestamp = timestamp
+        values = {column: average.update(close) for column, average in self.moving_averages.items()}
+        return values, self.pivots.update(timestamp, high, low)
+
+    @timed('indicator_warm_up', rows=lambda result: len(result[0]))
+    def warm_up(self, price_data):
+        """
+        Прогоняет историю через движок. Свечи, уже учтённые движком, пропускаются.
+
+        Parameters:
+            price_data (pd.DataFrame | CandleBatch): Фрейм fetch_data_for_chart с индексом
+                по времени или набор свечей (используется без копирования).
+
+        Returns:
+            tuple: (фрейм значений скользящих средних, список точек разворота).
+        """
+        if isinstance(price_data, CandleBatch):
+            price_data = price_data.to_frame(index='timestamp')
+        if self.last_timestamp is not None:
+            price_data = price_data[price_data.index > self.last_timestamp]
+        rows = {column: [] for column in self.moving_averages}
+        pivots = []
+        for timestamp, high, low, close in zip(price_data.index, price_data['high_price'].to_numpy(),
+                                               price_data['low_price'].to_numpy(),
+                                               price_data['close_price'].to_numpy()):
+            # Без измерения каждой свечи: прогрев измеряется целиком
+            values, pivot = self._update(timestamp, high, low, close)
+            for column, value in values.items():
+                rows[column].append(value)
+            if pivot is not None:
+                pivots.append(pivot)
+        return price_data[[]].assign(**rows), pivots
+
+
+def replay_and_compare(price_data, moving_averages=MOVING_AVERAGES, pivot_length=1):
+    """
+    Прогоняет историю свеча за свечой и сравнивает результат с пакетным расчётом pandas/NumPy.
+
+    Raises:
+        AssertionError: Если значения скользящих средних не совпадают побитово
+            или точки разворота отличаются.
+    """
+    streamed, pivots = IndicatorEngine(moving_averages, pivot_length).warm_up(price_data)
+
+    for window, shift in moving_averages:
+        column = moving_average_column(window)
+        expected = price_data['close_price'].astype(float).rolling(window=window).mean().shift(shift).to_numpy()
+        actual = streamed[column].to_numpy()
+        # Сравнение битовых представлений: NaN совпадают с NaN, 0.0 отличается от -0.0
+        if not np.array_equal(expected.view(np.int64), actual.view(np.int64)):
+            mismatch = int(np.flatnonzero(expected.view(np.int64) != actual.view(np.int64))[0])
+            raise AssertionError(f"{column}: расхождение в строке {mismatch}: "
+                                 f"{expected[mismatch]!r} != {actual[mismatch]!r}")
+
+    indices, is_high, values = find_pivots(price_data['high_price'].to_numpy(),
+                                           price_data['low_price'].to_numpy(), pivot_length)
+    expected_pivots = [(price_data.index[i], PIVOT_HIGH if high else PIVOT_LOW, value)
+                       for i, high, value in zip(indices, is_high, values)]
+    actual_pivots = [(pivot['Date'], pivot['Pivot Type'], pivot['Pivot Value']) for pivot in pivots]
+    if expected_pivots != actual_pivots:
+        raise AssertionError("Точки разворота потокового и пакетного расчёта не совпадают")
+    return True
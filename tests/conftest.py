@@ -0,0 +1,101 @@
+"""
+Общие заглушки тестов: хранилище свечей в памяти процесса; биржа (FakeExchange) и свечи
+(generate_candles) - общие с benchmarks.py, из fakes.py.
+
+Тесты не обращаются к внешней сети; тесты PostgreSQL пропускаются, если база недоступна.
+Параметры по умолчанию (символ, интервал) берутся из configuration_default, как и в остальном проекте.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import MINUTE, START, FakeExchange, generate_candles  # noqa: E402,F401
+from timeutils import candle_close_time, candle_open_time  # noqa: E402
+
+
+def make_candles(count, start=START, step=MINUTE, seed=0):
+    """
+    Свечи generate_candles в формате fetch_ohlcv: списки [timestamp, open, high, low, close, volume].
+    """
+    return [list(candle) for candle in generate_candles(count, seed, start, step)]
+
+
+class FakeDatabase:
+    """
+    Хранилище свечей с интерфейсом DatabaseManager, используемым компонентами:
+    insert_data, query_candles(as_arrays=True), fetch_candles_since,
+    get_first_timestamp/get_last_timestamp, а также find_gaps с семантикой GapScanner.
+    """
+
+    def __init__(self):
+        self.series = {}
+        self.inserts = []
+
+    def _rows(self, symbol, timeframe):
+        return self.series.setdefault((symbol, timeframe), {})
+
+    def _timestamps(self, symbol, timeframe, start=None, end=None):
+        return sorted(timestamp for timestamp in self._rows(symbol, timeframe)
+                      if (start is None or timestamp >= start) and (end is None or timestamp < end))
+
+    def insert_data(self, data, symbol=None, timeframe=None, on_conflict='ignore', batch_size=50000,
+                    raise_errors=False):
+        rows = self._rows(symbol, timeframe)
+        inserted = 0
+        for candle in data:
+            timestamp = int(candle[0])
+            if timestamp in rows and on_conflict == 'ignore':
+                continue
+            rows[timestamp] = [timestamp] + [float(value) for value in candle[1:6]]
+            inserted += 1
+        self.inserts.append((symbol, timeframe, inserted))
+        return inserted
+
+    def get_first_timestamp(self, symbol=None, timeframe=None, start=None, end=None):
+        timestamps = self._timestamps(symbol, timeframe, start, end)
+        return timestamps[0] if timestamps else None
+
+    def get_last_timestamp(self, symbol=None, timeframe=None, start=None, end=None):
+        timestamps = self._timestamps(symbol, timeframe, start, end)
+        return timestamps[-1] if timestamps else None
+
+    def query_candles(self, symbol=None, timeframe=None, start=None, end=None, columns=None, limit=None,
+                      as_arrays=False):
+        rows = self._rows(symbol, timeframe)
+        selected = [rows[timestamp] for timestamp in self._timestamps(symbol, timeframe, start, end)]
+        if limit is not None:
+            selected = selected[-limit:]
+        names = ('timestamp', 'open_price', 'high_price', 'low_price', 'close_price', 'volume')
+        values = list(zip(*selected)) if selected else [()] * len(names)
+        return {name: np.array(column, dtype=np.int64 if name == 'timestamp' else np.float64)
+                for name, column in zip(names, values)}
+
+    def fetch_candles_since(self, symbol=None, timeframe=None, since=None):
+        import pandas as pd
+
+        return pd.DataFrame(self.query_candles(symbol, timeframe, start=since, as_arrays=True))
+
+    def find_gaps(self, symbol, timeframe, start=None, end=None):
+        timestamps = self._timestamps(symbol, timeframe, start, end)
+        gaps = [(candle_close_time(timeframe, previous), current)
+                for previous, current in zip(timestamps, timestamps[1:])
+                if candle_close_time(timeframe, previous) < current]
+        if start is not None:
+            aligned = candle_open_time(timeframe, start)
+            if aligned < start:
+                aligned = candle_close_time(timeframe, aligned)
+            head_end = timestamps[0] if timestamps else end
+            if head_end is not None and aligned < head_end:
+                gaps.insert(0, (aligned, head_end))
+        if end is not None and timestamps and candle_close_time(timeframe, timestamps[-1]) < end:
+            gaps.append((candle_close_time(timeframe, timestamps[-1]), end))
+        return np.array(gaps, dtype=np.int64).reshape(-1, 2)
+
+
+@pytest.fixture
+def database():
+    return FakeDatabase()
@@ -0,0 +1,61 @@
+import asyncio
+
+import numpy as np
+
+from async_fetcher import AsyncPriceFetcher
+from candles import CandleBatch
+from conftest import MINUTE, START, FakeExchange, make_candles
+
+
+class AsyncExchange(FakeExchange):
+    """
+    Асинхронный клиент с интерфейсом ccxt.async_support.
+    """
+
+    def milliseconds(self):
+        return self.fetch_ticker(None)['timestamp']
+
+    async def fetch_ohlcv(self, symbol, timeframe=None, since=None, limit=None):
+        return super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+
+def test_fetch_pair_skips_open_candle(database):
+    candles = make_candles(300)
+    # Последняя свеча ещё не закрыта
+    exchange = AsyncExchange(candles, now=START + 299 * MINUTE + 1)
+    fetcher = AsyncPriceFetcher([('BTC/USDT', '1m')], db_manager=database, period=250, exchange=exchange)
+    fetcher.page_limit = 100
+
+    results = asyncio.run(fetcher.run())
+
+    timestamps = results[('BTC/USDT', '1m')].timestamp.tolist()
+    assert timestamps == [candle[0] for candle in candles[49:299]]
+    assert database.get_last_timestamp('BTC/USDT', '1m') == START + 298 * MINUTE
+
+
+class PartlyFailingExchange(AsyncExchange):
+    """
+    Биржа, запросы свечей одного символа к которой завершаются ошибкой.
+    """
+
+    async def fetch_ohlcv(self, symbol, timeframe=None, since=None, limit=None):
+        if symbol == 'ETH/USDT':
+            raise ConnectionError('Connection reset by peer')
+        return await super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+
+def test_failed_pair_returns_empty_batch(database):
+    exchange = PartlyFailingExchange(make_candles(300))
+    pairs = [('BTC/USDT', '1m'), ('ETH/USDT', '1m')]
+    fetcher = AsyncPriceFetcher(pairs, db_manager=database, period=100, exchange=exchange)
+
+    results = asyncio.run(fetcher.run())
+
+    assert len(results[('BTC/USDT', '1m')]) == 100
+    failed = results[('ETH/USDT', '1m')]
+    assert isinstance(failed, CandleBatch) and len(failed) == 0
+    assert failed.timestamp.dtype == np.int64
+    assert list(fetcher.errors) == [('ETH/USDT', '1m')]
+    report = fetcher.report()
+    assert (report['errors'], report['failed_pairs'], report['candles']) == (1, ['ETH/USDT 1m'], 100)
+    assert database.get_last_timestamp('ETH/USDT', '1m') is None
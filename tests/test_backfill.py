@@ -0,0 +1,43 @@
+from backfill import BackfillEngine
+from conftest import MINUTE, START, FakeExchange, make_candles
+from historical_prices import HistoricalPriceFetcher
+
+SYMBOL = 'BTC/USDT'
+
+
+def make_engine(database, candles, page_limit=100):
+    fetcher = HistoricalPriceFetcher(SYMBOL, '1m', exchange=FakeExchange(candles))
+    fetcher.page_limit = page_limit
+    return BackfillEngine(fetcher, database, scanner=database), fetcher.exchange
+
+
+def test_backfill_loads_full_range(database):
+    candles = make_candles(500)
+    engine, _ = make_engine(database, candles)
+
+    assert engine.run(START, START + 500 * MINUTE) == 500
+    assert database.query_candles(SYMBOL, '1m', as_arrays=True)['timestamp'].tolist() == [c[0] for c in candles]
+
+
+def test_resume_fills_older_part_when_range_has_newer_rows(database):
+    candles = make_candles(500)
+    # Первые 100 свечей загружены прерванной загрузкой, последние 50 - живым потоком
+    database.insert_data(candles[:100], symbol=SYMBOL, timeframe='1m')
+    database.insert_data(candles[450:], symbol=SYMBOL, timeframe='1m')
+    engine, exchange = make_engine(database, candles)
+
+    assert engine.checkpoint(START, START + 500 * MINUTE) == START + 100 * MINUTE
+    assert engine.run(START, START + 500 * MINUTE) == 350
+    assert database.query_candles(SYMBOL, '1m', as_arrays=True)['timestamp'].tolist() == [c[0] for c in candles]
+    # Запрашивается только пропуск, уже сохранённые свечи не загружаются повторно
+    assert exchange.requests[0][0] == START + 100 * MINUTE
+    assert engine.checkpoint(START, START + 500 * MINUTE) is None
+
+
+def test_resume_fills_holes_inside_range(database):
+    candles = make_candles(300)
+    database.insert_data(candles[:120] + candles[130:], symbol=SYMBOL, timeframe='1m')
+    engine, _ = make_engine(database, candles)
+
+    assert engine.run(START, START + 300 * MINUTE) == 10
+    assert len(database.query_candles(SYMBOL, '1m', as_arrays=True)['timestamp']) == 300
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from backtesting import Backtester, compare_with_event_loop
+from candles import CandleBatch
+from conftest import make_candles
+from strategy import MovingAverageCrossover
+
+
+def history(count=2000, seed=11):
+    return CandleBatch.from_rows(make_candles(count, seed=seed))
+
+
+def random_targets(count, choices, seed=3):
+    rng = np.random.default_rng(seed)
+    # Держим позицию несколько свечей подряд, чтобы были и длинные отрезки, и частые смены
+    values = rng.choice(choices, size=count // 5 + 1)
+    return np.repeat(values, 5)[:count]
+
+
+@pytest.mark.parametrize('fee, slippage', [(0.0, 0.0), (0.001, 0.0), (0.0, 0.0005), (0.002, 0.001)])
+def test_fees_and_slippage(fee, slippage):
+    candles = history()
+    backtester = Backtester(fee=fee, slippage=slippage)
+
+    assert compare_with_event_loop(backtester, candles, random_targets(len(candles), [0.0, 1.0]))
+    assert compare_with_event_loop(backtester, candles, MovingAverageCrossover())
+
+
+def test_short_positions():
+    candles = history(seed=12)
+    backtester = Backtester(fee=0.001, slippage=0.0005)
+
+    # Прямые развороты лонг -> шорт без промежуточного нуля
+    assert compare_with_event_loop(backtester, candles, random_targets(len(candles), [-1.0, 1.0]))
+    assert compare_with_event_loop(backtester, candles, MovingAverageCrossover(allow_short=True))
+    result = backtester.run(candles, random_targets(len(candles), [-1.0, 0.0]))
+    assert (result.trades['position'] < 0).all()
+    assert len(result.trades) > 0
+
+
+def test_fractional_and_nan_targets():
+    candles = history(seed=13)
+    backtester = Backtester(fee=0.001, slippage=0.0005)
+    targets = random_targets(len(candles), [-0.5, 0.0, 0.25, 1.0, 1.5])
+    targets[::7] = np.nan
+
+    assert compare_with_event_loop(backtester, candles, targets)
+    result = backtester.run(candles, targets)
+    # NaN - вне рынка на следующей свече
+    assert (result.positions[1::7] == 0.0).all()
+    assert set(np.unique(result.positions)) <= {-0.5, 0.0, 0.25, 1.0, 1.5}
+
+
+def test_empty_input():
+    backtester = Backtester(fee=0.001, slippage=0.0005)
+    candles = CandleBatch.empty()
+
+    assert compare_with_event_loop(backtester, candles, np.empty(0))
+    vectorized = backtester.run(candles, np.empty(0))
+    reference = backtester.run_event_loop(candles, np.empty(0))
+    for result in (vectorized, reference):
+        assert len(result.equity) == 0
+        assert result.trades.empty
+        assert result.fees == 0.0
+        assert result.stats == {}
+
+
+def test_single_candle_and_flat_strategy():
+    candles = history(count=1)
+    backtester = Backtester(fee=0.001)
+
+    assert compare_with_event_loop(backtester, candles, [1.0])
+    flat = backtester.run(history(), np.zeros(2000))
+    assert np.all(flat.equity == backtester.initial_capital)
+    assert flat.trades.empty
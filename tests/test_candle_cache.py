@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from backfill import BackfillEngine
+from candle_cache import CandleCache, invalidate
+from conftest import START, FakeExchange, make_candles
+from historical_prices import HistoricalPriceFetcher
+from resampling import ResamplingEngine
+
+SYMBOL = 'BTC/USDT'
+HOUR = 3_600_000
+# Январь - март 2015 года
+CANDLES = 90 * 24
+
+
+def assert_cache_matches_database(cache, database, timeframe):
+    cached = cache.load(SYMBOL, timeframe)
+    stored = database.query_candles(SYMBOL, timeframe, as_arrays=True)
+    for column, values in stored.items():
+        assert np.array_equal(cached[column].to_numpy(), values)
+
+
+def test_invalidate_removes_months_from_since(tmp_path, database):
+    database.insert_data(make_candles(CANDLES, step=HOUR), symbol=SYMBOL, timeframe='1h')
+    cache = CandleCache(database, root=str(tmp_path))
+    cache.refresh(SYMBOL, '1h')
+    directory = tmp_path / 'BTC_USDT' / '1h'
+    assert sorted(path.name for path in directory.iterdir()) == ['2015-01.arrow', '2015-02.arrow', '2015-03.arrow']
+
+    assert invalidate(SYMBOL, '1h', START + 40 * 24 * HOUR, root=str(tmp_path)) == 2
+    assert [path.name for path in directory.iterdir()] == ['2015-01.arrow']
+    assert_cache_matches_database(cache, database, '1h')
+
+
+def test_backfill_of_older_rows_invalidates_cache(tmp_path, database):
+    candles = make_candles(CANDLES, step=HOUR)
+    # В январе пропуск, который позже заполняется загрузкой истории
+    database.insert_data(candles[:200] + candles[300:], symbol=SYMBOL, timeframe='1h')
+    cache = CandleCache(database, root=str(tmp_path))
+    assert len(cache.load(SYMBOL, '1h')) == CANDLES - 100
+
+    fetcher = HistoricalPriceFetcher(SYMBOL, '1h', exchange=FakeExchange(candles, timeframe='1h'))
+    engine = BackfillEngine(fetcher, database, scanner=database, cache_root=str(tmp_path))
+    assert engine.run(START, START + CANDLES * HOUR) == 100
+
+    assert len(cache.load(SYMBOL, '1h')) == CANDLES
+    assert_cache_matches_database(cache, database, '1h')
+
+
+def test_materialize_invalidates_derived_timeframes(tmp_path, database):
+    candles = make_candles(CANDLES, step=HOUR)
+    database.insert_data(candles, symbol=SYMBOL, timeframe='1h')
+    engine = ResamplingEngine(database, SYMBOL, base_timeframe='1h', timeframes=('1d',), cache_root=str(tmp_path))
+    engine.materialize()
+    cache = CandleCache(database, root=str(tmp_path))
+    cache.refresh(SYMBOL, '1d')
+
+    # Исправленная базовая свеча в январе пересчитывает январский дневной бар
+    revised = list(candles[30])
+    revised[2] += 10.0
+    database.insert_data([revised], symbol=SYMBOL, timeframe='1h', on_conflict='update')
+    engine.materialize(start=revised[0], end=revised[0] + HOUR)
+
+    daily = cache.load(SYMBOL, '1d')
+    assert daily['high_price'].to_numpy()[1] == revised[2]
+    assert_cache_matches_database(cache, database, '1d')
+
+
+def test_import_does_not_load_database_driver():
+    # Кэш читается и без PostgreSQL: импорт не должен тянуть database и psycopg2
+    code = "import sys, candle_cache; print(sorted({'database', 'psycopg2'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == '[]'
@@ -0,0 +1,124 @@
+import json
+import queue
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from candles import CandleBatch
+from chart_server import PAGE, SymbolFeed
+from conftest import MINUTE, START, make_candles
+from indicators import calculate_moving_averages
+
+SYMBOL = 'BTC/USDT'
+
+
+def read_events(subscriber):
+    events = []
+    while True:
+        try:
+            payload = subscriber.events.get_nowait().decode()
+        except queue.Empty:
+            return events
+        event, data = payload.strip().split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+
+
+def expected_moving_averages(candles):
+    frame = CandleBatch.from_rows(candles).to_frame(index='timestamp')
+    return calculate_moving_averages(frame)
+
+
+def test_feed_sends_snapshot_then_closed_candles_only(database):
+    candles = make_candles(62)
+    # 60 закрытых свечей и текущая, ещё не закрытая свеча
+    database.insert_data(candles[:61], symbol=SYMBOL, timeframe='1m')
+    feed = SymbolFeed(database, SYMBOL, '1m', history=100)
+    feed.clock = lambda: (START + 60 * MINUTE + 10_000) / 1000
+    feed.load_initial()
+
+    subscriber, snapshot = feed.subscribe()
+    _, data = snapshot.decode().strip().split('\n')
+    snapshot = json.loads(data[len('data: '):])
+    assert [candle[0] for candle in snapshot['candles']] == [candle[0] for candle in candles[:60]]
+    assert all(len(values) == 60 for values in snapshot['moving_averages'].values())
+
+    # Незакрытая свеча меняется: клиентам ничего не отправляется
+    revised = list(candles[60])
+    revised[4] += 1.0
+    database.insert_data([revised], symbol=SYMBOL, timeframe='1m', on_conflict='update')
+    assert feed.poll() == 0
+    assert read_events(subscriber) == []
+
+    # Свеча закрылась (с изменённой ценой) и открылась следующая
+    feed.clock = lambda: (START + 61 * MINUTE + 10_000) / 1000
+    database.insert_data([candles[61]], symbol=SYMBOL, timeframe='1m')
+    assert feed.poll() == 1
+    events = read_events(subscriber)
+    assert [event for event, _ in events] == ['candle']
+    candle_event = events[0][1]
+    assert candle_event['candle'] == revised
+
+    expected = expected_moving_averages(candles[:60] + [revised]).iloc[-1]
+    for column, value in candle_event['moving_averages'].items():
+        assert value == (None if np.isnan(expected[column]) else expected[column])
+
+    # Повторный опрос не рассылает уже отправленные свечи
+    assert feed.poll() == 0
+    assert read_events(subscriber) == []
+
+
+# Окружение браузера для скрипта страницы: Plotly.react запоминает число свечей, EventSource -
+# обработчики событий; после загрузки скрипт получает снимок и свечу из SymbolFeed
+PAGE_HARNESS = """
+const rendered = [];
+const sources = [];
+globalThis.document = {
+    createElement: () => ({}),
+    getElementById: () => ({appendChild: () => {}}),
+};
+globalThis.Plotly = {react: (div, traces) => rendered.push([traces[0].x.length, traces[traces.length - 1].x.length])};
+globalThis.EventSource = class {
+    constructor(url) { this.listeners = {}; sources.push(this); }
+    addEventListener(event, listener) { this.listeners[event] = listener; }
+};
+globalThis.fetch = () => Promise.resolve({json: () => Promise.resolve(['BTC/USDT:1m'])});
+%(script)s
+setTimeout(() => {
+    for (const [event, data] of %(events)s) sources[0].listeners[event]({data: data});
+    console.log(JSON.stringify(rendered));
+}, 0);
+"""
+
+
+def page_script(page):
+    return page.split('<script>')[1].split('</script>')[0]
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='нет node для запуска скрипта страницы')
+def test_page_renders_empty_snapshot(database):
+    feed = SymbolFeed(database, SYMBOL, '1m', history=100)
+    feed.clock = lambda: (START + 10_000) / 1000
+    feed.load_initial()
+    subscriber, snapshot = feed.subscribe()
+
+    database.insert_data(make_candles(1), symbol=SYMBOL, timeframe='1m')
+    feed.clock = lambda: (START + MINUTE + 10_000) / 1000
+    assert feed.poll() == 1
+    payloads = [snapshot] + [subscriber.events.get_nowait()]
+    events = [[line[len('event: '):] for line in payload.decode().split('\n') if line.startswith('event: ')]
+              + [line[len('data: '):] for line in payload.decode().split('\n') if line.startswith('data: ')]
+              for payload in payloads]
+    assert json.loads(events[0][1])['candles'] == []
+    # Пустой снимок с точкой разворота, пережившей свои свечи: фильтр точек обращается к первой свече
+    stale_pivot = {'timestamp': START, 'value': 100.0, 'type': 'High'}
+    events.insert(0, ['snapshot', json.dumps({'candles': [], 'moving_averages': {}, 'pivots': [stale_pivot]})])
+
+    script = PAGE_HARNESS % {'script': page_script(PAGE % {'height': '400px', 'history': 100}),
+                             'events': json.dumps(events)}
+    result = subprocess.run(['node', '-e', script], capture_output=True, text=True, timeout=30)
+
+    assert result.returncode == 0, result.stderr
+    # Пустые снимки отрисованы без ошибки и без точек разворота, затем добавлена первая свеча
+    assert json.loads(result.stdout) == [[0, 0], [0, 0], [1, 0]]
@@ -0,0 +1,130 @@
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from binance_f.model.constant import OrderSide, OrderType
+
+from connected_api import MAINNET_URL, TESTNET_URL, ConnectedAPI
+from fakes import AccountStubServer
+
+
+@pytest.fixture
+def stub():
+    server = AccountStubServer().start()
+    yield server
+    server.close()
+
+
+def test_account_reads_reuse_one_connection(stub):
+    api = ConnectedAPI('key', 'secret', url=stub.url, cache_ttl=0)
+    try:
+        for _ in range(5):
+            balances, output = api.get_account_balance()
+            assert balances == [('USDT', 1000.0)]
+            assert '/fapi/v2/balance' in output
+            positions, output = api.get_open_positions()
+            assert positions == [('BTCUSDT', 'BOTH', 0.01)]
+            assert '/fapi/v2/positionRisk' in output
+    finally:
+        api.close()
+
+    assert [path.split('?')[0] for _, path in stub.requests] == ['/fapi/v2/balance', '/fapi/v2/positionRisk'] * 5
+    assert stub.connections == 1
+    assert api.get_stats()['requests'] == 10
+
+
+def test_account_state_is_cached(stub):
+    api = ConnectedAPI('key', 'secret', url=stub.url, cache_ttl=60.0)
+    try:
+        for _ in range(3):
+            assert api.get_account_state() == ([('USDT', 1000.0)], [('BTCUSDT', 'BOTH', 0.01)])
+        assert len(stub.requests) == 2
+        api.invalidate_account_state()
+        api.get_account_state()
+    finally:
+        api.close()
+
+    assert len(stub.requests) == 4
+    assert api.get_stats()['hits'] == 4
+
+
+def test_post_order_invalidates_cache(stub):
+    api = ConnectedAPI('key', 'secret', url=stub.url)
+    try:
+        api.get_account_balance()
+        order = api.post_order('BTCUSDT', OrderSide.BUY, OrderType.MARKET, quantity=0.001)
+    finally:
+        api.close()
+
+    assert order.orderId == 1 and order.status == 'NEW'
+    method, path = stub.requests[-1]
+    assert method == 'POST'
+    assert path.startswith('/fapi/v1/order?')
+    assert 'symbol=BTCUSDT' in path and 'quantity=0.001' in path
+    assert api._cache == {}
+    assert stub.connections == 1
+
+
+@pytest.mark.parametrize('path, read', [('/fapi/v2/balance', ConnectedAPI.get_account_balance),
+                                        ('/fapi/v2/positionRisk', ConnectedAPI.get_open_positions)])
+def test_api_errors_return_empty_result(stub, path, read):
+    stub.failing.add(path)
+    api = ConnectedAPI('key', 'secret', url=stub.url)
+    try:
+        assert read(api) == ([], '')
+    finally:
+        api.close()
+
+    assert api.get_stats()['misses'] == 1
+    # Ошибка не кэшируется: следующий вызов снова обращается к бирже
+    stub.failing.clear()
+    try:
+        assert read(api)[0]
+    finally:
+        api.close()
+
+
+def test_overlapping_calls_capture_own_output(stub, monkeypatch):
+    stub.delay = 0.002
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    api = ConnectedAPI('key', 'secret', url=stub.url, cache_ttl=0, max_workers=32)
+    endpoints = {'balance': '/fapi/v2/balance', 'positions': '/fapi/v2/positionRisk'}
+    reads = {'balance': api.get_account_balance, 'positions': api.get_open_positions}
+    expected = {'balance': [('USDT', 1000.0)], 'positions': [('BTCUSDT', 'BOTH', 0.01)]}
+    kinds = ['balance' if i % 2 else 'positions' for i in range(400)]
+    done = threading.Event()
+
+    def heartbeat():
+        # Вывод приложения во время вызовов не должен попасть в их перехват
+        while not done.is_set():
+            print('heartbeat')
+            done.wait(0.0005)
+
+    printer = threading.Thread(target=heartbeat)
+    printer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(lambda kind: reads[kind](), kinds))
+    finally:
+        done.set()
+        printer.join()
+        api.close()
+
+    for kind, (value, output) in zip(kinds, results):
+        other = 'positions' if kind == 'balance' else 'balance'
+        assert value == expected[kind]
+        assert output.count(endpoints[kind]) == 1
+        assert endpoints[other] not in output and 'heartbeat' not in output
+    assert stdout.getvalue().count('heartbeat') > 0
+    assert set(stdout.getvalue().split()) == {'heartbeat'}
+    assert len(stub.requests) == 400
+    assert stub.connections <= 32
+
+
+def test_mainnet_requires_explicit_setting():
+    # Запрос только формируется, без обращения к сети
+    assert ConnectedAPI('key', 'secret').client.request_impl.get_balance_v2().host == TESTNET_URL
+    assert ConnectedAPI('key', 'secret', testnet=False).client.request_impl.get_balance_v2().host == MAINNET_URL
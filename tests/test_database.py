@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from candles import CandleBatch
+from conftest import START, MINUTE, make_candles
+from connection_pool import ConnectionPool
+from database import DatabaseManager
+from gap_repair import GapScanner
+
+TABLE = 'test_insert_candles'
+
+
+@pytest.fixture
+def db_manager():
+    pool = ConnectionPool.from_env(size=1, timeout=5.0)
+    try:
+        with pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            connection.commit()
+    except psycopg2.OperationalError as e:
+        pool.close()
+        pytest.skip(f"PostgreSQL недоступен: {e}")
+    manager = DatabaseManager(table_name=TABLE, pool=pool)
+    yield manager
+    with pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        connection.commit()
+    manager.close_pool()
+
+
+def close_prices(manager):
+    return dict(zip(*(manager.query_candles(symbol='BTC/USDT', timeframe='1m', as_arrays=True)[column].tolist()
+                      for column in ('timestamp', 'close_price'))))
+
+
+def with_close(rows, close):
+    return [(row[0], row[1], row[2], row[3], close, row[5]) for row in rows]
+
+
+@pytest.mark.parametrize('as_batch', [False, True])
+def test_ignore_keeps_and_update_overwrites(db_manager, as_batch):
+    rows = make_candles(10)
+    wrap = CandleBatch.from_rows if as_batch else list
+
+    assert db_manager.insert_data(wrap(rows), 'BTC/USDT', '1m', raise_errors=True) == 10
+    assert db_manager.insert_data(wrap(with_close(rows[5:], 1.0)), 'BTC/USDT', '1m', raise_errors=True) == 0
+    assert close_prices(db_manager) == {row[0]: row[4] for row in rows}
+
+    assert db_manager.insert_data(wrap(with_close(rows[5:], 1.0)), 'BTC/USDT', '1m', on_conflict='update',
+                                  raise_errors=True) == 5
+    assert close_prices(db_manager) == {row[0]: 1.0 if i >= 5 else row[4] for i, row in enumerate(rows)}
+
+
+@pytest.mark.parametrize('on_conflict', ['ignore', 'update'])
+@pytest.mark.parametrize('as_batch', [False, True])
+def test_last_duplicate_in_batch_wins(db_manager, on_conflict, as_batch):
+    rows = make_candles(50)
+    # Каждая свеча повторяется трижды; последняя копия - с close_price = номер свечи
+    data = [row for i, row in enumerate(rows) for row in (with_close([row], -1.0)[0], row, with_close([row], i)[0])]
+    wrap = CandleBatch.from_rows if as_batch else list
+
+    assert db_manager.insert_data(wrap(data), 'BTC/USDT', '1m', on_conflict=on_conflict,
+                                  batch_size=len(data), raise_errors=True) == 50
+    assert close_prices(db_manager) == {START + i * MINUTE: float(i) for i in range(50)}
+
+
+def test_unknown_conflict_mode(db_manager):
+    with pytest.raises(ValueError):
+        db_manager.insert_data(make_candles(1), 'BTC/USDT', '1m', on_conflict='replace')
+
+
+def ms(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp()) * 1000
+
+
+def test_monthly_gaps_follow_calendar(db_manager):
+    months = [ms(2024, month, 1) for month in range(1, 13) if month not in (4, 5)]
+    rows = [[timestamp] + candle[1:] for timestamp, candle in zip(months, make_candles(len(months)))]
+    db_manager.insert_data(rows, 'BTC/USDT', '1M', raise_errors=True)
+    scanner = GapScanner(db_manager)
+
+    assert scanner.find_gaps('BTC/USDT', '1M').tolist() == [[ms(2024, 4, 1), ms(2024, 6, 1)]]
+    gaps = scanner.find_gaps('BTC/USDT', '1M', ms(2023, 12, 15), ms(2025, 2, 1))
+    assert gaps.tolist() == [[ms(2024, 4, 1), ms(2024, 6, 1)], [ms(2025, 1, 1), ms(2025, 2, 1)]]
+    report = scanner.report('BTC/USDT', '1M', ms(2023, 11, 1), ms(2025, 2, 1))
+    assert (report['gaps'], report['missing'], report['largest']) == (3, 5, 2)
+
+
+def test_weekly_gaps_start_on_monday(db_manager):
+    weeks = [ms(2024, 1, 1) + i * 7 * 86_400_000 for i in range(10) if i != 4]
+    rows = [[timestamp] + candle[1:] for timestamp, candle in zip(weeks, make_candles(len(weeks)))]
+    db_manager.insert_data(rows, 'BTC/USDT', '1w', raise_errors=True)
+
+    gaps = GapScanner(db_manager).find_gaps('BTC/USDT', '1w', ms(2023, 12, 20))
+    assert gaps.tolist() == [[ms(2023, 12, 25), ms(2024, 1, 1)], [ms(2024, 1, 29), ms(2024, 2, 5)]]
@@ -0,0 +1,26 @@
+from conftest import MINUTE, START, FakeExchange, make_candles
+from historical_prices import HistoricalPriceFetcher
+
+
+def test_fetch_historical_data_excludes_open_candle():
+    candles = make_candles(250)
+    # Биржа внутри последней свечи: она ещё не закрыта
+    exchange = FakeExchange(candles, now=START + 249 * MINUTE + 30_000)
+    fetcher = HistoricalPriceFetcher('BTC/USDT', '1m', period=200, exchange=exchange)
+    fetcher.page_limit = 64
+
+    fetched = fetcher.fetch_historical_data()
+
+    assert len(fetched) == 200
+    assert fetched.timestamp[0] == START + 49 * MINUTE
+    assert fetched.timestamp[-1] == START + 248 * MINUTE
+
+
+def test_fetch_historical_data_at_candle_boundary():
+    candles = make_candles(100)
+    exchange = FakeExchange(candles, now=START + 100 * MINUTE)
+    fetcher = HistoricalPriceFetcher('BTC/USDT', '1m', period=100, exchange=exchange)
+
+    fetched = fetcher.fetch_historical_data()
+
+    assert fetched.timestamp.tolist() == [candle[0] for candle in candles]
@@ -0,0 +1,40 @@
+import numpy as np
+
+from candles import CandleBatch
+from conftest import make_candles
+from indicators import calculate_beer_points, calculate_moving_averages, chart_figure
+from timeutils import to_display_time
+
+
+def history_frame(count):
+    frame = CandleBatch.from_rows(make_candles(count, seed=5)).to_frame(index='timestamp')
+    return calculate_moving_averages(frame)
+
+
+def pivot_traces(fig):
+    return {trace.name: trace for trace in fig.data if trace.name in ('Beer Points', 'Beer Points line')}
+
+
+def test_chart_plots_passed_pivots():
+    data = history_frame(5000)
+    beer_points = calculate_beer_points(data)
+    # Свечи агрегируются: точки разворота не ищутся заново по агрегированным свечам
+    fig = chart_figure(data, beer_points, max_candles=500)
+
+    assert fig.layout.meta['interval_ms'] is not None
+    assert len(fig.data) == 6
+    traces = pivot_traces(fig)
+    expected_dates = to_display_time(beer_points['Date'].to_numpy())
+    for trace in traces.values():
+        assert list(trace.x) == list(expected_dates)
+        assert np.array_equal(trace.y, beer_points['Pivot Value'].to_numpy())
+    is_high = beer_points['Pivot Type'].str.contains('High').to_numpy()
+    assert list(traces['Beer Points'].marker.color) == np.where(is_high, 'red', 'green').tolist()
+
+
+def test_chart_without_pivots():
+    data = history_frame(10)
+    fig = chart_figure(data, calculate_beer_points(data.iloc[:2]))
+
+    assert len(fig.data) == 6
+    assert all(len(trace.x) == 0 for trace in pivot_traces(fig).values())
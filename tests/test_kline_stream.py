@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import ccxt
+from websockets.asyncio.server import serve
+
+from conftest import FakeDatabase, FakeExchange, make_candles
+from historical_prices import HistoricalPriceFetcher
+from kline_stream import KlineStream, stream_to_database
+
+
+def kline_message(candle, closed=True):
+    timestamp, open_price, high, low, close, volume = candle
+    return json.dumps({'e': 'kline', 'k': {'t': timestamp, 'o': str(open_price), 'h': str(high),
+                                           'l': str(low), 'c': str(close), 'v': str(volume), 'x': closed}})
+
+
+class FlakyExchange(FakeExchange):
+    """
+    Биржа, первый запрос свечей к которой завершается ошибкой ccxt.
+    """
+
+    failures = 1
+
+    def fetch_ohlcv(self, symbol, timeframe=None, since=None, limit=None):
+        if self.failures:
+            self.failures -= 1
+            raise ccxt.ExchangeError('binance {"code":-1003,"msg":"Too much request weight used"}')
+        return super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+
+async def run_stream(candles, count):
+    connections = []
+
+    def process_request(connection, request):
+        connections.append(request.path)
+        if len(connections) == 1:
+            # Первое подключение отклоняется, как при перегрузке сервера
+            return connection.respond(503, 'Service Unavailable\n')
+        return None
+
+    async def handler(websocket):
+        if len(connections) == 2:
+            # Часть свечей (и незакрытое обновление), затем обрыв соединения без закрытия
+            for candle in candles[:10]:
+                await websocket.send(kline_message(candle, closed=False))
+                await websocket.send(kline_message(candle))
+            websocket.transport.abort()
+            return
+        # После переподключения поток продолжается с более поздней свечи
+        for candle in candles[15:]:
+            await websocket.send(kline_message(candle))
+        await websocket.wait_closed()
+
+    exchange = FlakyExchange(candles)
+    fetcher = HistoricalPriceFetcher('BTC/USDT', '1m', exchange=exchange)
+    async with serve(handler, '127.0.0.1', 0, process_request=process_request) as server:
+        port = server.sockets[0].getsockname()[1]
+        stream = KlineStream(fetcher, url=f'ws://127.0.0.1:{port}', reconnect_delay=0.01)
+        received = []
+        async for candle in stream:
+            received.append(candle)
+            if len(received) == count:
+                break
+    return received, stream, connections, exchange
+
+
+def test_stream_reconnects_and_gap_fills_to_contiguous_output():
+    candles = make_candles(20)
+    received, stream, connections, exchange = asyncio.run(asyncio.wait_for(run_stream(candles, 20), 10))
+
+    assert received == candles
+    assert connections == ['/ws/btcusdt@kline_1m'] * 4
+    # Отказ в подключении, обрыв, ошибка дозагрузки
+    assert stream.reconnects == 3
+    assert exchange.failures == 0
+
+
+class FailingDatabase(FakeDatabase):
+    """
+    База данных, вставка в которую несколько раз подряд завершается ошибкой.
+    """
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.attempts = []
+
+    def insert_data(self, data, symbol=None, timeframe=None, on_conflict='ignore', batch_size=50000,
+                    raise_errors=False):
+        assert raise_errors
+        self.attempts.append(data[0][0])
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('server closed the connection unexpectedly')
+        return super().insert_data(data, symbol, timeframe, on_conflict, batch_size, raise_errors)
+
+
+async def run_stream_to_database(candles, db_manager):
+    async def handler(websocket):
+        for candle in candles:
+            await websocket.send(kline_message(candle))
+        await websocket.wait_closed()
+
+    fetcher = HistoricalPriceFetcher('BTC/USDT', '1m', exchange=FakeExchange(candles))
+    async with serve(handler, '127.0.0.1', 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        stream = KlineStream(fetcher, url=f'ws://127.0.0.1:{port}', reconnect_delay=0.01)
+        received = []
+
+        async def on_candle(candle):
+            # Свеча передаётся дальше только после записи, и поток не ушёл дальше неё
+            assert db_manager.query_candles('BTC/USDT', '1m', as_arrays=True)['timestamp'][-1] == candle[0]
+            assert stream.last_timestamp == candle[0]
+            received.append(candle)
+            if len(received) == len(candles):
+                raise asyncio.CancelledError
+
+        task = asyncio.ensure_future(stream_to_database(stream, db_manager, on_candle=on_candle))
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    return received, stream
+
+
+def test_stream_to_database_retries_failed_inserts():
+    candles = make_candles(5)
+    db_manager = FailingDatabase(failures=3)
+    received, stream = asyncio.run(asyncio.wait_for(run_stream_to_database(candles, db_manager), 10))
+
+    assert received == candles
+    assert db_manager.attempts == [candles[0][0]] * 4 + [candle[0] for candle in candles[1:]]
+    assert db_manager.query_candles('BTC/USDT', '1m', as_arrays=True)['timestamp'].tolist() == \
+        [candle[0] for candle in candles]
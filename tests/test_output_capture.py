@@ -0,0 +1,53 @@
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from output_capture import capture_output
+
+
+def chatter(name, lines, barrier=None):
+    with capture_output() as output:
+        if barrier is not None:
+            # Все перехваты активны одновременно
+            barrier.wait()
+        for i in range(lines):
+            print(f'{name}:{i}')
+    return output.getvalue()
+
+
+def expected(name, lines):
+    return ''.join(f'{name}:{i}\n' for i in range(lines))
+
+
+def test_capture_output_is_isolated_between_threads(monkeypatch):
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    workers = 32
+    barrier = threading.Barrier(workers)
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(lambda n: chatter(f'thread-{n}', 200, barrier), range(workers)))
+
+    assert results == [expected(f'thread-{n}', 200) for n in range(workers)]
+    print('outside')
+    assert stdout.getvalue() == 'outside\n'
+
+
+def test_capture_output_is_isolated_between_tasks(monkeypatch):
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+
+    async def task(name):
+        with capture_output() as output:
+            for i in range(50):
+                print(f'{name}:{i}')
+                # Переключение на другие задачи посреди перехвата
+                await asyncio.sleep(0)
+        return output.getvalue()
+
+    async def run():
+        return await asyncio.gather(*(task(f'task-{n}') for n in range(32)))
+
+    assert asyncio.run(run()) == [expected(f'task-{n}', 50) for n in range(32)]
+    assert stdout.getvalue() == ''
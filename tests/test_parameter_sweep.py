@@ -0,0 +1,39 @@
+import numpy as np
+
+from candles import CandleBatch
+from conftest import make_candles
+from parameter_sweep import IndicatorCache, ParameterSweep
+from strategy import shifted_moving_average
+
+GRID = {'length': [1, 2, 3], 'allow_short': [False, True]}
+
+
+def test_moving_average_shift_longer_than_series():
+    candles = CandleBatch.from_rows(make_candles(10))
+    cache = IndicatorCache(candles)
+
+    for shift in (9, 10, 12, 25):
+        shifted = cache.moving_average(candles.close_price, 3, shift)
+        expected = shifted_moving_average(candles.close_price, 3, shift)
+        assert len(shifted) == 10
+        assert np.array_equal(shifted, expected, equal_nan=True)
+
+
+def test_resume_only_skips_results_with_same_series_and_costs(tmp_path):
+    output = str(tmp_path / 'sweep.jsonl')
+    candles = CandleBatch.from_rows(make_candles(300))
+
+    def sweep(candles, **options):
+        return ParameterSweep(candles, 'beer_points', grid=GRID, workers=1, **options).run(output)
+
+    assert sweep(candles)['done'] == 6
+    repeated = sweep(candles)
+    assert (repeated['done'], repeated['skipped']) == (0, 6)
+    # Другие комиссия, проскальзывание или диапазон свечей - другие результаты
+    assert sweep(candles, fee=0.002)['done'] == 6
+    assert sweep(candles, slippage=0.0005)['done'] == 6
+    assert sweep(candles[:200])['done'] == 6
+    # Тот же диапазон другого инструмента или интервала
+    assert sweep(candles, symbol='ETH/USDT')['done'] == 6
+    assert sweep(candles, timeframe='5m')['done'] == 6
+    assert sweep(candles, fee=0.002)['done'] == 0
@@ -0,0 +1,93 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from candles import CandleBatch
+from conftest import MINUTE, make_candles
+from resampling import IncrementalResampler, ResamplingEngine, bucket_bounds, resample_candles
+from timeutils import DAY_MS, candle_close_time, candle_open_time, timeframe_to_ms
+
+HOUR = 60 * MINUTE
+
+
+def ms(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp()) * 1000
+
+
+def test_weekly_buckets_open_on_monday():
+    # 2024-01-03 - среда; часовые свечи трёх недель
+    candles = CandleBatch.from_rows(make_candles(21 * 24, start=ms(2024, 1, 3), step=HOUR))
+    weekly = resample_candles(candles, '1w')
+
+    assert weekly.timestamp.tolist() == [ms(2024, 1, 1), ms(2024, 1, 8), ms(2024, 1, 15), ms(2024, 1, 22)]
+    assert all(datetime.fromtimestamp(t / 1000, timezone.utc).weekday() == 0 for t in weekly.timestamp.tolist())
+    # Длительность в мс выравнивается так же, как строка интервала
+    assert np.array_equal(resample_candles(candles, timeframe_to_ms('1w')).timestamp, weekly.timestamp)
+    starts, ends = bucket_bounds(candles.timestamp, '1w')
+    assert ends[0] - starts[0] + 1 == 5 * 24
+
+
+def test_monthly_buckets_follow_calendar():
+    candles = CandleBatch.from_rows(make_candles(366, start=ms(2024, 1, 1), step=DAY_MS))
+    monthly = resample_candles(candles, '1M')
+
+    assert monthly.timestamp.tolist() == [ms(2024, month, 1) for month in range(1, 13)]
+    starts, ends = bucket_bounds(candles.timestamp, '1M')
+    assert (ends - starts + 1).tolist() == [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    assert monthly.volume[1] == candles.volume[31:60].sum()
+    quarterly = resample_candles(candles, '3M')
+    assert quarterly.timestamp.tolist() == [ms(2024, 1, 1), ms(2024, 4, 1), ms(2024, 7, 1), ms(2024, 10, 1)]
+
+
+@pytest.mark.parametrize('timeframe', ['1m', '4h', '1d', '1w', '2w', '1M', '3M'])
+def test_vectorized_alignment_matches_scalar(timeframe):
+    timestamps = np.arange(ms(2023, 11, 20), ms(2024, 4, 2), 7 * HOUR + 13 * MINUTE, dtype=np.int64)
+    opened = candle_open_time(timeframe, timestamps)
+
+    assert opened.tolist() == [candle_open_time(timeframe, t) for t in timestamps.tolist()]
+    assert (opened <= timestamps).all()
+    assert (candle_close_time(timeframe, opened) > timestamps).all()
+
+
+def test_incremental_weekly_and_monthly_bars_match_resample():
+    candles = make_candles(24 * 75, start=ms(2024, 1, 3, 5), step=HOUR, seed=4)
+    resampler = IncrementalResampler(('1d', '1w', '1M'))
+    bars = {}
+    for candle in candles:
+        for timeframe, bar in resampler.update(candle):
+            bars.setdefault(timeframe, {})[bar[0]] = bar
+
+    batch = CandleBatch.from_rows(candles)
+    for timeframe in ('1d', '1w', '1M'):
+        expected = resample_candles(batch, timeframe)
+        result = np.array([bars[timeframe][t] for t in sorted(bars[timeframe])])
+        assert np.array_equal(result[:, 0].astype(np.int64), expected.timestamp)
+        assert np.allclose(result[:, 1:], np.column_stack([expected.open_price, expected.high_price,
+                                                           expected.low_price, expected.close_price,
+                                                           expected.volume]))
+
+
+def test_materialize_stops_at_range_end(database, tmp_path):
+    candles = make_candles(3 * 24 * 60, start=ms(2024, 1, 1), seed=6)
+    database.insert_data(candles, 'BTC/USDT', '1m')
+    engine = ResamplingEngine(database, 'BTC/USDT', timeframes=('1h', '1d'), cache_root=str(tmp_path))
+    loads = []
+    load_base = engine._load_base
+    engine._load_base = lambda start, end: loads.append((start, end)) or load_base(start, end)
+
+    written = engine.materialize(ms(2024, 1, 1, 6), ms(2024, 1, 2, 12))
+
+    # Бары расширены до границ суток с последней базовой свечой диапазона, но не дальше
+    assert loads == [(ms(2024, 1, 1), ms(2024, 1, 3))]
+    assert written == {'1h': 48, '1d': 2}
+    assert database.get_last_timestamp('BTC/USDT', '1d') == ms(2024, 1, 2)
+
+
+def test_engine_accepts_only_nested_timeframes():
+    assert ResamplingEngine(None, timeframes=('1h', '1d', '1w')).largest == '1w'
+    assert ResamplingEngine(None, timeframes=('4h', '1d', '1M')).largest == '1M'
+    with pytest.raises(ValueError):
+        ResamplingEngine(None, timeframes=('1d', '1w', '1M'))
+    with pytest.raises(ValueError):
+        ResamplingEngine(None, timeframes=('3d', '1w'))
@@ -0,0 +1,62 @@
+import time
+from datetime import datetime, timezone
+
+import ccxt
+import pytest
+
+from scheduler import CandleCloseScheduler, candle_close_time, candle_open_time
+
+
+def ms(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp()) * 1000
+
+
+class ClockExchange:
+    """
+    Биржа, часы которой показывают заданное время.
+    """
+
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+    def __init__(self, now_ms):
+        self.offset = now_ms - time.time() * 1000
+
+    def fetch_time(self):
+        return int(time.time() * 1000 + self.offset)
+
+
+def first_deadline(timeframe, now_ms):
+    scheduler = CandleCloseScheduler(ClockExchange(now_ms))
+    scheduler.add_job(timeframe, lambda open_time: None)
+    return scheduler._queue[0][0]
+
+
+def test_weekly_candles_open_on_monday():
+    week_ms = ccxt.Exchange.parse_timeframe('1w') * 1000
+    # Среда, 3 января 2024
+    assert candle_open_time('1w', ms(2024, 1, 3, 12), week_ms) == ms(2024, 1, 1)
+    assert candle_open_time('1w', ms(2024, 1, 1), week_ms) == ms(2024, 1, 1)
+    assert candle_close_time('1w', ms(2024, 1, 1), week_ms) == ms(2024, 1, 8)
+    assert first_deadline('1w', ms(2024, 1, 3, 12)) == ms(2024, 1, 8)
+
+
+def test_monthly_candles_follow_calendar():
+    month_ms = ccxt.Exchange.parse_timeframe('1M') * 1000
+    assert candle_open_time('1M', ms(2024, 2, 29, 23, 59), month_ms) == ms(2024, 2, 1)
+    assert first_deadline('1M', ms(2024, 2, 15)) == ms(2024, 3, 1)
+    assert first_deadline('1M', ms(2023, 12, 31, 23)) == ms(2024, 1, 1)
+
+    closes = [ms(2024, 1, 1)]
+    for _ in range(12):
+        closes.append(candle_close_time('1M', closes[-1], month_ms))
+    assert closes == [ms(2024, month, 1) for month in range(1, 13)] + [ms(2025, 1, 1)]
+
+
+def test_intraday_deadline_is_next_close():
+    assert first_deadline('15m', ms(2024, 1, 3, 12, 7)) == ms(2024, 1, 3, 12, 15)
+
+
+def test_yearly_timeframe_is_rejected():
+    scheduler = CandleCloseScheduler(ClockExchange(ms(2024, 1, 1)))
+    with pytest.raises(ValueError):
+        scheduler.add_job('1y', lambda open_time: None)
@@ -0,0 +1,60 @@
+import numpy as np
+
+from candles import CandleBatch
+from conftest import MINUTE, START, make_candles
+from indicators import calculate_moving_averages
+from pivots import PIVOT_HIGH, PIVOT_LOW, find_pivots
+from streaming_indicators import IndicatorEngine
+
+
+def history_frame(count=600, seed=3):
+    return CandleBatch.from_rows(make_candles(count, seed=seed)).to_frame(index='timestamp')
+
+
+def test_replay_matches_batch_calculation():
+    frame = history_frame()
+    engine = IndicatorEngine()
+    streamed = {column: [] for column in engine.moving_averages}
+    pivots = []
+    for timestamp, candle in zip(frame.index, frame.itertuples(index=False)):
+        values, pivot = engine.update(timestamp, candle.high_price, candle.low_price, candle.close_price)
+        for column, value in values.items():
+            streamed[column].append(value)
+        if pivot is not None:
+            pivots.append((pivot['Date'], pivot['Pivot Type'], pivot['Pivot Value']))
+
+    expected = calculate_moving_averages(frame.copy())
+    for column, values in streamed.items():
+        # Побитовое сравнение: NaN совпадают с NaN
+        assert np.array_equal(expected[column].to_numpy().view(np.int64), np.array(values).view(np.int64))
+
+    indices, is_high, values = find_pivots(frame['high_price'].to_numpy(), frame['low_price'].to_numpy())
+    assert pivots == [(frame.index[i], PIVOT_HIGH if high else PIVOT_LOW, value)
+                      for i, high, value in zip(indices, is_high, values)]
+
+
+def test_already_seen_candle_is_ignored():
+    frame = history_frame(100)
+    engine = IndicatorEngine()
+    engine.warm_up(frame)
+    last = frame.iloc[-1]
+
+    assert engine.update(frame.index[-1], last.high_price, last.low_price, last.close_price) is None
+    assert engine.update(frame.index[-5], 1.0, 1.0, 1.0) is None
+
+    reference = IndicatorEngine()
+    reference.warm_up(frame)
+    next_time = START + 100 * MINUTE
+    assert engine.update(next_time, 2.0, 1.0, 1.5) == reference.update(next_time, 2.0, 1.0, 1.5)
+
+
+def test_warm_up_skips_candles_already_seen():
+    frame = history_frame(200)
+    engine = IndicatorEngine()
+    engine.warm_up(frame.iloc[:150])
+    streamed, _ = engine.warm_up(frame.iloc[100:])
+
+    expected = calculate_moving_averages(frame.copy()).iloc[150:]
+    assert streamed.index.tolist() == frame.index[150:].tolist()
+    for column in engine.moving_averages:
+        assert np.array_equal(expected[column].to_numpy(), streamed[column].to_numpy(), equal_nan=True)
@@ -0,0 +1,127 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+DAY_MS = 86_400_000
+WEEK_MS = 7 * DAY_MS
+# Недельные свечи Binance открываются в понедельник 00:00 UTC, а 1970-01-01 - четверг
+WEEK_OFFSET_MS = 4 * DAY_MS
+
+_UNIT_MS = {'s': 1000, 'm': 60_000, 'h': 3_600_000, 'd': DAY_MS, 'w': WEEK_MS, 'M': 30 * DAY_MS}
+
+
+def to_epoch_ms(value):
+    """
+    Приводит метку времени к миллисекундам Unix (UTC).
+
+    Parameters:
+        value: Миллисекунды (int), datetime или строка ISO 'YYYY-MM-DD[ HH:MM:SS]'.
+            datetime и строки без часового пояса считаются временем UTC.
+
+    Returns:
+        int: Миллисекунды или None, если value равно None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, float):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if hasattr(value, 'to_pydatetime'):
+        # pd.Timestamp: pandas не импортируется ради проверки типа
+        value = value.to_pydatetime()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def format_timestamp(timestamp_ms):
+    """
+    Строка 'YYYY-MM-DD HH:MM:SS' (UTC) для логов и вывода.
+    """
+    return datetime.fromtimestamp(timestamp_ms / 1000.0, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def to_display_time(timestamps_ms, tz=None):
+    """
+    Векторно переводит миллисекунды в даты для отображения (графики, таблицы).
+
+    Parameters:
+        timestamps_ms (array-like): Метки времени в миллисекундах.
+        tz (str): Часовой пояс отображения (по умолчанию: UTC).
+
+    Returns:
+        pd.DatetimeIndex: Даты с часовым поясом.
+    """
+    import pandas as pd
+
+    index = pd.DatetimeIndex(pd.to_datetime(np.asarray(timestamps_ms, dtype=np.int64), unit='ms', utc=True))
+    return index.tz_convert(tz) if tz else index
+
+
+def timeframe_to_ms(timeframe):
+    """
+    Длительность интервала в миллисекундах: '1m' -> 60000, '4h' -> 14400000.
+
+    Для месячных интервалов - номинальная длина (30 дней на месяц, как ccxt parse_timeframe);
+    границы таких свечей даёт candle_open_time. Годовые интервалы не поддерживаются:
+    у биржи таких свечей нет.
+
+    Raises:
+        ValueError: При неизвестном формате интервала.
+    """
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in _UNIT_MS or not amount.isdigit() or int(amount) < 1:
+        raise ValueError(f"Неподдерживаемый интервал: {timeframe}")
+    return int(amount) * _UNIT_MS[unit]
+
+
+def interval_open_time(timestamp, interval_ms):
+    """
+    Начало интервала длительностью interval_ms, в который попадает timestamp, мс.
+
+    Интервалы выравниваются от начала эпохи, кратные неделе - по понедельникам.
+    timestamp может быть числом или массивом NumPy.
+    """
+    offset = WEEK_OFFSET_MS if interval_ms % WEEK_MS == 0 else 0
+    return (timestamp - offset) // interval_ms * interval_ms + offset
+
+
+def candle_open_time(timeframe, timestamp, timeframe_ms=None):
+    """
+    Время открытия свечи интервала timeframe, в которую попадает timestamp, мс.
+
+    Интервалы до суток выравниваются от начала эпохи, недельные - по понедельникам,
+    месячные - по первому числу месяца (UTC), как свечи Binance.
+
+    Parameters:
+        timeframe (str): Интервал свечей ('1m', '1h', '1w', '1M', ...).
+        timestamp (int | np.ndarray): Момент времени (или массив моментов), мс.
+        timeframe_ms (int): Длительность интервала, мс (по умолчанию: timeframe_to_ms;
+            для месячных интервалов не используется).
+
+    Raises:
+        ValueError: Для интервалов в годах: у биржи таких свечей нет.
+    """
+    unit = timeframe[-1]
+    if unit == 'y':
+        raise ValueError(f"Интервал {timeframe} не поддерживается: у биржи нет годовых свечей")
+    if unit == 'M':
+        count = int(timeframe[:-1] or 1)
+        months = np.asarray(timestamp, dtype=np.int64).astype('datetime64[ms]').astype('datetime64[M]')
+        months = months.astype(np.int64)
+        opened = (months - months % count).astype('datetime64[M]').astype('datetime64[ms]').astype(np.int64)
+        return int(opened) if opened.ndim == 0 else opened
+    return interval_open_time(timestamp, timeframe_ms or timeframe_to_ms(timeframe))
+
+
+def candle_close_time(timeframe, open_time, timeframe_ms=None):
+    """
+    Время закрытия (открытия следующей) свечи, открытой в open_time, мс.
+    """
+    if timeframe[-1] == 'M':
+        # Через 31 день на каждый месяц интервала - внутри следующей свечи
+        return candle_open_time(timeframe, open_time + int(timeframe[:-1] or 1) * 31 * DAY_MS)
+    return open_time + (timeframe_ms or timeframe_to_ms(timeframe))